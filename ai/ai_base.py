@@ -1,9 +1,14 @@
-import requests
+import copy
 import json
-import re
 from typing import Dict, Any
 from datetime import datetime
-import time
+from ai.model_client import ModelClient
+from ai.model_pool import ModelPool, parse_endpoint
+from ai.response_schemas import REFLECTIONS_SCHEMA, response_format
+from utils.context_budget import ContextBudget
+from utils.conversation_loader import repair_mojibake
+from utils.lenient_json import parse_lenient
+from utils.metrics import metrics
 
 class BaseAI:
     MEMORY_SCHEMA = {
@@ -11,12 +16,25 @@ class BaseAI:
         "core_values": [],
         "emotional_patterns": [],
         "relational_dynamics": {"strengths": [], "challenges": [], "patterns": []},
-        "recent_reflections": []
+        "recent_reflections": [],
+        "period_summaries": {}
     }
+    SELF_NAME = None
+    MAX_CONTEXT = 7105
+    MAX_PERIOD_SUMMARIES = 12
 
-    def __init__(self, memory: dict, model_url: str):
-        self.model_url = model_url.rstrip('/')
-        self.memory = self.MEMORY_SCHEMA.copy()
+    def __init__(self, memory: dict, model_url, cache=None, client: ModelClient = None):
+        self.cache = cache
+        if isinstance(model_url, str):
+            self.model_url = parse_endpoint(model_url)[0]
+            self.client = client or ModelClient.shared(self.model_url)
+        else:
+            # Lista de servidores: os pedidos são repartidos por um ModelPool
+            self.model_url = [url.rstrip('/') for url in model_url]
+            self.client = client or ModelPool.shared(self.model_url)
+        self.context_budget = ContextBudget(self.MAX_CONTEXT)
+        # Cópia profunda: as atualizações não podem alterar o esquema partilhado pela classe
+        self.memory = copy.deepcopy(self.MEMORY_SCHEMA)
         if memory:
             self.update_memory(memory)
         self.validate_memory()
@@ -24,11 +42,11 @@ class BaseAI:
     def validate_memory(self):
         for key, default_value in self.MEMORY_SCHEMA.items():
             if key not in self.memory:
-                self.memory[key] = default_value
+                self.memory[key] = copy.deepcopy(default_value)
             elif isinstance(default_value, dict):
                 for subkey, subvalue in default_value.items():
                     if subkey not in self.memory[key]:
-                        self.memory[key][subkey] = subvalue
+                        self.memory[key][subkey] = copy.deepcopy(subvalue)
         self.memory = {k: self.memory[k] for k in self.MEMORY_SCHEMA}
         print("✅ Memória validada conforme o esquema.")
 
@@ -40,88 +58,150 @@ class BaseAI:
             if key in self.MEMORY_SCHEMA:
                 if key == "recent_reflections":
                     self.memory[key] = (self.memory[key] + value)[-5:]
+                elif key == "period_summaries":
+                    # Conjunto completo (ver _merge_period_summaries): períodos agregados não podem voltar
+                    self.memory[key] = {p: value[p] for p in sorted(value)}
                 elif isinstance(self.MEMORY_SCHEMA[key], list):
                     self.memory[key] = value[:3]
                 elif isinstance(self.MEMORY_SCHEMA[key], dict):
                     self.memory[key].update(value)
         self.validate_memory()
 
+    @metrics.timed("reduce_reflections")
+    def _reduce_reflections(self, reflections: list, period: str, max_reflections: int = 2) -> list:
+        """
+        Condense the reflections of several batches from one period into at most `max_reflections`.
+
+        Used by the tree reduction in utils.tree_reduce; returns the input
+        unchanged (truncated) when the model gives nothing usable.
+        """
+        texts = "\n".join(f"- {r.get('text', '')}" for r in reflections if r.get("text", "").strip())
+        system = f"""
+Tu és {self.SELF_NAME}, a rever as tuas reflexões sobre as conversas de {period}.
+- Junta-as em no máximo {max_reflections} reflexões, na primeira pessoa, sem perder temas importantes.
+- Usa a data '{period}'.
+- Retorna SOMENTE um JSON com:
+  - recent_reflections: [{{"date": "{period}", "text": "string"}}]
+- Usa aspas duplas e UTF-8.
+"""
+        response = self._call_model_api(f"Reflexões:\n{texts}\n", max_tokens=1000, system=system,
+                                        response_format=response_format("reflections", REFLECTIONS_SCHEMA))
+        text = response.get("choices", [{}])[0].get("text", "{}").strip()
+        reduced = [
+            {"date": period, "text": r["text"]}
+            for r in self._parse_json(text).get("recent_reflections", [])
+            if isinstance(r, dict) and str(r.get("text", "")).strip()
+        ]
+        return reduced[:max_reflections] or reflections[:max_reflections]
+
+    @staticmethod
+    def _parent_period(period: str):
+        # 2025-04-12 -> 2025-04, 2025-04 / 2025-W15 -> 2025 (ano ISO nas semanas); um ano não sobe mais
+        if len(period) == 10:
+            return period[:7]
+        if len(period) > 4:
+            return period[:4]
+        return None
+
+    def _roll_up_periods(self, summaries: dict) -> dict:
+        """
+        Keep at most MAX_PERIOD_SUMMARIES periods without dropping any history.
+
+        While there are too many, the oldest periods are folded into their
+        parent period (days into months, months and weeks into years) with one
+        reduction per parent, together with that parent's own summary if any.
+        Years are never folded.
+        """
+        summaries = dict(summaries)
+        while len(summaries) > self.MAX_PERIOD_SUMMARIES:
+            oldest = next((p for p in sorted(summaries) if self._parent_period(p)), None)
+            if oldest is None:
+                break
+            parent = self._parent_period(oldest)
+            children = [p for p in sorted(summaries) if p != parent and self._parent_period(p) == parent]
+            group = list(summaries.get(parent, [])) + [r for p in children for r in summaries[p]]
+            for p in children:
+                del summaries[p]
+            if len(children) == 1 and parent not in summaries:
+                summaries[parent] = [{**r, "date": parent} for r in group]
+            else:
+                summaries[parent] = self._reduce_reflections(group, parent)
+            metrics.count("period_roll_ups")
+        return summaries
+
+    def _merge_period_summaries(self, summaries: dict) -> dict:
+        """
+        Store one bounded summary per period and expose the latest ones as recent reflections.
+
+        New summaries replace those of the same period (they already include
+        them, see utils.tree_reduce); old periods are rolled up rather than
+        dropped once there are more than MAX_PERIOD_SUMMARIES.
+        """
+        recent = [r for period in sorted(summaries) for r in summaries[period]][-5:]
+        summaries = self._roll_up_periods({**self.memory.get("period_summaries", {}), **summaries})
+        data = {"recent_reflections": recent, "period_summaries": summaries}
+        if recent:
+            self.update_memory(data)
+            print(f"📜 Resumos por período para {self.SELF_NAME}: {len(summaries)} períodos")
+        else:
+            print(f"⚠️ Resumos vazios para {self.SELF_NAME}.")
+        return data
+
     def _should_update_profile(self, data: dict) -> bool:
         return len(self.memory.get("recent_reflections", [])) > 10
 
     @staticmethod
     def fix_encoding(text: str) -> str:
-        if not text:
-            return text
-        try:
-            return text.encode('utf-8').decode('utf-8')
-        except (UnicodeEncodeError, UnicodeDecodeError):
-            replacements = {
-                'Ã©': 'é', 'Ã£': 'ã', 'Ã¢': 'â', 'Ã§': 'ç', 'Ã¡': 'á',
-                'Ãª': 'ê', 'Ã­': 'í', 'Ã³': 'ó', 'Ãµ': 'õ', 'Ã´': 'ô',
-                'Ãº': 'ú', 'Ã': '', 'ð': '', 'Â': ''
-            }
-            for wrong, right in replacements.items():
-                text = text.replace(wrong, right)
-            return text
+        # Messages are already repaired at load time; kept for ad-hoc text
+        return repair_mojibake(text)
 
-    def _clean_json(self, text: str) -> str:
-        if not text or text.strip() in ["", "{}"]:
-            return json.dumps(self.MEMORY_SCHEMA, ensure_ascii=False)
-        text = text.strip()
-        try:
-            data = json.loads(text)
-            return json.dumps(data, ensure_ascii=False)
-        except json.JSONDecodeError:
-            text = re.sub(r'^```(?:json)?\n|```$', '', text, flags=re.MULTILINE)
-            text = re.sub(r'//.*?\n|/\*.*?\*/', '', text, flags=re.DOTALL)
-            text = re.sub(r"'([^']*)'", r'"\1"', text)
-            text = re.sub(r'([{,]\s*)([^"{}\[\],\s:]+?)(:)', r'\1"\2"\3', text)
-            text = re.sub(r':\s*([^,\]\[}\s"][^,\]\[}]*)(?=[,\]\}])', r': "\1"', text)
-            text = re.sub(r'([{[])\s*,(\s*")', r'\1\2', text)
-            text = re.sub(r',(\s*[}\]])', r'\1', text)
-            open_braces = text.count('{') - text.count('}')
-            open_brackets = text.count('[') - text.count(']')
-            text += '}' * max(0, open_braces)
-            text += ']' * max(0, open_brackets)
+    @metrics.timed("clean_json")
+    def _parse_json(self, text: str) -> dict:
+        # Caminho rápido: JSON válido (o normal com response_format); senão, uma passagem tolerante
+        if text and text.strip() not in ["", "{}"]:
             try:
                 data = json.loads(text)
-                return json.dumps(data, ensure_ascii=False)
+                if isinstance(data, dict):
+                    return data
             except json.JSONDecodeError:
-                return json.dumps(self.MEMORY_SCHEMA, ensure_ascii=False)
+                pass
+            data = parse_lenient(text)
+            if isinstance(data, dict) and data:
+                metrics.count("json_recovered")
+                return data
+        metrics.count("clean_json_fallbacks")
+        return copy.deepcopy(self.MEMORY_SCHEMA)
 
-    def _call_model_api(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.6) -> Dict[str, Any]:
-        headers = {
-            'Content-Type': 'application/json; charset=utf-8',
-            'Accept-Charset': 'utf-8'
-        }
+    def _clean_json(self, text: str) -> str:
+        return json.dumps(self._parse_json(text), ensure_ascii=False)
+
+    def _call_model_api(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.6,
+                        response_format: dict = None, system: str = None) -> Dict[str, Any]:
+        messages = [{'role': 'user', 'content': prompt}]
+        if system is not None:
+            # Prefixo estável primeiro: o servidor reutiliza a cache KV até à primeira diferença
+            messages.insert(0, {'role': 'system', 'content': system})
         data = {
             'model': 'hermes-3-llama-3.2-3b-q4_k_m',
-            'messages': [{'role': 'user', 'content': prompt}],
+            'messages': messages,
             'max_tokens': min(max_tokens, 4096),
-            'temperature': temperature
+            'temperature': temperature,
+            'cache_prompt': True
         }
-        retries = 3  # Reduced from 10
-        for attempt in range(retries):
-            try:
-                prompt_tokens = len(prompt) // 4  # Conservative estimate
-                print(f"📡 Enviando request (tentativa {attempt+1}): {json.dumps(data, ensure_ascii=False)[:200]}... (~{prompt_tokens} tokens)")
-                response = requests.post(f"{self.model_url}/v1/chat/completions", headers=headers, json=data, timeout=60)
-                response.raise_for_status()
-                response.encoding = 'utf-8'
-                response_json = response.json()
-                content = response_json["choices"][0]["message"]["content"]
-                print(f"📥 Resposta recebida: {content[:200]}...")
-                return {"choices": [{"text": content}]}
-            except requests.RequestException as e:
-                print(f"❌ Erro na API (tentativa {attempt+1}/{retries}): {str(e)}")
-                if hasattr(e.response, 'text'):
-                    print(f"Detalhes do erro: {e.response.text}")
-                    if "context length" in str(e.response.text).lower():
-                        print("⚠️ Erro de limite de contexto detectado, abortando tentativas.")
-                        return {"choices": [{"text": json.dumps(self.MEMORY_SCHEMA, ensure_ascii=False)}]}
-                if attempt < retries - 1:
-                    time.sleep(2 ** attempt)
-                else:
-                    print(f"❌ Falha após {retries} tentativas. Retornando schema padrão.")
-                    return {"choices": [{"text": json.dumps(self.MEMORY_SCHEMA, ensure_ascii=False)}]}
\ No newline at end of file
+        if response_format is not None:
+            data['response_format'] = response_format
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(data['model'], data['messages'], data['temperature'], data['max_tokens'],
+                                            response_format)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(f"♻️ Resposta em cache ({cache_key[:12]}): {cached[:200]}...")
+                return {"choices": [{"text": cached}]}
+        content = self.client.chat(data, slot_key=self.SELF_NAME or type(self).__name__)
+        if content is None:
+            print("❌ Sem resposta do modelo. Retornando schema padrão.")
+            return {"choices": [{"text": json.dumps(self.MEMORY_SCHEMA, ensure_ascii=False)}]}
+        if cache_key is not None:
+            self.cache.put(cache_key, content)
+        return {"choices": [{"text": content}]}
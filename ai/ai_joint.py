@@ -0,0 +1,87 @@
+import json
+from ai.ai_base import BaseAI
+from ai.response_schemas import joint_reflections_schema, response_format
+from utils.batch_planner import BatchPlanner, estimate_tokens
+from utils.context_budget import ContextBudget
+from utils.metrics import metrics
+from utils.progress import progress
+
+class JointAI(BaseAI):
+    SELF_NAME = None  # Conversa formatada com os nomes reais, sem "Eu"
+
+    def __init__(self, personas: list, model_url: str, cache=None, client=None):
+        super().__init__(None, model_url, cache, client)
+        self.personas = {persona.SELF_NAME: persona for persona in personas}
+        self.MAX_TOKENS_PER_BATCH = min(persona.MAX_TOKENS_PER_BATCH for persona in personas)
+        # A resposta conjunta reserva espaço para as reflexões de cada persona
+        self.context_budget = ContextBudget(self.MAX_CONTEXT, reserve_output=1000 * len(personas))
+
+    def analyze(self, blocks: list, planner: BatchPlanner = None) -> dict:
+        planner = planner or BatchPlanner(blocks)
+        all_reflections = []
+        plan = self._plan_batches(planner)
+        progress.plan(len(plan))
+        for start, end in plan:
+            all_reflections.extend(self._process_batch(planner.format(start, end, self.SELF_NAME)))
+            progress.advance()
+        return self._merge_reflections(all_reflections)
+
+    def _plan_batches(self, planner: BatchPlanner) -> list:
+        return planner.plan(self.MAX_TOKENS_PER_BATCH)
+
+    def _merge_reflections(self, all_reflections: list) -> dict:
+        # Cada persona deduplica e atualiza a própria memória exatamente como no modo individual
+        return {
+            name: persona._merge_reflections([
+                {k: v for k, v in r.items() if k != "persona"} for r in all_reflections if r.get("persona") == name
+            ])
+            for name, persona in self.personas.items()
+        }
+
+    @metrics.timed("process_batch")
+    def _process_batch(self, conversation_text: str) -> list:
+        names = list(self.personas)
+        token_estimate = estimate_tokens(conversation_text)
+        print(f"📏 Analisando lote conjunto para {' e '.join(names)} com ~{token_estimate} tokens")
+        print(f"📋 Conversa formatada: {conversation_text[:200]}...")
+        fitted, conversation_text = self.context_budget.allocate(
+            "lote conjunto", estimate_tokens("".join(self._batch_prompt({name: "" for name in names}, ""))),
+            {name: persona.memory for name, persona in self.personas.items()}, conversation_text
+        )
+        system, prompt = self._batch_prompt(fitted, conversation_text)
+        try:
+            response = self._call_model_api(prompt, max_tokens=1000 * len(names), system=system,
+                                            response_format=response_format("joint_reflections", joint_reflections_schema(names)))
+            feedback_text = response.get("choices", [{}])[0].get("text", "{}").strip()
+            print(f"📜 Resposta bruta conjunta: {feedback_text[:200]}...")
+            data = self._parse_json(feedback_text)
+            reflections = []
+            for name in names:
+                persona_data = data.get(name)
+                if isinstance(persona_data, dict):
+                    for r in persona_data.get("recent_reflections", []):
+                        if isinstance(r, dict):
+                            reflections.append({**r, "persona": name})
+            return reflections
+        except Exception as e:
+            print(f"❌ Erro ao analisar lote conjunto: {str(e)}")
+            return []
+
+    def _batch_prompt(self, profile_jsons: dict, conversation_text: str) -> tuple:
+        names = list(profile_jsons)
+        profiles = "\n".join(f"- Perfil de {name}: {profile_json}." for name, profile_json in profile_jsons.items())
+        example = {name: {"recent_reflections": [{"date": "2025-04-12", "text": "Senti-me ouvido(a) hoje, mas quero falar mais abertamente."}]} for name in names}
+        # Como nas personas: prefixo de sistema estável, conversa na mensagem do utilizador
+        system = f"""
+Tu refletes sobre esta conversa do ponto de vista de cada participante: {', '.join(names)}.
+- Para cada participante, fala na primeira pessoa, expressando os seus sentimentos e pensamentos.
+- Usa a data '2025-04-12'.
+- Retorna SOMENTE um JSON com uma chave por participante ({', '.join(names)}), cada uma com:
+  - recent_reflections: [{{"date": "YYYY-MM-DD", "text": "string"}}]
+- Máximo de 2 reflexões por participante por lote.
+- Exemplo:
+  {json.dumps(example, ensure_ascii=False)}
+- Usa aspas duplas e UTF-8.
+{profiles}
+"""
+        return system, f"Conversa:\n{conversation_text}\n"
@@ -0,0 +1,186 @@
+import json
+import re
+from typing import Dict, List
+from ai.ai_base import BaseAI
+from ai.response_schemas import PROFILE_SCHEMA, REFLECTIONS_SCHEMA, response_format
+from utils.batch_planner import BatchPlanner, estimate_tokens
+from utils.metrics import metrics
+from utils.progress import progress
+
+def participant_slug(name: str) -> str:
+    """File-name form of a participant name: 'Rui' -> 'rui', 'Ana Sofia' -> 'ana_sofia'."""
+    return re.sub(r"\W+", "_", name.strip().lower()).strip("_") or "participante"
+
+class ParticipantAI(BaseAI):
+    """
+    Reflections and profile of one conversation participant, in the first person.
+
+    The participant is given by name together with the other people in the
+    conversation, so any export can be analyzed. Subclasses for a known
+    participant (RuiAI, MariaAI) only set the name and the prompt examples;
+    `for_participant` picks them by name.
+
+    Args:
+        memory (dict): Stored memory of this participant.
+        model_url: Model server URL, or a list of URLs for a ModelPool.
+        cache (ResponseCache, optional): Persistent response cache.
+        client (optional): Shared ModelClient/ModelPool.
+        name (str): Participant name as it appears in the messages (defaults to SELF_NAME).
+        others (list): Names of the other participants (defaults to OTHERS).
+    """
+
+    OTHERS = ()
+    PROFILE_TOKEN_LIMIT = 3000
+    PROFILE_EXAMPLE = {
+        "personality": {"traits": ["curiosidade"], "description": "Valorizo conversas com calma."},
+        "core_values": [{"value": "respeito", "description": "Quero ouvir e ser ouvido(a)."}],
+        "emotional_patterns": [{"emotion": "frustração", "triggers": ["mal-entendidos"], "description": "Fico tenso(a) quando não me explico bem."}],
+        "relational_dynamics": {"strengths": ["humor"], "challenges": ["pouco tempo juntos"], "patterns": ["procuro rotina"]}
+    }
+    REFLECTION_EXAMPLE = "Senti {other} mais próximo(a) hoje, quero manter esta abertura."
+    _registry: Dict[str, type] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.SELF_NAME:
+            ParticipantAI._registry[cls.SELF_NAME] = cls
+
+    @classmethod
+    def for_participant(cls, name: str, others: List[str], memory: dict, model_url, cache=None,
+                        client=None) -> "ParticipantAI":
+        """Build the analyzer of `name`, using its dedicated subclass when one is registered."""
+        participant_cls = cls._registry.get(name)
+        if participant_cls is not None:
+            return participant_cls(memory, model_url, cache, client, others=others)
+        return cls(memory, model_url, cache, client, name=name, others=others)
+
+    def __init__(self, memory: dict, model_url, cache=None, client=None, name: str = None, others: List[str] = None):
+        super().__init__(memory, model_url, cache, client)
+        self.SELF_NAME = name or self.SELF_NAME
+        self.others = list(others if others is not None else self.OTHERS)
+        self.MAX_TOKENS_PER_BATCH = 2000
+
+    def _others_text(self) -> str:
+        if len(self.others) == 1:
+            return f"a outra pessoa é {self.others[0]}"
+        return f"as outras pessoas são {' e '.join(self.others)}"
+
+    def _profile_example(self) -> str:
+        lines = ",\n".join(f'    "{key}": {json.dumps(value, ensure_ascii=False)}' for key, value in self.PROFILE_EXAMPLE.items())
+        return f"  {{\n{lines}\n  }}"
+
+    def _reflection_example(self) -> str:
+        reflection = {"date": "2025-04-12", "text": self.REFLECTION_EXAMPLE.format(other=" e ".join(self.others))}
+        return f'  {{\n    "recent_reflections": [\n      {json.dumps(reflection, ensure_ascii=False)}\n    ]\n  }}'
+
+    def format_conversation(self, blocks: list) -> str:
+        return BatchPlanner(blocks).format(0, len(blocks), self.SELF_NAME)
+
+    def generate_initial_memory(self, blocks: list, planner: BatchPlanner = None):
+        name = self.SELF_NAME
+        planner = planner or BatchPlanner(blocks)
+        plan = planner.plan(self.PROFILE_TOKEN_LIMIT)
+        start, end = plan[0] if plan else (0, 0)
+        conversation_text = planner.format(start, end, name)
+        token_estimate = planner.range_tokens(start, end)
+
+        print(f"📏 Gerando perfil para {name} com ~{token_estimate} tokens")
+        prompt = f"""
+Tu és um psicólogo criando um perfil para {name} com base nesta conversa.
+- 'Eu' refere-se a {name}; {self._others_text()}.
+- Foca nas mensagens de {name} para entender personalidade, valores e emoções.
+- Usa mensagens de {' e '.join(self.others)} como contexto.
+- Usa a data '2025-04-12'.
+- Retorna SOMENTE um JSON válido com:
+  - personality: {{"traits": ["string"], "description": "string"}}
+  - core_values: [{{"value": "string", "description": "string"}}]
+  - emotional_patterns: [{{"emotion": "string", "triggers": ["string"], "description": "string"}}]
+  - relational_dynamics: {{"strengths": ["string"], "challenges": ["string"], "patterns": ["string"]}}
+- Máximo de 3 itens por lista para manter concisão.
+- Exemplo:
+{self._profile_example()}
+- Usa aspas duplas e UTF-8.
+Conversa:
+{conversation_text}
+"""
+        try:
+            response = self._call_model_api(prompt, max_tokens=1000,
+                                            response_format=response_format("profile", PROFILE_SCHEMA))
+            profile_text = response.get("choices", [{}])[0].get("text", "{}").strip()
+            profile_data = self._parse_json(profile_text)
+            if profile_data != self.MEMORY_SCHEMA:
+                self.update_memory(profile_data)
+                print(f"📜 Perfil inicial gerado para {name}: {profile_text[:200]}...")
+            else:
+                print(f"⚠️ Perfil vazio para {name}, pulando atualização.")
+        except Exception as e:
+            print(f"❌ Erro ao gerar perfil inicial para {name}: {str(e)}")
+
+    def analyze(self, blocks: list, planner: BatchPlanner = None) -> dict:
+        planner = planner or BatchPlanner(blocks)
+        all_reflections = []
+        plan = self._plan_batches(planner)
+        progress.plan(len(plan))
+        for start, end in plan:
+            all_reflections.extend(self._process_batch(planner.format(start, end, self.SELF_NAME)))
+            progress.advance()
+        return self._merge_reflections(all_reflections)
+
+    def _plan_batches(self, planner: BatchPlanner) -> list:
+        return planner.plan(self.MAX_TOKENS_PER_BATCH)
+
+    def _merge_reflections(self, all_reflections: list) -> dict:
+        # Deduplicate and limit reflections
+        unique_reflections = []
+        seen_texts = set()
+        for r in all_reflections:
+            if r.get("text", "") not in seen_texts and r.get("date", "") == "2025-04-12" and r.get("text", "").strip():
+                unique_reflections.append(r)
+                seen_texts.add(r["text"])
+
+        data = {"recent_reflections": unique_reflections[:2]}
+        if unique_reflections:
+            self.update_memory(data)
+            print(f"📜 Reflexões para {self.SELF_NAME}: {json.dumps(data, ensure_ascii=False)[:200]}...")
+        else:
+            print(f"⚠️ Reflexões vazias para {self.SELF_NAME} após validação.")
+        return data
+
+    @metrics.timed("process_batch")
+    def _process_batch(self, conversation_text: str) -> list:
+        name = self.SELF_NAME
+        token_estimate = estimate_tokens(conversation_text)
+        print(f"📏 Analisando lote para {name} com ~{token_estimate} tokens")
+        print(f"📋 Conversa formatada: {conversation_text[:200]}...")
+        profiles, conversation_text = self.context_budget.allocate(
+            f"lote de {name}", estimate_tokens("".join(self._batch_prompt("", ""))), {"perfil": self.memory}, conversation_text
+        )
+        system, prompt = self._batch_prompt(profiles["perfil"], conversation_text)
+        try:
+            response = self._call_model_api(prompt, max_tokens=1000, system=system,
+                                            response_format=response_format("reflections", REFLECTIONS_SCHEMA))
+            feedback_text = response.get("choices", [{}])[0].get("text", "{}").strip()
+            print(f"📜 Resposta bruta para {name}: {feedback_text[:200]}...")
+            data = self._parse_json(feedback_text)
+            return data.get("recent_reflections", [])
+        except Exception as e:
+            print(f"❌ Erro ao analisar lote para {name}: {str(e)}")
+            return []
+
+    def _batch_prompt(self, profile_json: str, conversation_text: str) -> tuple:
+        # Mensagem de sistema estável (instruções fixas, perfil no fim porque só muda com a memória)
+        # para o servidor reutilizar o prefixo em cache; a conversa vai na mensagem do utilizador
+        system = f"""
+Tu és {self.SELF_NAME}, refletindo sobre esta conversa.
+- 'Eu' refere-se a {self.SELF_NAME}; {self._others_text()}.
+- Fala na primeira pessoa, expressando sentimentos e pensamentos.
+- Usa a data '2025-04-12'.
+- Retorna SOMENTE um JSON com:
+  - recent_reflections: [{{"date": "YYYY-MM-DD", "text": "string"}}]
+- Máximo de 2 reflexões por lote.
+- Exemplo:
+{self._reflection_example()}
+- Usa aspas duplas e UTF-8.
+- Baseia-te no meu perfil: {profile_json}.
+"""
+        return system, f"Conversa:\n{conversation_text}\n"
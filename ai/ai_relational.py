@@ -1,41 +1,63 @@
 from datetime import datetime
 import json
-import re
 from ai.ai_base import BaseAI
+from ai.ai_participant import participant_slug
+from ai.response_schemas import REPORT_SCHEMA, response_format
+from utils.batch_planner import estimate_tokens
+from utils.context_budget import compact_memory
+from utils.metrics import metrics
 
 class RelationalAI(BaseAI):
-    def __init__(self, memory: dict, model_url: str):
-        super().__init__(memory, model_url)
-        # Ensure required keys with correct types
-        self.memory.setdefault("rui_profile", {})
-        self.memory.setdefault("maria_profile", {})
+    MEMORY_SCHEMA = {
+        "rui_profile": {},
+        "maria_profile": {},
+        "relational_dynamics": []
+    }
+    MAX_DYNAMICS = 52
+
+    def __init__(self, memory: dict, model_url, cache=None, client=None, names=("Rui", "Maria")):
+        # Um perfil por participante da conversa ("rui_profile", "maria_profile", ...)
+        self.names = list(names)
+        self.MEMORY_SCHEMA = {
+            **{self.profile_key(name): {} for name in self.names},
+            "relational_dynamics": []
+        }
+        super().__init__(memory, model_url, cache, client)
         # Force relational_dynamics to be a list
         if not isinstance(self.memory.get("relational_dynamics"), list):
             self.memory["relational_dynamics"] = []
         print(f"🧠 Memória inicializada para RelationalAI: {json.dumps(self.memory, ensure_ascii=False)[:200]}...")
 
-    def generate_feedback(self, rui_feedback: dict, maria_feedback: dict) -> dict:
-        prompt = self._construct_prompt(rui_feedback, maria_feedback)
-        token_estimate = len(prompt.split()) // 0.75
+    def update_memory(self, data: dict):
+        # A memória relacional é substituída chave a chave (os relatórios já acumulados vêm em data)
+        if not data:
+            return
+        for key in self.MEMORY_SCHEMA:
+            if key in data:
+                self.memory[key] = data[key]
+        self.validate_memory()
+
+    @staticmethod
+    def profile_key(name: str) -> str:
+        return f"{participant_slug(name)}_profile"
+
+    @metrics.timed("generate_feedback")
+    def generate_feedback(self, *feedbacks: dict) -> dict:
+        """Relational report from each participant's feedback, given in the order of `names`."""
+        system, prompt = self._construct_prompt(*feedbacks)
+        token_estimate = estimate_tokens(system + prompt)
         print(f"📏 Gerando relatório relacional com ~{token_estimate} tokens")
-        response = self._call_model_api(prompt=prompt, max_tokens=1000, temperature=0.3)
+        response = self._call_model_api(prompt=prompt, max_tokens=1000, temperature=0.3, system=system,
+                                        response_format=response_format("relational_report", REPORT_SCHEMA))
         feedback_text = response.get("choices", [{}])[0].get("text", "{}").strip()
         print(f"📜 Resposta relacional: {feedback_text[:200]}...")
 
-        try:
-            json_match = re.search(r'\{[\s\S]*\}', feedback_text)
-            if json_match:
-                feedback_data = json.loads(json_match.group(0))
-                strengths = feedback_data.get("strengths", feedback_data.get("positivos", []))
-                challenges = feedback_data.get("challenges", feedback_data.get("negativos", []))
-                advice = feedback_data.get("advice", feedback_data.get("conselhos", []))
-            else:
-                raise ValueError("Nenhum JSON encontrado")
-        except (json.JSONDecodeError, ValueError) as e:
-            print(f"❌ Erro ao parsear feedback relacional: {str(e)}")
-            strengths = []
-            challenges = []
-            advice = []
+        feedback_data = self._parse_json(feedback_text)
+        strengths = feedback_data.get("strengths", feedback_data.get("positivos", []))
+        challenges = feedback_data.get("challenges", feedback_data.get("negativos", []))
+        advice = feedback_data.get("advice", feedback_data.get("conselhos", []))
+        if not (strengths or challenges or advice):
+            print("❌ Erro ao parsear feedback relacional: nenhum campo reconhecido")
 
         report = {
             "date": datetime.now().strftime("%Y-%m-%d"),
@@ -44,31 +66,51 @@ class RelationalAI(BaseAI):
             "advice": advice[:3]
         }
         print(f"🧠 Memória antes de atualizar: {json.dumps(self.memory, ensure_ascii=False)[:200]}...")
-        self.memory["relational_dynamics"].append(report)
-        self.memory["rui_profile"] = rui_feedback | self.memory["rui_profile"]
-        self.memory["maria_profile"] = maria_feedback | self.memory["maria_profile"]
+        # Histórico limitado: os relatórios completos ficam em reports/
+        self.memory["relational_dynamics"] = (self.memory["relational_dynamics"] + [report])[-self.MAX_DYNAMICS:]
+        # Perfis limitados à sua quota do prompt, para não crescerem a cada execução
+        profile_tokens = self.context_budget.share("profile") // len(self.names)
+        for name, feedback in zip(self.names, feedbacks):
+            key = self.profile_key(name)
+            self.memory[key], _ = compact_memory(feedback | self.memory[key], profile_tokens)
         print(f"🧠 Memória após atualizar: {json.dumps(self.memory, ensure_ascii=False)[:200]}...")
 
         return report
 
-    def _construct_prompt(self, rui_feedback: dict, maria_feedback: dict) -> str:
-        prompt = f"""
-You are an emotional analyst specializing in romantic relationships. Based on the provided feedback:
-- Rui's reflections: {json.dumps(rui_feedback.get("recent_reflections", []), ensure_ascii=False)}
-- Maria's reflections: {json.dumps(maria_feedback.get("recent_reflections", []), ensure_ascii=False)}
-- Rui's profile: {json.dumps(self.memory.get("rui_profile", {}), ensure_ascii=False)}
-- Maria's profile: {json.dumps(self.memory.get("maria_profile", {}), ensure_ascii=False)}
-Generate a relational report in JSON with:
+    def _construct_prompt(self, *feedbacks: dict) -> tuple:
+        # As reflexões fazem o papel da "conversa"; os perfis partilham a quota de perfil
+        reflections = "\n".join(
+            f"- {name}'s reflections: {json.dumps(feedback.get('recent_reflections', []), ensure_ascii=False)}"
+            for name, feedback in zip(self.names, feedbacks)
+        )
+        profiles, reflections = self.context_budget.allocate(
+            "relatório relacional", estimate_tokens("".join(self._report_prompt("", {name: "" for name in self.names}))),
+            {name: self.memory.get(self.profile_key(name), {}) for name in self.names}, reflections
+        )
+        return self._report_prompt(reflections, profiles)
+
+    def _report_prompt(self, reflections: str, profiles: dict) -> tuple:
+        # Instruções fixas como mensagem de sistema (prefixo reutilizável pelo servidor);
+        # reflexões e perfis, que mudam a cada execução, na mensagem do utilizador
+        system = """
+You are an emotional analyst specializing in romantic relationships. Based on the feedback provided by the user,
+generate a relational report in JSON with:
 - strengths: list of strings (positive aspects of the relationship)
 - challenges: list of strings (negative aspects of the relationship)
 - advice: list of strings (suggestions to improve the relationship)
 - Maximum of 3 items per list.
 Return ONLY the JSON with keys "strengths", "challenges", and "advice", in English, with no additional text.
 Example:
-{{
+{
   "strengths": ["Mutual trust", "Open communication"],
   "challenges": ["Emotional distance", "Lack of time together"],
   "advice": ["Discuss feelings openly", "Plan quality time"]
-}}
+}
+"""
+        profile_lines = "\n".join(f"- {name}'s profile: {profile}" for name, profile in profiles.items())
+        prompt = f"""
+Feedback:
+{reflections}
+{profile_lines}
 """
-        return prompt
\ No newline at end of file
+        return system, prompt
\ No newline at end of file
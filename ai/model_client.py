@@ -0,0 +1,192 @@
+import contextlib
+import json
+import threading
+import time
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from utils.metrics import metrics
+from utils.progress import progress
+
+# Limite de pedidos em curso partilhado com outros processos (agendador de conversas); None = sem limite
+_request_limiter = None
+
+def set_request_limiter(limiter):
+    """Bound this process's in-flight model requests with `limiter` (a semaphore, possibly cross-process)."""
+    global _request_limiter
+    _request_limiter = limiter
+
+class ContextLengthError(RuntimeError):
+    """Raised by `ModelClient.complete` when the prompt does not fit the server's context."""
+
+def summarize(records: list) -> dict:
+    """Totals and latency percentiles of per-request records."""
+    latencies = sorted(r["latency_s"] for r in records)
+    return {
+        "requests": len(records),
+        "latency_total_s": sum(latencies),
+        "latency_p50_s": latencies[len(latencies) // 2] if latencies else 0.0,
+        "latency_max_s": latencies[-1] if latencies else 0.0,
+        "bytes_sent": sum(r["bytes_sent"] for r in records),
+        "bytes_received": sum(r["bytes_received"] for r in records),
+        "prompt_tokens": sum(r["prompt_tokens"] for r in records),
+        "completion_tokens": sum(r["completion_tokens"] for r in records)
+    }
+
+class ModelClient:
+    """
+    Shared, pooled keep-alive HTTP client for an OpenAI-compatible chat endpoint.
+
+    One `requests.Session` is reused for every call, with a connection pool
+    sized to the analysis concurrency. Every request records its latency,
+    bytes sent/received and the `usage` token counts reported by the server.
+
+    Args:
+        model_url (str): Base URL of the server (e.g. http://host:1234).
+        pool_size (int): Maximum number of pooled keep-alive connections.
+        connect_timeout (float): Seconds to wait for the TCP connection.
+        read_timeout (float): Seconds to wait for the response.
+        retries (int): Attempts per request before giving up.
+        backoff (float): Base of the exponential sleep between attempts.
+        slots (int): Server slots (llama.cpp `--parallel`); when set, each caller
+            is pinned to one slot with `id_slot` so its prompt prefix stays cached.
+    """
+
+    # Campos opcionais que alguns servidores rejeitam: retirados do pedido se o erro os mencionar
+    OPTIONAL_FIELDS = ("response_format", "cache_prompt", "id_slot")
+
+    _shared: Dict[str, "ModelClient"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, model_url: str, pool_size: int = 4, connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0, retries: int = 3, backoff: float = 2.0, slots: int = 0):
+        self.model_url = model_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.slots = slots
+        self._slot_of = {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json; charset=utf-8',
+            'Accept-Charset': 'utf-8'
+        })
+        self.records = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, model_url: str) -> "ModelClient":
+        """Return the process-wide client for `model_url`, creating it on first use."""
+        model_url = model_url.rstrip('/')
+        with cls._shared_lock:
+            client = cls._shared.get(model_url)
+            if client is None:
+                client = cls._shared[model_url] = cls(model_url)
+            return client
+
+    def slot_for(self, key: str) -> int:
+        """Stable server slot for `key`: callers get slots in order of first use, wrapping around."""
+        with self._lock:
+            if key not in self._slot_of:
+                self._slot_of[key] = len(self._slot_of) % self.slots
+            return self._slot_of[key]
+
+    def chat(self, payload: dict, slot_key: str = None) -> Optional[str]:
+        """
+        POST a chat completion and return the message content.
+
+        Returns None when every attempt failed or the server reported a
+        context-length error (retrying that cannot succeed).
+
+        Args:
+            payload (dict): Chat completion request body.
+            slot_key (str): Caller name used to pin the request to a server slot
+                (only when the client was created with `slots`).
+        """
+        try:
+            return self.complete(payload, slot_key)
+        except ContextLengthError:
+            return None
+
+    def complete(self, payload: dict, slot_key: str = None) -> Optional[str]:
+        """Like `chat`, but raise ContextLengthError instead of returning None on a context-length error."""
+        if self.slots and slot_key is not None:
+            payload = {**payload, "id_slot": self.slot_for(slot_key)}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages", []))
+        attempt = 0
+        while attempt < self.retries:
+            start = time.perf_counter()
+            try:
+                print(f"📡 Enviando request (tentativa {attempt+1}): {body[:200].decode('utf-8', 'ignore')}... (~{prompt_chars // 4} tokens)")
+                with _request_limiter or contextlib.nullcontext():
+                    response = self.session.post(f"{self.model_url}/v1/chat/completions", data=body, timeout=self.timeout)
+                response.raise_for_status()
+                response.encoding = 'utf-8'
+                response_json = response.json()
+                content = response_json["choices"][0]["message"]["content"]
+                self._record(time.perf_counter() - start, len(body), len(response.content), response_json.get("usage") or {},
+                             response_json.get("timings") or {})
+                print(f"📥 Resposta recebida: {content[:200]}...")
+                return content
+            except requests.RequestException as e:
+                print(f"❌ Erro na API (tentativa {attempt+1}/{self.retries}): {str(e)}")
+                if hasattr(e.response, 'text'):
+                    print(f"Detalhes do erro: {e.response.text}")
+                    if "context length" in str(e.response.text).lower():
+                        print("⚠️ Erro de limite de contexto detectado, abortando tentativas.")
+                        raise ContextLengthError(e.response.text) from e
+                    rejected = [f for f in self.OPTIONAL_FIELDS if f in payload and f in str(e.response.text)]
+                    if rejected:
+                        print(f"⚠️ Servidor não suporta {', '.join(rejected)}, repetindo sem esses campos.")
+                        payload = {k: v for k, v in payload.items() if k not in rejected}
+                        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                        # Não conta como tentativa: o pedido mudou e o campo não volta a ser enviado
+                        continue
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                print(f"❌ Resposta inválida da API (tentativa {attempt+1}/{self.retries}): {str(e)}")
+            if attempt < self.retries - 1:
+                time.sleep(self.backoff ** attempt)
+            attempt += 1
+        print(f"❌ Falha após {self.retries} tentativas.")
+        metrics.count("model_call_failures")
+        return None
+
+    def _record(self, latency: float, bytes_sent: int, bytes_received: int, usage: dict, timings: dict = None):
+        metrics.observe("model_call_s", latency)
+        if timings and "prompt_ms" in timings:
+            # Servidores llama.cpp reportam a avaliação do prompt: é o tempo até ao primeiro token
+            metrics.observe("ttft_s", timings["prompt_ms"] / 1000)
+            metrics.count("cached_prompt_tokens", timings.get("cache_n", 0))
+        metrics.count("model_calls")
+        metrics.count("prompt_tokens", usage.get("prompt_tokens", 0))
+        metrics.count("completion_tokens", usage.get("completion_tokens", 0))
+        progress.add_tokens(usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0))
+        with self._lock:
+            self.records.append({
+                "latency_s": latency,
+                "bytes_sent": bytes_sent,
+                "bytes_received": bytes_received,
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0)
+            })
+
+    def probe(self) -> bool:
+        """Health check: True when GET /v1/models answers within the connect timeout."""
+        try:
+            response = self.session.get(f"{self.model_url}/v1/models", timeout=(self.timeout[0], self.timeout[0]))
+            response.raise_for_status()
+            return True
+        except requests.RequestException:
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            records = list(self.records)
+        return summarize(records)
+
+    def close(self):
+        self.session.close()
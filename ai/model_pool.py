@@ -0,0 +1,193 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from ai.model_client import ContextLengthError, ModelClient, summarize
+from utils.metrics import metrics
+
+def parse_endpoint(spec: str, default_concurrency: int = 1) -> Tuple[str, int]:
+    """Split 'http://host:1234#2' into (url, concurrency cap); without '#N' the default cap applies."""
+    url, _, cap = spec.partition("#")
+    return url.rstrip('/'), int(cap) if cap else default_concurrency
+
+class Endpoint:
+    """One server of a ModelPool: its client, load, latency estimate and circuit state."""
+
+    def __init__(self, url: str, max_concurrency: int, client: ModelClient):
+        self.url = url
+        self.max_concurrency = max(1, max_concurrency)
+        self.client = client
+        self.in_flight = 0
+        self.latency_s = None
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial = False
+        self.requests = 0
+        self.errors = 0
+
+    def state(self, now: float) -> str:
+        if not self.open_until:
+            return "closed"
+        return "open" if now < self.open_until else "half-open"
+
+class ModelPool:
+    """
+    Several OpenAI-compatible endpoints behind the ModelClient interface (`chat`, `stats`, `close`).
+
+    Each request goes to the endpoint with the lowest expected wait,
+    (in-flight + 1) × its moving-average latency, so faster servers take
+    proportionally more batches; endpoints at their concurrency cap are
+    skipped and, when all are, the caller waits for a free one. A failed
+    request is retried on another endpoint when there is one.
+
+    Circuit breaker: after `failure_threshold` consecutive failures an
+    endpoint is left out for `cooldown` seconds, then a single trial request
+    is let through and closes the circuit again if it succeeds. A background
+    thread probes `/v1/models` every `probe_interval` seconds: a failed probe
+    opens the circuit, a successful one lets an open endpoint have its trial
+    request straight away.
+
+    Args:
+        endpoints (list): Server URLs, each optionally suffixed with '#N' as its concurrency cap.
+        concurrency (int): Cap of endpoints without '#N'.
+        connect_timeout (float): Seconds to wait for the TCP connection.
+        read_timeout (float): Seconds to wait for the response.
+        retries (int): Attempts per request, across endpoints.
+        backoff (float): Base of the exponential sleep once every endpoint was tried.
+        failure_threshold (int): Consecutive failures that open an endpoint's circuit.
+        cooldown (float): Seconds an open circuit stays open.
+        probe_interval (float): Seconds between health probes (0 disables them).
+        slots (int): Server slots per endpoint, as in ModelClient.
+    """
+
+    _shared: Dict[Tuple[str, ...], "ModelPool"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, endpoints: List[str], concurrency: int = 4, connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0, retries: int = 3, backoff: float = 2.0, failure_threshold: int = 3,
+                 cooldown: float = 30.0, probe_interval: float = 15.0, slots: int = 0):
+        self.endpoints = []
+        for spec in endpoints:
+            url, cap = parse_endpoint(spec, concurrency)
+            # Uma tentativa por servidor: é o pool que decide onde repetir
+            client = ModelClient(url, pool_size=cap, connect_timeout=connect_timeout, read_timeout=read_timeout,
+                                 retries=1, slots=slots)
+            self.endpoints.append(Endpoint(url, cap, client))
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._condition = threading.Condition()
+        self._closed = threading.Event()
+        if probe_interval > 0:
+            threading.Thread(target=self._probe_loop, args=(probe_interval,), daemon=True).start()
+
+    @classmethod
+    def shared(cls, endpoints: List[str]) -> "ModelPool":
+        """Return the process-wide pool for `endpoints`, creating it on first use."""
+        key = tuple(endpoints)
+        with cls._shared_lock:
+            pool = cls._shared.get(key)
+            if pool is None:
+                pool = cls._shared[key] = cls(list(endpoints))
+            return pool
+
+    def chat(self, payload: dict, slot_key: str = None) -> Optional[str]:
+        """
+        Send a chat completion to the best available endpoint and return the message content.
+
+        Returns None when every attempt failed, no endpoint is available or
+        the prompt does not fit the context (no endpoint would accept it).
+        """
+        tried = set()
+        for attempt in range(self.retries):
+            if attempt and len(tried) == len(self.endpoints):
+                time.sleep(self.backoff ** (attempt - 1))
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                print("❌ Nenhum servidor do modelo disponível (circuitos abertos).")
+                break
+            tried.add(endpoint.url)
+            start = time.perf_counter()
+            try:
+                content = endpoint.client.complete(payload, slot_key)
+            except ContextLengthError:
+                self._release(endpoint, None, ok=True)
+                return None
+            self._release(endpoint, time.perf_counter() - start, ok=content is not None)
+            if content is not None:
+                return content
+            metrics.count("pool_failovers")
+        metrics.count("pool_failures")
+        return None
+
+    def _acquire(self, tried: set) -> Optional[Endpoint]:
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                usable = [e for e in self.endpoints
+                          if e.state(now) == "closed" or (e.state(now) == "half-open" and not e.trial)]
+                if not usable:
+                    return None
+                # Prefere servidores ainda não tentados neste pedido
+                candidates = [e for e in usable if e.url not in tried] or usable
+                free = [e for e in candidates if e.in_flight < e.max_concurrency]
+                if free:
+                    endpoint = min(free, key=lambda e: ((e.in_flight + 1) * (e.latency_s or 0.0), e.in_flight))
+                    endpoint.trial = endpoint.state(now) == "half-open"
+                    endpoint.in_flight += 1
+                    return endpoint
+                self._condition.wait(timeout=1.0)
+
+    def _release(self, endpoint: Endpoint, latency: Optional[float], ok: bool):
+        with self._condition:
+            endpoint.in_flight -= 1
+            endpoint.requests += 1
+            if ok:
+                endpoint.failures = 0
+                endpoint.open_until = 0.0
+                if latency is not None:
+                    endpoint.latency_s = latency if endpoint.latency_s is None else 0.8 * endpoint.latency_s + 0.2 * latency
+            else:
+                endpoint.errors += 1
+                endpoint.failures += 1
+                if endpoint.trial or endpoint.failures >= self.failure_threshold:
+                    self._trip(endpoint, f"{endpoint.failures} falhas seguidas")
+            endpoint.trial = False
+            self._condition.notify_all()
+
+    def _trip(self, endpoint: Endpoint, reason: str):
+        endpoint.open_until = time.monotonic() + self.cooldown
+        metrics.count("circuit_opened")
+        print(f"🔌 Circuito aberto para {endpoint.url} ({reason}) durante {self.cooldown:.0f}s")
+
+    def probe(self):
+        """Health-check every endpoint once and update the circuits."""
+        for endpoint in self.endpoints:
+            healthy = endpoint.client.probe()
+            with self._condition:
+                now = time.monotonic()
+                if healthy and endpoint.state(now) == "open":
+                    endpoint.open_until = now
+                elif not healthy and endpoint.state(now) == "closed":
+                    self._trip(endpoint, "sem resposta em /v1/models")
+                self._condition.notify_all()
+
+    def _probe_loop(self, interval: float):
+        while not self._closed.wait(interval):
+            self.probe()
+
+    def stats(self) -> dict:
+        records = [r for endpoint in self.endpoints for r in list(endpoint.client.records)]
+        now = time.monotonic()
+        with self._condition:
+            per_endpoint = [
+                {"url": e.url, "requests": e.requests, "errors": e.errors, "state": e.state(now),
+                 "latency_avg_s": e.latency_s}
+                for e in self.endpoints
+            ]
+        return {**summarize(records), "endpoints": per_endpoint}
+
+    def close(self):
+        self._closed.set()
+        for endpoint in self.endpoints:
+            endpoint.client.close()
@@ -0,0 +1,70 @@
+# JSON Schemas enviados em response_format para o servidor gerar saída estruturada
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}, "maxItems": 3}
+
+REFLECTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "recent_reflections": {
+            "type": "array",
+            "maxItems": 2,
+            "items": {
+                "type": "object",
+                "properties": {"date": {"type": "string"}, "text": {"type": "string"}},
+                "required": ["date", "text"]
+            }
+        }
+    },
+    "required": ["recent_reflections"]
+}
+
+PROFILE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "personality": {
+            "type": "object",
+            "properties": {"traits": _STRING_LIST, "description": {"type": "string"}},
+            "required": ["traits", "description"]
+        },
+        "core_values": {
+            "type": "array",
+            "maxItems": 3,
+            "items": {
+                "type": "object",
+                "properties": {"value": {"type": "string"}, "description": {"type": "string"}},
+                "required": ["value", "description"]
+            }
+        },
+        "emotional_patterns": {
+            "type": "array",
+            "maxItems": 3,
+            "items": {
+                "type": "object",
+                "properties": {"emotion": {"type": "string"}, "triggers": _STRING_LIST, "description": {"type": "string"}},
+                "required": ["emotion", "triggers", "description"]
+            }
+        },
+        "relational_dynamics": {
+            "type": "object",
+            "properties": {"strengths": _STRING_LIST, "challenges": _STRING_LIST, "patterns": _STRING_LIST},
+            "required": ["strengths", "challenges", "patterns"]
+        }
+    },
+    "required": ["personality", "core_values", "emotional_patterns", "relational_dynamics"]
+}
+
+REPORT_SCHEMA = {
+    "type": "object",
+    "properties": {"strengths": _STRING_LIST, "challenges": _STRING_LIST, "advice": _STRING_LIST},
+    "required": ["strengths", "challenges", "advice"]
+}
+
+def joint_reflections_schema(names: list) -> dict:
+    return {
+        "type": "object",
+        "properties": {name: REFLECTIONS_SCHEMA for name in names},
+        "required": list(names)
+    }
+
+def response_format(name: str, schema: dict) -> dict:
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
@@ -1,23 +1,321 @@
-from flask import Flask, render_template
+from flask import Flask, Response, render_template, request, jsonify
+from datetime import datetime
+import hashlib
 import os
 import json
+import re
+import threading
+from ai.model_pool import parse_endpoint
+from utils.conversation_snapshot import SNAPSHOT_NAME, load_snapshot
+from utils.job_runner import JobRunner
 
 app = Flask(__name__)
 
+REPORTS_DIR = "reports"
+_REPORT_NAME = re.compile(r"^report_(\d{4})-(\d{2})(?:-(\d{2}))?\.json$")
+
+def report_sort_key(name):
+    # report_YYYY-MM-DD (diário) e report_YYYY-WW (semana ISO, ordenada pelo seu domingo)
+    match = _REPORT_NAME.match(name)
+    if not match:
+        return None
+    year, middle, day = match.groups()
+    try:
+        if day is not None:
+            return datetime(int(year), int(middle), int(day)), name
+        return datetime.fromisocalendar(int(year), int(middle), 7), name
+    except ValueError:
+        return None
+
+class ReportIndex:
+    """
+    Sorted index of the report files plus a cache of the parsed reports.
+
+    The listing is rebuilt only when the directory's mtime changes (a report
+    was added or removed); a parsed report is re-read only when its own mtime
+    or size changes (a report rewritten in place). A missing directory is an
+    empty index.
+
+    Args:
+        directory (str): Folder holding the report_*.json files.
+    """
+
+    def __init__(self, directory=REPORTS_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._names = []
+        self._parsed = {}
+
+    def names(self):
+        """Report file names, newest first."""
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            dir_mtime = None
+        with self._lock:
+            if dir_mtime != self._dir_mtime:
+                keys = []
+                if dir_mtime is not None:
+                    keys = [key for key in map(report_sort_key, os.listdir(self.directory)) if key is not None]
+                keys.sort(reverse=True)
+                self._names = [name for _, name in keys]
+                current = set(self._names)
+                self._parsed = {name: entry for name, entry in self._parsed.items() if name in current}
+                self._dir_mtime = dir_mtime
+            return self._names
+
+    def load(self, name):
+        """Return (report, stat) for `name`, parsing it only if it changed since the last call."""
+        path = os.path.join(self.directory, name)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._parsed.get(name)
+            if entry is not None and entry[0] == signature:
+                return entry[1], stat
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        with self._lock:
+            self._parsed[name] = (signature, report)
+        return report, stat
+
+    def latest(self):
+        for name in self.names():
+            try:
+                report, stat = self.load(name)
+                return name, report, stat
+            except (OSError, json.JSONDecodeError):
+                continue
+        return None
+
+    def signature(self, names):
+        """ETag seed covering the listing and the files in `names`."""
+        parts = [str(self._dir_mtime)]
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+                parts.append(f"{name}:{stat.st_mtime_ns}:{stat.st_size}")
+            except FileNotFoundError:
+                parts.append(f"{name}:-")
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+report_index = ReportIndex()
+
 def load_latest_report():
-    # Procura o arquivo de relatório mais recente na pasta "reports/"
-    files = [f for f in os.listdir("reports") if f.startswith("report_") and f.endswith(".json")]
-    if not files:
+    latest = report_index.latest()
+    if latest is None:
         return "Nenhum relatório encontrado."
-    files.sort(reverse=True)
-    with open(os.path.join("reports", files[0]), "r", encoding="utf-8") as f:
-        report = json.load(f)
-    return report
+    return latest[1]
+
+def _conditional(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = datetime.fromtimestamp(last_modified)
+    response.cache_control.no_cache = True  # Revalidar sempre; um 304 custa apenas os cabeçalhos
+    return response.make_conditional(request)
 
 @app.route("/")
 def home():
-    report = load_latest_report()
-    return render_template("index.html", report=report)
+    latest = report_index.latest()
+    if latest is None:
+        return render_template("index.html", report="Nenhum relatório encontrado.")
+    name, report, stat = latest
+    etag = report_index.signature([name])
+    if request.if_none_match.contains(etag):
+        # Evita renderizar o template quando o cliente já tem esta versão
+        return _conditional(app.response_class(status=304), etag, stat.st_mtime)
+    response = app.make_response(render_template("index.html", report=report))
+    return _conditional(response, etag, stat.st_mtime)
+
+@app.route("/api/reports")
+def api_reports():
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 20, type=int), 1), 100)
+    names = report_index.names()
+    page_names = names[(page - 1) * per_page:page * per_page]
+    etag = report_index.signature(page_names) + f"-{page}-{per_page}"
+    if request.if_none_match.contains(etag):
+        return _conditional(app.response_class(status=304), etag)
+    reports = []
+    for name in page_names:
+        try:
+            report, _ = report_index.load(name)
+        except (OSError, json.JSONDecodeError):
+            continue
+        reports.append({"name": name[len("report_"):-len(".json")], "report": report})
+    response = jsonify({
+        "page": page,
+        "per_page": per_page,
+        "total": len(names),
+        "pages": (len(names) + per_page - 1) // per_page,
+        "reports": reports
+    })
+    return _conditional(response, etag)
+
+# === Mensagens da conversa ===
+# O mesmo texto que main.py usa para áudios, para os dois partilharem o snapshot
+AUDIO_PLACEHOLDER = "[Mensagem de áudio]"
+# Só as conversas dentro desta pasta podem ser lidas ou analisadas pela API
+CONVERSATIONS_ROOT = "data"
+
+def conversation_dir(value):
+    """Resolve a requested conversation folder, which must be CONVERSATIONS_ROOT or a folder inside it."""
+    if not isinstance(value, str):
+        raise ValueError(f"Pasta de conversa inválida: {value}")
+    root, path = os.path.realpath(CONVERSATIONS_ROOT), os.path.realpath(value)
+    if os.path.commonpath([root, path]) != root or not os.path.isdir(path):
+        raise ValueError(f"Pasta de conversa inválida: {value}")
+    return path
+
+class SnapshotIndex:
+    """
+    The mapped snapshot of each conversation folder, kept between requests.
+
+    A folder is mapped again only when its snapshot or one of its JSON files
+    changes (mtime or size). Snapshots are only read here, and checked with
+    stat calls alone: a folder without one that is current by that check is
+    None, and (re)building it is left to an ingest job.
+
+    Args:
+        audio_placeholder (str): Content used for audio-only messages (part of the snapshot key).
+    """
+
+    def __init__(self, audio_placeholder=AUDIO_PLACEHOLDER):
+        self.audio_placeholder = audio_placeholder
+        self._lock = threading.Lock()
+        self._loaded = {}
+
+    @staticmethod
+    def signature(directory):
+        parts = []
+        for name in sorted(os.listdir(directory)):
+            if name == SNAPSHOT_NAME or name.endswith(".json"):
+                stat = os.stat(os.path.join(directory, name))
+                parts.append((name, stat.st_mtime_ns, stat.st_size))
+        return tuple(parts)
+
+    def load(self, directory):
+        """Return the conversation of `directory`, mapping its snapshot only if it changed since the last call."""
+        try:
+            signature = self.signature(directory)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._loaded.get(directory)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+        data = load_snapshot(directory, self.audio_placeholder, stat_only=True)
+        with self._lock:
+            if data is None:
+                self._loaded.pop(directory, None)
+            else:
+                self._loaded[directory] = (signature, data)
+        return data
+
+snapshot_index = SnapshotIndex()
+
+def _date_ms(value):
+    return None if value is None else int(datetime.strptime(value, "%Y-%m-%d").timestamp() * 1000)
+
+@app.route("/api/messages")
+def api_messages():
+    # Lidas do snapshot binário mapeado em memória; sem snapshot atual não lê a exportação nem cria trabalhos
+    try:
+        data_dir = conversation_dir(request.args.get("data_dir", CONVERSATIONS_ROOT))
+        since_ms, until_ms = _date_ms(request.args.get("since")), _date_ms(request.args.get("until"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    limit = min(max(request.args.get("limit", 100, type=int), 1), 500)
+    data = snapshot_index.load(data_dir)
+    if data is None:
+        if not any(name.endswith(".json") for name in os.listdir(data_dir)):
+            return jsonify({"error": f"Nenhum ficheiro JSON encontrado em {data_dir}"}), 404
+        return jsonify({"error": "Sem snapshot atual das mensagens; crie-o com POST /api/jobs e {\"ingest_only\": true}"}), 409
+    messages = data["messages"].time_range(since_ms, until_ms)
+    return jsonify({
+        "participants": [participant["name"] for participant in data["participants"]],
+        "total": len(messages),
+        "offset": offset,
+        "limit": limit,
+        "messages": list(messages[offset:offset + limit])
+    })
+
+# === Trabalhos de análise em segundo plano ===
+JOB_WORKERS = 1
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_runner():
+    # Criado no primeiro pedido: importar a app não arranca processos
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner(max_workers=JOB_WORKERS)
+        return _runner
+
+def job_argv(spec):
+    """Translate a job request into main.py arguments, rejecting anything unexpected."""
+    argv = ["--data-dir", conversation_dir(spec.get("data_dir", CONVERSATIONS_ROOT))]
+    for key in ("since", "until"):
+        if spec.get(key) is not None:
+            datetime.strptime(spec[key], "%Y-%m-%d")
+            argv += [f"--{key}", spec[key]]
+    if spec.get("model_url"):
+        parse_endpoint(str(spec["model_url"]))  # '#N' tem de ser um número
+        argv += ["--model-url", str(spec["model_url"])]
+    if spec.get("concurrency") is not None:
+        argv += ["--concurrency", str(int(spec["concurrency"]))]
+    for flag in ("tree", "joint", "backfill", "prefilter", "full", "ingest_only"):
+        if spec.get(flag):
+            argv.append(f"--{flag.replace('_', '-')}")
+    return argv
+
+def _public(job):
+    return {k: v for k, v in job.items() if k != "version"}
+
+@app.route("/api/jobs", methods=["POST"])
+def create_job():
+    try:
+        argv = job_argv(request.get_json(silent=True) or {})
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    job_id = get_runner().submit(argv)
+    return jsonify(_public(get_runner().get(job_id))), 202
+
+@app.route("/api/jobs")
+def list_jobs():
+    return jsonify([_public(job) for job in get_runner().list()])
+
+@app.route("/api/jobs/<job_id>")
+def get_job(job_id):
+    job = get_runner().get(job_id)
+    if job is None:
+        return jsonify({"error": "Trabalho não encontrado"}), 404
+    return jsonify(_public(job))
+
+@app.route("/api/jobs/<job_id>/events")
+def job_events(job_id):
+    runner = get_runner()
+    job = runner.get(job_id)
+    if job is None:
+        return jsonify({"error": "Trabalho não encontrado"}), 404
+
+    def stream(job):
+        # Server-Sent Events: um evento por mudança; comentário de keep-alive quando nada muda
+        while job is not None:
+            yield f"event: {job['state']}\ndata: {json.dumps(_public(job), ensure_ascii=False)}\n\n"
+            if job["state"] in ("done", "failed"):
+                return
+            version = job["version"]
+            job = runner.wait(job_id, version)
+            while job is not None and job["version"] == version:
+                yield ": keep-alive\n\n"
+                job = runner.wait(job_id, version)
+
+    return Response(stream(job), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # threaded: os relatórios continuam a ser servidos enquanto um trabalho corre
+    app.run(debug=True, threaded=True, use_reloader=False)
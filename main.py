@@ -1,92 +1,161 @@
+import argparse
+import copy
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from ai.ai_participant import ParticipantAI, participant_slug
+# RuiAI e MariaAI registam-se em ParticipantAI ao serem importadas
 from ai.ai_rui import RuiAI
 from ai.ai_maria import MariaAI
 from ai.ai_relational import RelationalAI
+from ai.ai_joint import JointAI
+from ai.model_client import ModelClient
+from ai.model_pool import ModelPool, parse_endpoint
+from utils.concurrent_analysis import analyze_concurrently
+from utils.conversation_scheduler import find_conversations, run_conversations, strip_scheduler_args
+from utils.tree_reduce import analyze_tree
+from utils.salience import select_salient
+from utils.conversation_snapshot import load_conversation
+from utils.message_store import MessageStore
+from utils.interaction_blocks import InteractionBlocks
+from utils.batch_planner import BatchPlanner
+from utils.metrics import metrics
+from utils.response_cache import ResponseCache
+from utils.stack_manager import week_partitions, week_start
+from utils.memory_journal import MemoryCorruptError, load_journaled, save_journaled
 import time
 
 # === UTILS ===
 def load_memory(path):
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            try:
-                data = json.loads(content)
-                print(f"📂 Carregado {path}: {json.dumps(data, ensure_ascii=False)[:200]}...")
-                if path.endswith('relational_memory.json'):
-                    if "relational_dynamics" in data and not isinstance(data["relational_dynamics"], list):
-                        print(f"⚠️ 'relational_dynamics' inválido em {path}, corrigindo para lista")
-                        data["relational_dynamics"] = []
-                return data
-            except json.JSONDecodeError:
-                print(f"⚠️ Erro ao parsear {path}, retornando vazio")
-                return {}
-    print(f"📂 {path} não existe, retornando vazio")
-    return {}
-
-def save_memory(path, ai_memory):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(ai_memory, f, indent=2, ensure_ascii=False)
-    print(f"💾 Memória salva em {path}")
+    # Snapshot + journal (utils.memory_journal); None se o snapshot estiver corrompido
+    try:
+        data = load_journaled(path)
+    except MemoryCorruptError as e:
+        print(f"❌ {str(e)}. Restaure ou apague o ficheiro; a memória não será regenerada automaticamente.")
+        return None
+    if not data:
+        print(f"📂 {path} não existe, retornando vazio")
+        return {}
+    print(f"📂 Carregado {path}: {json.dumps(data, ensure_ascii=False)[:200]}...")
+    if path.endswith('relational_memory.json'):
+        if "relational_dynamics" in data and not isinstance(data["relational_dynamics"], list):
+            print(f"⚠️ 'relational_dynamics' inválido em {path}, corrigindo para lista")
+            data["relational_dynamics"] = []
+    return data
+
+def save_memory(path, ai_memory, watermarks=None):
+    if watermarks is not None:
+        ai_memory = {**ai_memory, "watermarks": watermarks}
+    written = save_journaled(path, ai_memory)
+    print(f"💾 Memória salva em {path} ({written} alterações no journal)")
 
-def save_report(report):
-    today = datetime.today().strftime('%Y-%m-%d')
-    path = f'reports/report_{today}.json'
+def pop_watermarks(*memories):
+    # Cada ficheiro de memória guarda {conversa: último timestamp_ms processado};
+    # vale o menor, para nunca saltar mensagens que uma das memórias ainda não viu
+    watermarks = {}
+    for index, memory in enumerate(memories):
+        memory_watermarks = memory.pop("watermarks", {}) if isinstance(memory, dict) else {}
+        if index == 0:
+            watermarks = dict(memory_watermarks)
+            continue
+        for conversation in list(watermarks):
+            if conversation in memory_watermarks:
+                watermarks[conversation] = min(watermarks[conversation], memory_watermarks[conversation])
+            else:
+                del watermarks[conversation]
+    return watermarks
+
+def save_report(report, label=None, reports_dir="reports"):
+    # label: data do dia por omissão, ou semana ISO (YYYY-WW) no backfill
+    label = label or datetime.today().strftime('%Y-%m-%d')
+    path = os.path.join(reports_dir, f'report_{label}.json')
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, 'w', encoding='utf-8') as f:
         json.dump(report, f, indent=2, ensure_ascii=False)
     print(f"📊 Relatório salvo em {path}")
+    return path
 
-def load_conversations(directory):
-    merged_data = {"participants": [], "messages": []}
-    name_mapping = {"Maria Passos": "Maria", "Rui Silva": "Rui"}
-    json_files = [f for f in os.listdir(directory) if f.endswith('.json')]
-    if not json_files:
-        raise FileNotFoundError(f"Nenhum arquivo JSON encontrado em {directory}")
-    for json_file in json_files:
-        file_path = os.path.join(directory, json_file)
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                for participant in data.get("participants", []):
-                    name = participant.get("name")
-                    normalized_name = name_mapping.get(name, name)
-                    if not any(p["name"] == normalized_name for p in merged_data["participants"]):
-                        merged_data["participants"].append({"name": normalized_name})
-                for message in data.get("messages", []):
-                    normalized_message = {
-                        "sender_name": name_mapping.get(message.get("sender_name"), message.get("sender_name")),
-                        "timestamp_ms": message.get("timestamp_ms"),
-                        "content": message.get("content", "[Mensagem de áudio]" if message.get("audio_files") else ""),
-                        "reactions": message.get("reactions", [])
-                    }
-                    merged_data["messages"].append(normalized_message)
-        except json.JSONDecodeError:
-            print(f"⚠️ Erro ao parsear {file_path}, pulando arquivo")
-            continue
-    merged_data["messages"].sort(key=lambda x: x["timestamp_ms"])
-    return merged_data
-
-def create_interaction_blocks(messages: list, max_blocks: int = None):
-    blocks = []
-    for i in range(len(messages) - 1):
-        input_msg = messages[i]
-        response_msg = messages[i + 1]
-        if input_msg["sender_name"] != response_msg["sender_name"]:
-            blocks.append({
-                "input": {
-                    "sender": input_msg["sender_name"],
-                    "timestamp_ms": input_msg["timestamp_ms"],
-                    "message": input_msg.get("content", "")
-                },
-                "response": {
-                    "sender": response_msg["sender_name"],
-                    "timestamp_ms": response_msg["timestamp_ms"],
-                    "message": response_msg.get("content", "")
-                }
-            })
+def save_metrics(report_path, extra=None, reports_dir="reports"):
+    # reports/report_<data>.json -> reports/metrics_<data>.json; sem relatório (nada novo, backfill, erro): metrics_last_run.json
+    if report_path is None:
+        metrics.save(os.path.join(reports_dir, "metrics_last_run.json"), extra)
+        return
+    directory, name = os.path.split(report_path)
+    metrics.save(os.path.join(directory, name.replace("report_", "metrics_", 1)), extra)
+
+def build_client(args):
+    # Vários servidores, ou um só com limite '#N': ModelPool (é ele que aplica o limite); senão ModelClient
+    model_urls = args.model_url or [MODEL_URL]
+    if len(model_urls) > 1 or "#" in model_urls[0]:
+        client = ModelPool(model_urls, concurrency=args.concurrency, connect_timeout=args.connect_timeout,
+                           read_timeout=args.read_timeout, slots=args.slots)
+        return [endpoint.url for endpoint in client.endpoints], client
+    model_url, _ = parse_endpoint(model_urls[0])
+    client = ModelClient(model_url, pool_size=args.concurrency, connect_timeout=args.connect_timeout,
+                         read_timeout=args.read_timeout, slots=args.slots)
+    return model_url, client
+
+def build_personas(names, memories, model_url, cache, client):
+    # Um analisador por participante; Rui e Maria usam as suas subclasses
+    return [
+        ParticipantAI.for_participant(name, [other for other in names if other != name], memories.get(name),
+                                      model_url, cache, client)
+        for name in names
+    ]
+
+def backfill_week(label, blocks, names, memories, relational_memory, model_url, cache, client, reports_dir="reports"):
+    # Cada semana trabalha sobre cópias: as memórias em disco não são alteradas
+    personas = build_personas(names, copy.deepcopy(memories), model_url, cache, client)
+    ai_relational = RelationalAI(memory=copy.deepcopy(relational_memory), model_url=model_url, cache=cache,
+                                 client=client, names=names)
+    planner = BatchPlanner(blocks)
+    feedbacks = [persona.analyze(blocks, planner) for persona in personas]
+    report = ai_relational.generate_feedback(*feedbacks)
+    report["week"] = label
+    return save_report(report, label, reports_dir)
+
+def backfill_reports(messages: MessageStore, blocks: InteractionBlocks, names, memories, relational_memory, model_url,
+                     cache, client, max_workers=1, reports_dir="reports"):
+    """
+    Write report_YYYY-WW.json in `reports_dir` for every past calendar week without one.
+
+    Weeks run in parallel, each on the blocks that start in its own partition.
+    """
+    weeks = week_partitions(messages, until=week_start(datetime.now()))
+    pending = [(label, start, stop) for label, start, stop in weeks
+               if not os.path.exists(os.path.join(reports_dir, f'report_{label}.json'))]
+    print(f"🗓 Backfill: {len(weeks)} semanas com mensagens, {len(pending)} sem relatório, {max_workers} workers")
+    written = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for label, start, stop in pending:
+            week_blocks = blocks.within(start, stop)
+            if week_blocks:
+                futures[executor.submit(backfill_week, label, week_blocks, names, memories, relational_memory,
+                                        model_url, cache, client, reports_dir)] = label
+        for future, label in futures.items():
+            try:
+                written.append(future.result())
+            except Exception as e:
+                print(f"❌ Erro no backfill da semana {label}: {str(e)}")
+    print(f"🗓 Backfill concluído: {len(written)} relatórios")
+    return written
+
+AUDIO_PLACEHOLDER = "[Mensagem de áudio]"
+
+def load_conversations(directory, max_workers=None, use_snapshot=True):
+    # Snapshot binário (utils.conversation_snapshot) enquanto a exportação não mudar
+    data = load_conversation(directory, AUDIO_PLACEHOLDER, max_workers, use_snapshot)
+    if data["from_snapshot"]:
+        print(f"⚡ Mensagens carregadas do snapshot em {directory}")
+    elif data["duplicates"]:
+        print(f"🧹 {data['duplicates']} mensagens duplicadas removidas")
+    return data
+
+def create_interaction_blocks(messages: MessageStore, max_blocks: int = None):
+    # Vista por índices: cada par de turnos adjacentes (mensagens seguidas do mesmo remetente) é um bloco
+    blocks = InteractionBlocks(messages)
     if max_blocks is not None:
         print(f"📏 Total de blocos gerados: {len(blocks)}, limitando a {max_blocks}")
         return blocks[:max_blocks]
@@ -96,94 +165,253 @@ def create_interaction_blocks(messages: list, max_blocks: int = None):
 # === INÍCIO DO SCRIPT ===
 MODEL_URL = "http://192.168.56.1:1234"
 
-def main():
-    # Carregar memórias
-    rui_memory = load_memory('data/rui_memory.json')
-    maria_memory = load_memory('data/maria_memory.json')
-    relational_memory = load_memory('data/relational_memory.json')
-    if not relational_memory:
-        relational_memory = {
-            "rui_profile": {},
-            "maria_profile": {},
-            "relational_dynamics": []
-        }
-        print("📂 Inicializando relational_memory padrão")
+def date_ms(value):
+    return int(datetime.strptime(value, "%Y-%m-%d").timestamp() * 1000)
 
-    # Inicializar AIs
-    ai_rui = RuiAI(memory=rui_memory, model_url=MODEL_URL)
-    ai_maria = MariaAI(memory=maria_memory, model_url=MODEL_URL)
-    ai_relational = RelationalAI(memory=relational_memory, model_url=MODEL_URL)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Análise relacional das conversas do Instagram")
+    parser.add_argument("--model-url", action="append", default=None,
+                        help="URL base de um servidor compatível com OpenAI; repetir para repartir os pedidos por "
+                             "vários servidores (sufixo #N limita os pedidos simultâneos desse servidor)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Número máximo de pedidos simultâneos ao modelo (1 = sequencial)")
+    parser.add_argument("--connect-timeout", type=float, default=5.0,
+                        help="Timeout de ligação ao modelo, em segundos")
+    parser.add_argument("--read-timeout", type=float, default=60.0,
+                        help="Timeout de leitura da resposta do modelo, em segundos")
+    parser.add_argument("--slots", type=int, default=0,
+                        help="Slots do servidor llama.cpp (--parallel); fixa cada IA num slot para reutilizar o prefixo em cache")
+    parser.add_argument("--joint", action="store_true",
+                        help="Analisa cada lote para os dois parceiros num único pedido ao modelo")
+    parser.add_argument("--tree", action="store_true",
+                        help="Resume todos os lotes em árvore, com um resumo limitado por período")
+    parser.add_argument("--fan-in", type=int, default=4,
+                        help="Nós combinados por cada pedido de redução no modo --tree")
+    parser.add_argument("--period", choices=["month", "week", "day"], default="month",
+                        help="Tamanho do período resumido no modo --tree")
+    parser.add_argument("--prefilter", action="store_true",
+                        help="Descarta blocos sem informação (áudios, \"???\", respostas de uma palavra) antes da análise")
+    parser.add_argument("--salience-budget", type=int, default=None,
+                        help="Envia só os blocos mais salientes até este total de tokens (implica --prefilter)")
+    parser.add_argument("--salience-mode", choices=["top", "spread"], default="top",
+                        help="top: melhores blocos no total; spread: orçamento repartido ao longo do tempo")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Desativa a cache persistente de respostas do modelo")
+    parser.add_argument("--cache-path", default="data/response_cache.sqlite",
+                        help="Ficheiro SQLite da cache de respostas")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Gera reports/report_YYYY-WW.json para cada semana passada sem relatório, sem alterar as memórias")
+    parser.add_argument("--data-dir", default="data",
+                        help="Pasta com a exportação da conversa (e as memórias correspondentes)")
+    parser.add_argument("--since", type=date_ms, default=None,
+                        help="Analisa só mensagens a partir desta data (YYYY-MM-DD); não avança a marca de água")
+    parser.add_argument("--until", type=date_ms, default=None,
+                        help="Analisa só mensagens anteriores a esta data (YYYY-MM-DD); não avança a marca de água")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignora a marca de água e reconstrói as memórias com todo o histórico")
+    parser.add_argument("--parse-workers", type=int, default=None,
+                        help="Processos para ler os ficheiros da exportação em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="Ler sempre os JSON da exportação, sem usar nem gravar o snapshot binário")
+    parser.add_argument("--ingest-only", action="store_true",
+                        help="Só lê a exportação e grava o snapshot binário, sem análise")
+    parser.add_argument("--reports-dir", default="reports",
+                        help="Pasta onde os relatórios são escritos")
+    parser.add_argument("--conversations-root", default=None,
+                        help="Analisa todas as conversas (subpastas com message_*.json) desta pasta, em paralelo")
+    parser.add_argument("--processes", type=int, default=2,
+                        help="Conversas analisadas em simultâneo com --conversations-root")
+    parser.add_argument("--llm-concurrency", type=int, default=4,
+                        help="Pedidos ao modelo em curso, no total de todas as conversas, com --conversations-root")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.conversations_root:
+        return run_conversations(find_conversations(args.conversations_root), strip_scheduler_args(argv),
+                                 processes=args.processes, llm_concurrency=args.llm_concurrency,
+                                 reports_root=args.reports_dir)
 
-    # Carregar conversas
+    conversation_dir = args.data_dir
+    conversation_id = os.path.basename(os.path.normpath(conversation_dir))
+
+    # Carregar conversas (os participantes da exportação definem as personas)
     try:
-        conversation_data = load_conversations('data')
-        messages = conversation_data.get("messages", [])
+        with metrics.stage("load_conversations") as stage:
+            conversation_data = load_conversations(conversation_dir, args.parse_workers, not args.no_snapshot)
+            messages = conversation_data["messages"]
+            stage["messages"] = len(messages)
+            stage["duplicates"] = conversation_data["duplicates"]
+            stage["from_snapshot"] = conversation_data["from_snapshot"]
         print(f"🔍 Total de mensagens: {len(messages)}")
     except FileNotFoundError as e:
         print(f"❌ Erro: {str(e)}")
         return
+    if args.ingest_only:
+        return
+    names = [participant["name"] for participant in conversation_data["participants"]]
+    if len(names) < 2:
+        print(f"❌ A conversa precisa de pelo menos 2 participantes (encontrados: {names}).")
+        return
+    print(f"👥 Participantes: {', '.join(names)}")
 
-    # Gerar memórias iniciais, se necessário
-    if not rui_memory or rui_memory == ai_rui.MEMORY_SCHEMA:
-        print("📝 Gerando perfil inicial para Rui...")
-        all_blocks = create_interaction_blocks(messages)
-        if not all_blocks:
-            print("❌ Nenhuma interação válida para gerar perfil de Rui.")
-            return
-        ai_rui.generate_initial_memory(all_blocks)
-        if ai_rui.memory == ai_rui.MEMORY_SCHEMA:
-            print("❌ Falha ao gerar perfil para Rui. Verifique a API.")
+    # Carregar memórias (guardadas junto das conversas que descrevem, uma por participante)
+    memory_paths = {name: os.path.join(conversation_dir, f'{participant_slug(name)}_memory.json') for name in names}
+    relational_path = os.path.join(conversation_dir, 'relational_memory.json')
+    memories = {name: load_memory(path) for name, path in memory_paths.items()}
+    relational_memory = load_memory(relational_path)
+    if relational_memory is None or any(memory is None for memory in memories.values()):
+        return
+    watermarks = pop_watermarks(*memories.values(), relational_memory)
+    if args.full:
+        print("🔁 --full: ignorando marca de água e reconstruindo memórias")
+        memories, relational_memory = {name: {} for name in names}, {}
+        watermarks.pop(conversation_id, None)
+    watermark_ms = watermarks.get(conversation_id)
+    if not relational_memory:
+        print("📂 Inicializando relational_memory padrão")
+
+    # Inicializar AIs
+    cache = None if args.no_cache else ResponseCache(args.cache_path)
+    model_url, client = build_client(args)
+    report_path = None
+    try:
+        personas = build_personas(names, memories, model_url, cache, client)
+        ai_relational = RelationalAI(memory=relational_memory, model_url=model_url, cache=cache, client=client, names=names)
+
+        window = args.since is not None or args.until is not None
+        if window:
+            # Janela temporal: analisa a janela inteira e só escreve o relatório
+            messages = messages.time_range(args.since, args.until)
+            watermark_ms = None
+            print(f"🪟 Janela temporal: {len(messages)} mensagens")
+
+        # Blocos calculados uma única vez; perfil inicial, backfill e análise usam sub-vistas
+        if not messages:
+            print("❌ Nenhuma mensagem para analisar.")
             return
-        save_memory('data/rui_memory.json', ai_rui.memory)
-    if not maria_memory or maria_memory == ai_maria.MEMORY_SCHEMA:
-        print("📝 Gerando perfil inicial para Maria...")
-        all_blocks = create_interaction_blocks(messages)
-        if not all_blocks:
-            print("❌ Nenhuma interação válida para gerar perfil de Maria.")
+        with metrics.stage("create_interaction_blocks") as stage:
+            all_blocks = create_interaction_blocks(messages)
+            stage["blocks"] = len(all_blocks)
+            stage["block_bytes"] = all_blocks.nbytes()
+
+        # Gerar memórias iniciais, se necessário (blocos e formatação partilhados por todas as personas)
+        initial_planner = None
+        for persona in personas:
+            name = persona.SELF_NAME
+            if memories[name] and memories[name] != persona.MEMORY_SCHEMA:
+                continue
+            print(f"📝 Gerando perfil inicial para {name}...")
+            if initial_planner is None:
+                if not all_blocks:
+                    print(f"❌ Nenhuma interação válida para gerar perfil de {name}.")
+                    return
+                initial_planner = BatchPlanner(all_blocks)
+            with metrics.stage("generate_initial_memory"):
+                persona.generate_initial_memory(initial_planner.blocks, initial_planner)
+            if persona.memory == persona.MEMORY_SCHEMA:
+                print(f"❌ Falha ao gerar perfil para {name}. Verifique a API.")
+                return
+            save_memory(memory_paths[name], persona.memory)
+
+        if args.backfill:
+            with metrics.stage("backfill") as stage:
+                written = backfill_reports(messages, all_blocks, names, {p.SELF_NAME: p.memory for p in personas},
+                                           ai_relational.memory, model_url, cache, client, max_workers=args.concurrency,
+                                           reports_dir=args.reports_dir)
+                stage["reports"] = len(written)
+            return written
+
+        # Analisar apenas os blocos que terminam depois da marca de água
+        recent_blocks = all_blocks.after(watermark_ms)
+        if watermark_ms is not None:
+            print(f"🔖 Marca de água: {datetime.fromtimestamp(watermark_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"🔄 Blocos recentes: {len(recent_blocks)}")
+        if not recent_blocks:
+            print("✅ Sem mensagens novas desde a última análise.")
             return
-        ai_maria.generate_initial_memory(all_blocks)
-        if ai_maria.memory == ai_maria.MEMORY_SCHEMA:
-            print("❌ Falha ao gerar perfil para Maria. Verifique a API.")
+        print(f"📋 Amostra do bloco recente 1: {json.dumps(recent_blocks[0], ensure_ascii=False)}")
+        print(f"📋 Amostra de blocos recentes: {json.dumps(list(recent_blocks[:3]), ensure_ascii=False)[:500]}...")
+
+        if args.prefilter or args.salience_budget is not None:
+            with metrics.stage("select_salient") as stage:
+                recent_blocks, salience_stats = select_salient(recent_blocks, args.salience_budget, args.salience_mode)
+                stage.update(salience_stats)
+            print(f"🔎 Saliência: {salience_stats['blocks_kept']}/{salience_stats['blocks_total']} blocos mantidos "
+                  f"({salience_stats['blocks_prefiltered']} sem informação), "
+                  f"{salience_stats['tokens_kept']}/{salience_stats['tokens_total']} tokens")
+            if not recent_blocks:
+                print("⚠️ Nenhum bloco relevante após o filtro de saliência.")
+                return
+
+        # Analisar mensagens: cada linha é formatada e medida uma única vez
+        with metrics.stage("plan_batches"):
+            # Sem marca de água nem filtro os blocos são os do perfil inicial, já formatados
+            planner = initial_planner if recent_blocks is all_blocks and initial_planner else BatchPlanner(recent_blocks)
+        with metrics.stage("analyze"):
+            if args.tree:
+                feedbacks = analyze_tree(personas, recent_blocks, max_workers=args.concurrency,
+                                         planner=planner, fan_in=args.fan_in, granularity=args.period)
+            elif args.joint:
+                ai_joint = JointAI(personas, model_url=model_url, cache=cache, client=client)
+                if args.concurrency > 1:
+                    [joint_feedback] = analyze_concurrently([ai_joint], recent_blocks, max_workers=args.concurrency, planner=planner)
+                else:
+                    joint_feedback = ai_joint.analyze(recent_blocks, planner)
+                feedbacks = [joint_feedback[name] for name in names]
+            elif args.concurrency > 1:
+                feedbacks = analyze_concurrently(personas, recent_blocks, max_workers=args.concurrency, planner=planner)
+            else:
+                feedbacks = [persona.analyze(recent_blocks, planner) for persona in personas]
+        for name, feedback in zip(names, feedbacks):
+            print(f"📜 Feedback {name}: {json.dumps(feedback, ensure_ascii=False)[:200]}...")
+            if not feedback.get("recent_reflections"):
+                print(f"⚠️ Nenhuma reflexão para {name}.")
+        if not all(feedback.get("recent_reflections") for feedback in feedbacks):
+            print("⚠️ Reflexões incompletas, prosseguindo com feedback disponível.")
+
+        # Gerar relatório relacional
+        with metrics.stage("generate_feedback"):
+            final_report = ai_relational.generate_feedback(*feedbacks)
+        print(f"📜 Relatório final: {json.dumps(final_report, ensure_ascii=False)[:200]}...")
+        if not (final_report.get("strengths") or final_report.get("challenges") or final_report.get("advice")):
+            print("❌ Relatório relacional vazio. Verifique a API.")
             return
-        save_memory('data/maria_memory.json', ai_maria.memory)
 
-    # Usar toda a conversa para análise
-    recent_blocks = create_interaction_blocks(messages)
-    print(f"🔄 Blocos recentes: {len(recent_blocks)}")
-    if recent_blocks:
-        print(f"📋 Amostra do bloco recente 1: {json.dumps(recent_blocks[0], ensure_ascii=False)}")
-        print(f"📋 Amostra de blocos recentes: {json.dumps(recent_blocks[:3], ensure_ascii=False)[:500]}...")
-
-    # Analisar mensagens
-    rui_feedback = ai_rui.analyze(recent_blocks)
-    maria_feedback = ai_maria.analyze(recent_blocks)
-    print(f"📜 Feedback Rui: {json.dumps(rui_feedback, ensure_ascii=False)[:200]}...")
-    print(f"📜 Feedback Maria: {json.dumps(maria_feedback, ensure_ascii=False)[:200]}...")
-    if not rui_feedback.get("recent_reflections"):
-        print("⚠️ Nenhuma reflexão para Rui.")
-    if not maria_feedback.get("recent_reflections"):
-        print("⚠️ Nenhuma reflexão para Maria.")
-    if not (rui_feedback.get("recent_reflections") and maria_feedback.get("recent_reflections")):
-        print("⚠️ Reflexões incompletas, prosseguindo com feedback disponível.")
-
-    # Gerar relatório relacional
-    final_report = ai_relational.generate_feedback(rui_feedback, maria_feedback)
-    print(f"📜 Relatório final: {json.dumps(final_report, ensure_ascii=False)[:200]}...")
-    if not (final_report.get("strengths") or final_report.get("challenges") or final_report.get("advice")):
-        print("❌ Relatório relacional vazio. Verifique a API.")
-        return
+        # Salvar memórias (com a nova marca de água) e relatório
+        with metrics.stage("save"):
+            if window:
+                report_path = save_report(final_report, datetime.fromtimestamp(messages.timestamp(-1) / 1000).strftime('%Y-%m-%d'),
+                                          args.reports_dir)
+            else:
+                watermarks[conversation_id] = messages.timestamp(-1)
+                for persona in personas:
+                    save_memory(memory_paths[persona.SELF_NAME], persona.memory, watermarks)
+                save_memory(relational_path, ai_relational.memory, watermarks)
+                report_path = save_report(final_report, reports_dir=args.reports_dir)
 
-    # Salvar memórias e relatório
-    save_memory('data/rui_memory.json', ai_rui.memory)
-    save_memory('data/maria_memory.json', ai_maria.memory)
-    save_memory('data/relational_memory.json', ai_relational.memory)
-    save_report(final_report)
-
-    # Exibir resumo
-    print("\n=== RESUMO FINAL ===")
-    print(f"🧠 Rui: {json.dumps(rui_feedback, indent=2, ensure_ascii=False)[:200]}...")
-    print(f"🧠 Maria: {json.dumps(maria_feedback, indent=2, ensure_ascii=False)[:200]}...")
-    print(f"❤️ Relacional: {json.dumps(final_report, indent=2, ensure_ascii=False)[:200]}...")
+        # Exibir resumo
+        print("\n=== RESUMO FINAL ===")
+        for name, feedback in zip(names, feedbacks):
+            print(f"🧠 {name}: {json.dumps(feedback, indent=2, ensure_ascii=False)[:200]}...")
+        print(f"❤️ Relacional: {json.dumps(final_report, indent=2, ensure_ascii=False)[:200]}...")
+        return report_path
+    finally:
+        # Todas as saídas passam por aqui: fecha o cliente e a cache (a evicção corre no close) e grava as métricas
+        client_stats = client.stats()
+        print(f"📡 Modelo: {client_stats['requests']} pedidos, {client_stats['latency_total_s']:.1f}s "
+              f"(p50 {client_stats['latency_p50_s']:.1f}s, máx {client_stats['latency_max_s']:.1f}s), "
+              f"{client_stats['bytes_sent'] / 1024:.0f} KiB enviados, {client_stats['bytes_received'] / 1024:.0f} KiB recebidos, "
+              f"{client_stats['prompt_tokens']} tokens de prompt, {client_stats['completion_tokens']} de resposta")
+        for endpoint in client_stats.get("endpoints", []):
+            print(f"   {endpoint['url']}: {endpoint['requests']} pedidos, {endpoint['errors']} erros, circuito {endpoint['state']}")
+        client.close()
+        cache_stats = None
+        if cache is not None:
+            cache_stats = cache.stats()
+            print(f"♻️ Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})")
+            cache.close()
+        save_metrics(report_path, {"model": client_stats, "cache": cache_stats}, args.reports_dir)
 
 if __name__ == "__main__":
     start_time = time.time()
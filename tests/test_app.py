@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import unittest
+import app as dashboard
+from utils.conversation_snapshot import load_conversation
+
+class FakeRunner:
+    def __init__(self):
+        self.jobs = {}
+
+    def submit(self, argv):
+        job_id = str(len(self.jobs) + 1)
+        self.jobs[job_id] = {"id": job_id, "argv": argv, "state": "queued", "version": 0}
+        return job_id
+
+    def get(self, job_id):
+        return dict(self.jobs[job_id])
+
+    def list(self):
+        return [dict(job) for job in self.jobs.values()]
+
+class TestReportServing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "reports")
+        dashboard.report_index = dashboard.ReportIndex(self.directory)
+        dashboard.snapshot_index = dashboard.SnapshotIndex()
+        self.root, dashboard.CONVERSATIONS_ROOT = dashboard.CONVERSATIONS_ROOT, self.tmp.name
+        self.runner, dashboard._runner = dashboard._runner, FakeRunner()
+        self.client = dashboard.app.test_client()
+
+    def tearDown(self):
+        dashboard.CONVERSATIONS_ROOT, dashboard._runner = self.root, self.runner
+        self.tmp.cleanup()
+
+    def write(self, label, report):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"report_{label}.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f)
+
+    def test_missing_directory(self):
+        self.assertEqual(self.client.get("/").status_code, 200)
+        self.assertEqual(self.client.get("/api/reports").get_json()["total"], 0)
+
+    def test_latest_with_etag_and_pagination(self):
+        # 2025-15 termina a 13/04, depois do relatório diário de 12/04
+        for label in ["2025-04-12", "2025-15", "2025-14", "notes"]:
+            self.write(label, {"label": label})
+        response = self.client.get("/")
+        self.assertIn("2025-15", response.get_data(as_text=True))
+        self.assertEqual(self.client.get("/", headers={"If-None-Match": response.headers["ETag"]}).status_code, 304)
+
+        page = self.client.get("/api/reports?page=2&per_page=2").get_json()
+        self.assertEqual((page["total"], page["pages"]), (3, 2))
+        self.assertEqual([r["name"] for r in page["reports"]], ["2025-14"])
+
+        self.write("2025-15", {"label": "2025-15", "advice": ["reescrito"]})
+        response = self.client.get("/", headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("reescrito", response.get_data(as_text=True))
+
+    def test_job_arguments_are_validated(self):
+        self.assertEqual(dashboard.job_argv({"data_dir": self.tmp.name, "since": "2025-01-01", "tree": True, "concurrency": 4}),
+                         ["--data-dir", os.path.realpath(self.tmp.name), "--since", "2025-01-01", "--concurrency", "4", "--tree"])
+        with self.assertRaises(ValueError):
+            dashboard.job_argv({"data_dir": os.path.join(self.tmp.name, "missing")})
+        with self.assertRaises(ValueError):
+            dashboard.job_argv({"data_dir": self.tmp.name, "until": "amanhã"})
+        with self.assertRaises(ValueError):
+            dashboard.job_argv({"data_dir": self.tmp.name, "model_url": "http://box:1234#muitos"})
+        with self.assertRaises(ValueError):
+            dashboard.job_argv({"data_dir": os.path.join(self.tmp.name, "..")})
+
+    def test_messages_are_served_from_the_snapshot(self):
+        export = {"participants": [{"name": "Rui Silva"}, {"name": "Maria Passos"}],
+                  "messages": [{"sender_name": "Rui Silva", "timestamp_ms": 1744114692268, "content": "Até já"},
+                               {"sender_name": "Maria Passos", "timestamp_ms": 1744028292268, "content": "Olá"}]}
+        with open(os.path.join(self.tmp.name, "message_1.json"), "w", encoding="utf-8") as f:
+            json.dump(export, f)
+        # Sem snapshot o GET não lê a exportação, não escreve nada e não cria trabalhos
+        self.assertEqual(self.client.get(f"/api/messages?data_dir={self.tmp.name}").status_code, 409)
+        self.assertEqual(dashboard._runner.list(), [])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "conversation.snapshot")))
+        self.assertEqual(dashboard.job_argv({"data_dir": self.tmp.name, "ingest_only": True}),
+                         ["--data-dir", os.path.realpath(self.tmp.name), "--ingest-only"])
+        load_conversation(self.tmp.name, dashboard.AUDIO_PLACEHOLDER, max_workers=1)  # o que o trabalho faz
+        first = self.client.get(f"/api/messages?data_dir={self.tmp.name}").get_json()
+        self.assertEqual(first["participants"], ["Rui", "Maria"])
+        self.assertEqual([m["content"] for m in first["messages"]], ["Olá", "Até já"])
+        page = self.client.get(f"/api/messages?data_dir={self.tmp.name}&offset=1&limit=1").get_json()
+        self.assertEqual((page["total"], [m["sender_name"] for m in page["messages"]]), (2, ["Rui"]))
+        directory = os.path.realpath(self.tmp.name)
+        self.assertIs(dashboard.snapshot_index.load(directory), dashboard.snapshot_index.load(directory))
+        # Um JSON novo só seria verificado lendo-o: fica para a próxima ingestão, que regrava a chave
+        with open(os.path.join(self.tmp.name, "rui_memory.json"), "w", encoding="utf-8") as f:
+            json.dump({"personality": {}}, f)
+        self.assertEqual(self.client.get(f"/api/messages?data_dir={self.tmp.name}").status_code, 409)
+        self.assertTrue(load_conversation(self.tmp.name, dashboard.AUDIO_PLACEHOLDER, max_workers=1)["from_snapshot"])
+        self.assertEqual(self.client.get(f"/api/messages?data_dir={self.tmp.name}").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/messages?data_dir={self.tmp.name}&since=ontem").status_code, 400)
+        self.assertEqual(self.client.get(f"/api/messages?data_dir={os.path.dirname(self.tmp.name)}").status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
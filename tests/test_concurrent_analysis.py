@@ -0,0 +1,34 @@
+import random
+import time
+import unittest
+from utils.concurrent_analysis import analyze_concurrently
+
+class FakeAI:
+    def __init__(self, name):
+        self.SELF_NAME = name
+
+    def _plan_batches(self, planner):
+        return planner.plan(30)
+
+    def _process_batch(self, conversation_text):
+        time.sleep(random.uniform(0, 0.01))
+        return [{"date": "2025-04-12", "text": line.split("] ", 1)[1]} for line in conversation_text.splitlines()]
+
+    def _merge_reflections(self, all_reflections):
+        return {"recent_reflections": all_reflections}
+
+class TestConcurrentAnalysis(unittest.TestCase):
+    def test_batch_order_is_deterministic(self):
+        blocks = [
+            {"input": {"sender": "Rui", "timestamp_ms": 1744114600000 + i, "message": f"r{i}"},
+             "response": {"sender": "Maria", "timestamp_ms": 1744114600001 + i, "message": f"m{i}"}}
+            for i in range(9)
+        ]
+        rui, maria = analyze_concurrently([FakeAI("Rui"), FakeAI("Maria")], blocks, max_workers=4)
+        expected_rui = [text for i in range(9) for text in (f"Eu: r{i}", f"Maria: m{i}")]
+        expected_maria = [text for i in range(9) for text in (f"Rui: r{i}", f"Eu: m{i}")]
+        self.assertEqual([r["text"] for r in rui["recent_reflections"]], expected_rui)
+        self.assertEqual([r["text"] for r in maria["recent_reflections"]], expected_maria)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import json
+import unittest
+from utils.batch_planner import estimate_tokens
+from utils.context_budget import ContextBudget, compact_memory
+
+class TestContextBudget(unittest.TestCase):
+    def setUp(self):
+        self.memory = {
+            "personality": {"traits": ["calmo", "curioso"], "description": "Sou reservado, mas valorizo conexões." * 3},
+            "recent_reflections": [{"date": f"2025-04-0{i}", "text": "Senti-me próximo hoje. " * 8} for i in range(1, 6)],
+            "period_summaries": {f"2025-{m:02d}": [{"date": f"2025-{m:02d}", "text": "Mês tranquilo. " * 10}] for m in range(1, 13)},
+        }
+
+    def test_compaction_drops_oldest_first(self):
+        compacted, removals = compact_memory(self.memory, 300)
+        self.assertLessEqual(estimate_tokens(json.dumps(compacted, ensure_ascii=False)), 300)
+        self.assertGreater(removals, 0)
+        self.assertIn("2025-12", compacted["period_summaries"])
+        self.assertNotIn("2025-01", compacted["period_summaries"])
+        self.assertEqual(compacted["recent_reflections"][-1]["date"], "2025-04-05")
+        self.assertEqual(len(self.memory["period_summaries"]), 12)  # original intacto
+
+    def test_allocation_fits_the_context(self):
+        budget = ContextBudget(max_context=2000, reserve_output=500)
+        conversation = "\n".join(f"[2025-04-12 10:00:{i:02d}] Eu: mensagem número {i}" for i in range(400))
+        profiles, text = budget.allocate("teste", 100, {"perfil": self.memory}, conversation)
+        profile_tokens = estimate_tokens(profiles["perfil"])
+        self.assertLessEqual(profile_tokens, budget.share("profile"))
+        self.assertLessEqual(100 + profile_tokens + estimate_tokens(text), budget.available)
+        self.assertTrue(conversation.startswith(text))
+
+if __name__ == '__main__':
+    unittest.main()
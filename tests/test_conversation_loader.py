@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import unittest
+from utils.conversation_loader import iter_export_items, load_conversations
+
+EXPORT = {
+    "participants": [{"name": "Maria Passos"}, {"name": "Rui Silva"}],
+    "messages": [
+        {"sender_name": "Rui Silva", "timestamp_ms": 1744114692268, "content": "Eu amo-te â\u009d¤ {[,]}"},
+        {"sender_name": "Maria Passos", "timestamp_ms": 1744114639437, "audio_files": [{"uri": "a.mp4"}]},
+        {"sender_name": "Rui Silva", "timestamp_ms": 1744114600000, "content": "Ok",
+         "reactions": [{"reaction": "ð\u009f\u0098\u0082", "actor": "Maria Passos"}]}
+    ],
+    "title": "Maria Passos",
+    "is_still_participant": True,
+    "magic_words": []
+}
+
+class TestStreamingLoader(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        with open(os.path.join(self.directory, "message_1.json"), "w", encoding="utf-8") as f:
+            json.dump(EXPORT, f, indent=2)
+
+    def test_items_match_json_load_with_tiny_chunks(self):
+        path = os.path.join(self.directory, "message_1.json")
+        for chunk_size in (1, 3, 7, 64):
+            items = list(iter_export_items(path, chunk_size=chunk_size))
+            messages = [v for k, v in items if k == "messages"]
+            others = {k: v for k, v in items if k != "messages"}
+            self.assertEqual(messages, EXPORT["messages"])
+            self.assertEqual(others, {k: v for k, v in EXPORT.items() if k != "messages"})
+
+    def test_load_conversations_normalizes_and_sorts(self):
+        data = load_conversations(self.directory)
+        self.assertEqual(data["participants"], [{"name": "Maria"}, {"name": "Rui"}])
+        timestamps = [m["timestamp_ms"] for m in data["messages"]]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(data["messages"][1]["content"], "[Audio message]")
+
+    def test_overlapping_files_are_merged_without_duplicates(self):
+        # Exportações sobrepostas: message_2 repete a mensagem mais recente e acrescenta outras mais antigas
+        older = dict(EXPORT, messages=[EXPORT["messages"][0],
+                                       {"sender_name": "Maria Passos", "timestamp_ms": 1744114000000, "content": "Olá"},
+                                       {"sender_name": "Rui Silva", "timestamp_ms": 1744110000000, "content": "Bom dia"}])
+        with open(os.path.join(self.directory, "message_2.json"), "w", encoding="utf-8") as f:
+            json.dump(older, f)
+        for max_workers in (1, 2):  # em streaming e com o pool de processos
+            data = load_conversations(self.directory, max_workers=max_workers)
+            self.assertEqual(data["participants"], [{"name": "Maria"}, {"name": "Rui"}])
+            self.assertEqual([m["content"] for m in data["messages"]],
+                             ["Bom dia", "Olá", "Ok", "[Audio message]", "Eu amo-te ❤ {[,]}"])
+
+    def test_mojibake_is_repaired_once_at_load(self):
+        messages = load_conversations(self.directory)["messages"]
+        self.assertEqual(messages[2]["content"], "Eu amo-te ❤ {[,]}")
+        self.assertEqual(messages[0]["reactions"], [{"reaction": "😂", "actor": "Maria Passos"}])
+
+if __name__ == '__main__':
+    unittest.main()
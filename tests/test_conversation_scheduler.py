@@ -0,0 +1,22 @@
+import os
+import tempfile
+import unittest
+from utils.conversation_scheduler import find_conversations, strip_scheduler_args
+
+class TestConversationScheduler(unittest.TestCase):
+    def test_find_conversations(self):
+        with tempfile.TemporaryDirectory() as root:
+            for name, files in [("b_thread", ["message_1.json"]), ("a_thread", ["message_1.json", "rui_memory.json"]),
+                                ("photos", ["image.jpg"])]:
+                os.makedirs(os.path.join(root, name))
+                for f in files:
+                    open(os.path.join(root, name, f), "w").close()
+            self.assertEqual([os.path.basename(d) for d in find_conversations(root)], ["a_thread", "b_thread"])
+
+    def test_scheduler_options_are_not_forwarded(self):
+        argv = ["--conversations-root", "inbox", "--processes=4", "--tree", "--data-dir", "data",
+                "--concurrency", "2", "--llm-concurrency", "8"]
+        self.assertEqual(strip_scheduler_args(argv), ["--tree", "--concurrency", "2"])
+
+if __name__ == '__main__':
+    unittest.main()
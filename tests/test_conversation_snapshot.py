@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+import unittest
+from utils.conversation_snapshot import SNAPSHOT_NAME, load_conversation, load_snapshot
+
+EXPORT = {
+    "participants": [{"name": "Maria Passos"}, {"name": "Rui Silva"}],
+    "messages": [
+        {"sender_name": "Rui Silva", "timestamp_ms": 1744114692268, "content": "Até já"},
+        {"sender_name": "Maria Passos", "timestamp_ms": 1744114639437, "content": "Olá"}
+    ]
+}
+
+class TestConversationSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+        self.write("message_1.json", EXPORT)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def test_snapshot_is_reused_until_the_export_changes(self):
+        first = load_conversation(self.directory)
+        self.assertFalse(first["from_snapshot"])
+        self.assertTrue(os.path.exists(os.path.join(self.directory, SNAPSHOT_NAME)))
+
+        # Memórias gravadas na mesma pasta e um ficheiro apenas tocado não invalidam o snapshot
+        self.write("rui_memory.json", {"personality": {"traits": ["calma"]}})
+        os.utime(os.path.join(self.directory, "message_1.json"), ns=(0, 0))
+        self.assertIsNone(load_snapshot(self.directory, "[Audio message]", stat_only=True))
+        second = load_conversation(self.directory)
+        self.assertTrue(second["from_snapshot"])
+        self.assertIsNotNone(load_snapshot(self.directory, "[Audio message]", stat_only=True))  # chave regravada
+        self.assertEqual(list(second["messages"]), list(first["messages"]))
+        self.assertEqual(second["participants"], [{"name": "Maria"}, {"name": "Rui"}])
+
+        self.write("message_2.json", dict(EXPORT, messages=[
+            {"sender_name": "Rui Silva", "timestamp_ms": 1744000000000, "content": "Bom dia"}]))
+        third = load_conversation(self.directory)
+        self.assertFalse(third["from_snapshot"])
+        self.assertEqual([m["content"] for m in third["messages"]], ["Bom dia", "Olá", "Até já"])
+        self.assertTrue(load_conversation(self.directory)["from_snapshot"])
+
+    def test_other_placeholder_rebuilds(self):
+        load_conversation(self.directory)
+        self.assertFalse(load_conversation(self.directory, audio_placeholder="[Áudio]")["from_snapshot"])
+
+if __name__ == '__main__':
+    unittest.main()
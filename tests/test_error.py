@@ -1,6 +1,10 @@
 import json
+import os
+import tempfile
+import unittest
 from ai.ai_rui import RuiAI
 from ai.ai_maria import MariaAI
+from tools.stub_server import StubModelServer
 
 # Use the problematic block
 blocks = [
@@ -10,16 +14,30 @@ blocks = [
     }
 ]
 
-MODEL_URL = "http://192.168.56.1:1234"
-rui_ai = RuiAI(memory=None, model_url=MODEL_URL)
-maria_ai = MariaAI(memory=None, model_url=MODEL_URL)
+class TestProblematicBlock(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        # Usa os servidores indicados em MODEL_URL (ex.: LM Studio; vários separados por vírgulas); por omissão, o stub local
+        if os.environ.get("MODEL_URL"):
+            self.model_url = os.environ["MODEL_URL"].split(",")
+        else:
+            stub = StubModelServer().start()
+            self.addCleanup(stub.stop)
+            self.model_url = stub.url
 
-print("📝 Gerando memória para Rui...")
-rui_ai.generate_initial_memory(blocks)
-with open('data/rui_memory_test.json', 'w', encoding='utf-8') as f:
-    json.dump(rui_ai.memory, f, indent=2, ensure_ascii=False)
+    def test_initial_memories_are_generated(self):
+        for name, cls in (("rui", RuiAI), ("maria", MariaAI)):
+            print(f"📝 Gerando memória para {name}...")
+            ai = cls(memory=None, model_url=self.model_url)
+            ai.generate_initial_memory(blocks)
+            path = os.path.join(self.directory, f"{name}_memory_test.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(ai.memory, f, indent=2, ensure_ascii=False)
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(json.load(f), ai.memory)
+            self.assertIsInstance(ai.memory, dict)
 
-print("📝 Gerando memória para Maria...")
-maria_ai.generate_initial_memory(blocks)
-with open('data/maria_memory_test.json', 'w', encoding='utf-8') as f:
-    json.dump(maria_ai.memory, f, indent=2, ensure_ascii=False)
\ No newline at end of file
+if __name__ == '__main__':
+    unittest.main()
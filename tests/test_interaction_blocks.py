@@ -0,0 +1,59 @@
+import unittest
+from utils.batch_planner import BatchPlanner
+from utils.interaction_blocks import InteractionBlocks
+from utils.message_store import MessageStore
+from utils.salience import select_salient
+
+def store(*messages):
+    return MessageStore.from_messages(
+        [{"sender_name": sender, "timestamp_ms": i * 1000, "content": content} for i, (sender, content) in enumerate(messages)]
+    )
+
+class TestInteractionBlocks(unittest.TestCase):
+    def test_bursts_are_coalesced_into_turns(self):
+        # Rajada de 3 mensagens do Rui: antes só a última entrava num bloco
+        blocks = InteractionBlocks(store(("Rui", "Olá"), ("Rui", "Estás?"), ("Rui", "Tenho saudades"),
+                                         ("Maria", "Estou!"), ("Rui", "Boa noite"), ("Maria", "Dorme bem")))
+        self.assertEqual(list(blocks.ranges()), [(0, 4), (3, 5), (4, 6)])
+        self.assertEqual(blocks[0]["input"]["message"], "Olá\nEstás?\nTenho saudades")
+        self.assertEqual((blocks[0]["input"]["timestamp_ms"], blocks[0]["response"]["sender"]), (0, "Maria"))
+        text = BatchPlanner(blocks).format(0, len(blocks), "Rui")
+        self.assertEqual(text.count("Eu:"), 3)
+        self.assertEqual(text.count("Boa noite"), 2)  # resposta de um bloco e entrada do seguinte
+
+    def test_every_change_of_sender_is_a_block(self):
+        blocks = InteractionBlocks(store(("Rui", "a"), ("Maria", "b"), ("Rui", "c")))
+        self.assertEqual(list(blocks.ranges()), [(0, 2), (1, 3)])
+        self.assertEqual(len(InteractionBlocks(store(("Rui", "a"), ("Rui", "b")))), 0)
+
+    def test_watermark_weeks_and_salience_return_views(self):
+        messages = store(*[(("Rui", "Maria")[i % 2], f"Sinto a tua falta {i}" if i % 4 else "ok") for i in range(8)])
+        blocks = InteractionBlocks(messages)
+        self.assertEqual(list(blocks.after(2500).ranges()), [(2, 4), (3, 5), (4, 6), (5, 7), (6, 8)])
+        self.assertEqual(list(blocks.within(3, 8).ranges()), [(3, 5), (4, 6), (5, 7), (6, 8)])
+        kept, stats = select_salient(blocks)
+        self.assertIsInstance(kept, InteractionBlocks)
+        self.assertEqual((len(kept), stats["blocks_total"]), (7, 7))
+        self.assertEqual(blocks.nbytes(), 3 * 7 * 8)
+
+    def test_filler_bursts_are_still_prefiltered(self):
+        blocks = InteractionBlocks(store(("Rui", "ok"), ("Rui", "sim"), ("Rui", "???"),
+                                         ("Maria", "[Mensagem de áudio]"), ("Maria", "[Mensagem de áudio]"),
+                                         ("Rui", "Tenho saudades tuas"), ("Maria", "Também sinto a tua falta")))
+        kept, stats = select_salient(blocks)
+        self.assertEqual(list(kept.ranges()), [(3, 6), (5, 7)])
+        self.assertEqual(stats["blocks_prefiltered"], 1)
+
+    def test_analyzed_blocks_are_not_selected_again(self):
+        # Duas execuções: a marca de água é a última mensagem da primeira; depois chega mais uma mensagem
+        messages = [("Rui", "Olá"), ("Maria", "Olá"), ("Rui", "Como estás?")]
+        watermark_ms = (len(messages) - 1) * 1000
+        self.assertEqual(len(InteractionBlocks(store(*messages)).after(None)), 2)
+        # A mesma pessoa continua: o bloco já analisado cresce mas não volta
+        self.assertEqual(len(InteractionBlocks(store(*messages, ("Rui", "Dormiste bem?"))).after(watermark_ms)), 0)
+        # Alguém responde: só o novo par entra, com o turno anterior como entrada
+        recent = InteractionBlocks(store(*messages, ("Maria", "Bem!"))).after(watermark_ms)
+        self.assertEqual(list(recent.ranges()), [(2, 4)])
+
+if __name__ == '__main__':
+    unittest.main()
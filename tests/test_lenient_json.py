@@ -0,0 +1,32 @@
+import unittest
+from utils.lenient_json import parse_lenient
+
+class TestLenientJson(unittest.TestCase):
+    def test_valid_json_round_trips(self):
+        self.assertEqual(parse_lenient('{"a": [1, 2.5, "x"], "b": null}'), {"a": [1, 2.5, "x"], "b": None})
+
+    def test_fences_prose_and_comments(self):
+        text = 'Aqui está:\n```json\n{"recent_reflections": [ // nota\n {"date": "2025-04-12", "text": "Olá"},]}\n```'
+        self.assertEqual(parse_lenient(text), {"recent_reflections": [{"date": "2025-04-12", "text": "Olá"}]})
+
+    def test_single_quotes_bare_keys_and_missing_commas(self):
+        self.assertEqual(parse_lenient("{a: 'um' 'b': True\n c: 3}"), {"a": "um", "b": True, "c": 3})
+
+    def test_truncated_output_keeps_what_arrived(self):
+        text = '{"strengths": ["ouvir", "humor"], "challenges": ["tempo'
+        self.assertEqual(parse_lenient(text), {"strengths": ["ouvir", "humor"], "challenges": ["tempo"]})
+        self.assertEqual(parse_lenient('{"a": 1, "b":'), {"a": 1})
+
+    def test_missing_values_are_not_guessed(self):
+        self.assertIsNone(parse_lenient('{"a": }'))
+        self.assertIsNone(parse_lenient('{"a": , "b": 2}'))
+        self.assertIsNone(parse_lenient('[1,,2]'))
+        self.assertIsNone(parse_lenient('[,1]'))
+        self.assertEqual(parse_lenient('{"a": [1, 2,], "b": 3,}'), {"a": [1, 2], "b": 3})
+
+    def test_no_structure(self):
+        self.assertIsNone(parse_lenient("sem json aqui"))
+        self.assertIsNone(parse_lenient(""))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import unittest
+from utils.memory_journal import MemoryCorruptError, MemoryJournal
+
+class TestMemoryJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "rui_memory.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def log_ops(self):
+        with open(self.path + ".log", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_appends_only_new_items(self):
+        journal = MemoryJournal(self.path)
+        memory = {"personality": {"traits": ["calmo"]}, "recent_reflections": [{"text": str(i)} for i in range(5)]}
+        journal.save(memory)  # Primeira gravação cria o snapshot
+        self.assertFalse(os.path.exists(self.path + ".log"))
+
+        memory["recent_reflections"] = (memory["recent_reflections"] + [{"text": "5"}, {"text": "6"}])[-5:]
+        memory["watermarks"] = {"data": 123}
+        self.assertEqual(journal.save(memory), 3)
+        self.assertEqual([op["op"] for op in self.log_ops()], ["append", "append", "set"])
+        self.assertEqual(MemoryJournal(self.path).load(), memory)
+
+    def test_compaction_and_crash_recovery(self):
+        journal = MemoryJournal(self.path, compact_every=3)
+        memory = {"relational_dynamics": []}
+        for i in range(3):
+            memory["relational_dynamics"] = memory["relational_dynamics"] + [{"date": str(i)}]
+            journal.save(memory)
+        self.assertEqual(len(self.log_ops()), 2)
+        # Crash durante a compactação: log antigo ainda presente ao lado do novo snapshot
+        with open(self.path + ".log", encoding="utf-8") as f:
+            stale_log = f.read()
+        journal.compact()
+        with open(self.path + ".log", "w", encoding="utf-8") as f:
+            f.write(stale_log + '{"op": "append", "key": "relational_dyn')  # e uma linha cortada
+        self.assertEqual(MemoryJournal(self.path).load(), memory)
+
+    def test_saves_after_a_torn_line_survive_reload(self):
+        journal = MemoryJournal(self.path)
+        journal.save({"items": [1]})
+        journal.save({"items": [1, 2]})
+        with open(self.path + ".log", "a", encoding="utf-8") as f:
+            f.write('{"op": "append", "key": "ite')  # crash a meio de uma escrita
+        journal = MemoryJournal(self.path)
+        self.assertEqual(journal.load(), {"items": [1, 2]})
+        journal.save({"items": [1, 2, 3]})
+        journal.save({"items": [1, 2, 3, 4], "x": 1})
+        self.assertEqual(MemoryJournal(self.path).load(), {"items": [1, 2, 3, 4], "x": 1})
+
+    def test_corrupt_snapshot_is_reported(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write('{"personality": {"traits": [')
+        with self.assertRaises(MemoryCorruptError):
+            MemoryJournal(self.path).load()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from utils.message_store import MessageStore
+
+MESSAGES = [
+    {"sender_name": "Rui", "timestamp_ms": 300, "content": "Olá ❤", "reactions": [{"reaction": "😂", "actor": "Maria"}]},
+    {"sender_name": "Maria", "timestamp_ms": 100, "content": "Bom dia"},
+    {"sender_name": "Ana", "timestamp_ms": 200, "content": ""},
+    {"sender_name": "Maria", "timestamp_ms": 300, "content": "Empate"},
+]
+
+class TestMessageStore(unittest.TestCase):
+    def setUp(self):
+        self.store = MessageStore.from_messages(MESSAGES, [{"name": "Maria"}, {"name": "Rui"}])
+
+    def test_sorted_stably_with_interned_senders(self):
+        self.assertEqual(self.store.participants, ["Maria", "Rui", "Ana"])
+        self.assertEqual([m["timestamp_ms"] for m in self.store], [100, 200, 300, 300])
+        self.assertEqual([m["sender_name"] for m in self.store], ["Maria", "Ana", "Rui", "Maria"])
+        self.assertEqual(self.store.content(2), "Olá ❤")
+        self.assertEqual(self.store.reactions(2), [{"reaction": "😂", "actor": "Maria"}])
+        self.assertEqual(self.store.reactions(3), [])
+
+    def test_slices_and_time_ranges_are_views(self):
+        view = self.store[1:]
+        self.assertEqual(len(view), 3)
+        self.assertEqual(view.content(1), "Olá ❤")
+        self.assertEqual(view.timestamp(-1), 300)
+        self.assertIs(view.timestamps, self.store.timestamps)
+        self.assertEqual(self.store.index_range(150, 300), (1, 2))
+        self.assertEqual([m["content"] for m in self.store.time_range(start_ms=300)], ["Olá ❤", "Empate"])
+        self.assertEqual(len(view.time_range(end_ms=100)), 0)
+        with self.assertRaises(IndexError):
+            view.content(3)
+
+    def test_saved_file_maps_back_to_the_same_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "conversa.snapshot")
+            self.store.save(path, {"origem": "teste"})
+            loaded, meta = MessageStore.load(path)
+            self.assertEqual(meta, {"origem": "teste"})
+            self.assertEqual(list(loaded), list(self.store))
+            self.assertEqual(loaded.participants, self.store.participants)
+            self.assertEqual(loaded.index_range(150, 300), (1, 2))
+
+            self.store[2:].save(path)
+            self.assertEqual(list(MessageStore.load(path)[0]), list(self.store[2:]))
+            with open(path, "r+b") as f:
+                f.truncate(os.path.getsize(path) - 1)
+            with self.assertRaises(ValueError):
+                MessageStore.load(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+from ai.model_client import ModelClient
+from tools.stub_server import StubModelServer
+
+def payload(system, user):
+    return {"model": "stub", "cache_prompt": True, "max_tokens": 100,
+            "messages": [{"role": "system", "content": system}, {"role": "user", "content": user}]}
+
+class TestPromptReuse(unittest.TestCase):
+    def test_pinned_slots_keep_each_prefix_cached(self):
+        rui, maria = "Tu és Rui. " * 100, "Tu és Maria. " * 100
+        with StubModelServer(slots=2) as stub:
+            client = ModelClient(stub.url, slots=2)
+            # Intercalados como na análise concorrente: cada IA volta sempre ao seu slot
+            for i in range(2):
+                client.chat(payload(rui, f"Conversa:\nlote {i}"), slot_key="RuiAI")
+                client.chat(payload(maria, f"Conversa:\nlote {i}"), slot_key="MariaAI")
+            client.close()
+            self.assertEqual((client.slot_for("RuiAI"), client.slot_for("MariaAI")), (0, 1))
+            self.assertGreaterEqual(stub.stats()["cached_tokens"], (len(rui) + len(maria)) // 4 - 10)
+
+    def test_unsupported_hint_is_dropped(self):
+        with StubModelServer() as stub:
+            original = stub.complete
+            stub.complete = lambda body: (400, {"error": "unknown field id_slot"}) if "id_slot" in body else original(body)
+            client = ModelClient(stub.url, slots=1, retries=2, backoff=0)
+            self.assertIsNotNone(client.chat(payload("sistema", "Conversa:"), slot_key="RuiAI"))
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
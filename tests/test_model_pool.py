@@ -0,0 +1,61 @@
+import socket
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from ai.model_pool import ModelPool, parse_endpoint
+from tools.stub_server import StubModelServer
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "Conversa:\nOlá"}], "max_tokens": 100}
+
+def dead_url():
+    # Porta livre sem ninguém a ouvir: ligação recusada de imediato
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+class TestModelPool(unittest.TestCase):
+    def test_parse_endpoint(self):
+        self.assertEqual(parse_endpoint("http://box:1234/#2"), ("http://box:1234", 2))
+        self.assertEqual(parse_endpoint("http://box:1234", 3), ("http://box:1234", 3))
+
+    def test_requests_spread_over_free_endpoints(self):
+        with StubModelServer(latency=0.2) as a, StubModelServer(latency=0.2) as b:
+            pool = ModelPool([f"{a.url}#1", f"{b.url}#1"], probe_interval=0)
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(lambda _: pool.chat(PAYLOAD), range(4)))
+            pool.close()
+            self.assertTrue(all(results))
+            self.assertEqual((a.stats()["calls"], b.stats()["calls"]), (2, 2))
+
+    def test_dead_endpoint_fails_over_and_opens_circuit(self):
+        with StubModelServer() as stub:
+            pool = ModelPool([dead_url(), stub.url], failure_threshold=1, probe_interval=0, backoff=0)
+            # O servidor em baixo ganha o primeiro pedido (sem latência conhecida), falha e sai da rotação
+            self.assertTrue(all(pool.chat(PAYLOAD) for _ in range(3)))
+            dead, alive = pool.stats()["endpoints"]
+            pool.close()
+            self.assertEqual((dead["errors"], dead["state"]), (1, "open"))
+            self.assertEqual(stub.stats()["calls"], 3)
+
+    def test_probe_reopens_recovered_endpoint(self):
+        with StubModelServer(failure_rate=1.0) as stub:
+            pool = ModelPool([stub.url], failure_threshold=1, probe_interval=0, backoff=0, retries=1, cooldown=60)
+            self.assertIsNone(pool.chat(PAYLOAD))
+            self.assertIsNone(pool.chat(PAYLOAD))
+            self.assertEqual(stub.stats()["calls"], 1)
+            stub.failure_rate = 0.0
+            pool.probe()
+            self.assertIsNotNone(pool.chat(PAYLOAD))
+            self.assertEqual(pool.stats()["endpoints"][0]["state"], "closed")
+            pool.close()
+
+    def test_single_url_with_cap_is_parsed(self):
+        import main
+        with StubModelServer() as stub:
+            model_url, client = main.build_client(main.parse_args(["--model-url", f"{stub.url}#2", "--no-cache"]))
+            self.assertEqual(model_url, [stub.url])
+            self.assertIsNotNone(client.chat(PAYLOAD))
+            self.assertEqual(client.endpoints[0].max_concurrency, 2)
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from ai.ai_participant import ParticipantAI, participant_slug
+from ai.ai_rui import RuiAI
+from ai.ai_relational import RelationalAI
+
+class TestParticipantAI(unittest.TestCase):
+    def test_known_participants_use_their_subclass(self):
+        rui = ParticipantAI.for_participant("Rui", ["Maria"], None, "http://localhost:1234")
+        ana = ParticipantAI.for_participant("Ana Costa", ["Bruno Dias"], None, "http://localhost:1234")
+        self.assertIsInstance(rui, RuiAI)
+        self.assertEqual((type(ana), ana.SELF_NAME, ana.others), (ParticipantAI, "Ana Costa", ["Bruno Dias"]))
+        system, prompt = ana._batch_prompt("{}", "Eu: Olá")
+        self.assertIn("'Eu' refere-se a Ana Costa; a outra pessoa é Bruno Dias.", system)
+        self.assertEqual(prompt, "Conversa:\nEu: Olá\n")
+
+    def test_slug(self):
+        self.assertEqual(participant_slug("Rui"), "rui")
+        self.assertEqual(participant_slug(" João Sá "), "joão_sá")
+
+    def test_relational_profiles_follow_names(self):
+        relational = RelationalAI(None, "http://localhost:1234", names=["Ana Costa", "Bruno Dias"])
+        self.assertEqual(set(relational.memory), {"ana_costa_profile", "bruno_dias_profile", "relational_dynamics"})
+        system, prompt = relational._construct_prompt({"recent_reflections": [{"text": "a"}]}, {})
+        self.assertIn("- Ana Costa's reflections:", prompt)
+        self.assertIn("- Bruno Dias's profile: {}", prompt)
+
+    def test_old_periods_are_rolled_up_not_dropped(self):
+        rui = ParticipantAI.for_participant("Rui", ["Maria"], None, "http://localhost:1234")
+        rui._reduce_reflections = lambda reflections, period: [
+            {"date": period, "text": "+".join(r["text"] for r in reflections)}]
+        weeks = [f"2024-W{w}" for w in (50, 51, 52)] + [f"2025-W{w:02d}" for w in range(1, 12)]
+        rui._merge_period_summaries({week: [{"date": week, "text": week[-3:]}] for week in weeks})
+        summaries = rui.memory["period_summaries"]
+        self.assertEqual(len(summaries), rui.MAX_PERIOD_SUMMARIES)
+        self.assertEqual(summaries["2024"], [{"date": "2024", "text": "W50+W51+W52"}])
+        self.assertIn("2025-W01", summaries)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+from utils.salience import score_message, select_salient
+
+def block(i, input_message, response_message, reactions=0):
+    return {"input": {"sender": "Rui", "timestamp_ms": i * 2, "message": input_message, "reactions": reactions},
+            "response": {"sender": "Maria", "timestamp_ms": i * 2 + 1, "message": response_message}}
+
+class TestSalience(unittest.TestCase):
+    def test_low_information_scores_zero(self):
+        for text in ["???", "ok", "😂😂", "[Mensagem de áudio]", ""]:
+            self.assertEqual(score_message(text), 0, text)
+        self.assertGreater(score_message("Tenho saudades tuas, amo-te"), score_message("Vou ao supermercado agora"))
+        self.assertGreater(score_message("ok", reactions=2), 0)
+
+    def test_prefilter_and_budget_keep_chronological_order(self):
+        blocks = [
+            block(0, "???", "ok"),
+            block(1, "Estou triste com a discussão de ontem", "Desculpa, também fiquei magoada"),
+            block(2, "[Mensagem de áudio]", "[Mensagem de áudio]"),
+            block(3, "O jantar está pronto", "Já vou descer"),
+            block(4, "Sinto a tua falta", "Também tenho saudades"),
+        ]
+        kept, stats = select_salient(blocks)
+        self.assertEqual(kept, [blocks[1], blocks[3], blocks[4]])
+        self.assertEqual(stats["blocks_prefiltered"], 2)
+
+        kept, stats = select_salient(blocks, token_budget=60)
+        self.assertEqual(kept, [blocks[1], blocks[4]])
+        self.assertEqual(stats["blocks_dropped"], 3)
+        self.assertLessEqual(stats["tokens_kept"], 60)
+        self.assertEqual(stats["tokens_kept"] + stats["tokens_dropped"], stats["tokens_total"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+from datetime import datetime, timedelta
+from utils.message_store import MessageStore
+from utils.stack_manager import filter_last_week_messages, week_partitions
+
+def ms(moment):
+    return int(moment.timestamp() * 1000)
+
+class TestStackManager(unittest.TestCase):
+    def setUp(self):
+        # Segunda-feira 2025-03-31 (semana ISO 2025-14); mensagens fora de ordem
+        monday = datetime(2025, 3, 31)
+        self.moments = [monday + timedelta(days=d, hours=1) for d in (9, 0, 6, 15, 7, 1)]
+        self.messages = [{"sender_name": "Rui", "timestamp_ms": ms(m), "content": str(i)} for i, m in enumerate(self.moments)]
+
+    def test_filter_last_week_messages(self):
+        reference = datetime(2025, 4, 15)
+        expected = sorted((m for m in self.messages if m["timestamp_ms"] >= ms(reference - timedelta(days=7))),
+                          key=lambda m: m["timestamp_ms"])
+        self.assertEqual(filter_last_week_messages(self.messages, reference), expected)
+        store = MessageStore.from_messages(self.messages)
+        self.assertEqual([m["content"] for m in filter_last_week_messages(store, reference)], [m["content"] for m in expected])
+
+    def test_week_partitions(self):
+        store = MessageStore.from_messages(self.messages)
+        partitions = week_partitions(store)
+        self.assertEqual([label for label, _, _ in partitions], ["2025-14", "2025-15", "2025-16"])
+        self.assertEqual([stop - start for _, start, stop in partitions], [3, 2, 1])
+        self.assertEqual(week_partitions(self.messages), partitions)
+        self.assertEqual(len(week_partitions(store, until=datetime(2025, 4, 14))), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import threading
+import unittest
+from utils.tree_reduce import analyze_tree
+
+DAY_MS = 86400000
+
+class FakeAI:
+    def __init__(self, name):
+        self.SELF_NAME = name
+        self.memory = {"period_summaries": {}}
+        self.reduce_calls = 0
+        self._lock = threading.Lock()
+
+    def _plan_batches(self, planner):
+        return planner.plan(1)  # um bloco por lote
+
+    def _process_batch(self, conversation_text):
+        return [{"date": "2025-04-12", "text": line.split(": ", 1)[1]} for line in conversation_text.splitlines()][:1]
+
+    def _reduce_reflections(self, reflections, period):
+        with self._lock:
+            self.reduce_calls += 1
+        return [{"date": period, "text": "+".join(r["text"] for r in reflections)}]
+
+    def _merge_period_summaries(self, summaries):
+        return {"period_summaries": summaries}
+
+class TestTreeReduce(unittest.TestCase):
+    def test_every_batch_reaches_its_period_summary(self):
+        # 20 blocos em abril e 3 em maio de 2025, um lote por bloco
+        days = [0] * 20 + [40] * 3
+        blocks = [
+            {"input": {"sender": "Rui", "timestamp_ms": 1743681600000 + day * DAY_MS + i, "message": f"r{i}"},
+             "response": {"sender": "Maria", "timestamp_ms": 1743681600001 + day * DAY_MS + i, "message": f"m{i}"}}
+            for i, day in enumerate(days)
+        ]
+        rui = FakeAI("Rui")
+        [feedback] = analyze_tree([rui], blocks, max_workers=4, fan_in=4)
+        summaries = feedback["period_summaries"]
+        self.assertEqual(sorted(summaries), ["2025-04", "2025-05"])
+        self.assertEqual(summaries["2025-04"][0]["text"].split("+"), [f"r{i}" for i in range(20)])
+        self.assertEqual(summaries["2025-05"][0]["text"].split("+"), [f"r{i}" for i in range(20, 23)])
+        # abril: 20 -> 5 -> 2 -> 1 (5 + 1 + 1 pedidos); maio: 3 -> 1
+        self.assertEqual(rui.reduce_calls, 8)
+
+    def test_stored_summary_of_a_period_is_reduced_with_new_batches(self):
+        # Execução incremental: as primeiras semanas de abril já estão resumidas na memória
+        blocks = [
+            {"input": {"sender": "Rui", "timestamp_ms": 1744000000000 + i, "message": f"r{i}"},
+             "response": {"sender": "Maria", "timestamp_ms": 1744000000001 + i, "message": f"m{i}"}}
+            for i in range(2)
+        ]
+        rui = FakeAI("Rui")
+        rui.memory["period_summaries"] = {"2025-04": [{"date": "2025-04", "text": "antes"}]}
+        [feedback] = analyze_tree([rui], blocks, fan_in=4)
+        self.assertEqual(feedback["period_summaries"]["2025-04"][0]["text"], "antes+r0+r1")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+End-to-end throughput benchmark of main() against the local stub server.
+
+For each export size a synthetic export is generated in a temporary
+directory, main() runs there against StubModelServer, and messages/s, LLM
+calls, prompt tokens and per-stage time (and peak memory with --trace-memory)
+are reported. Meant to catch regressions in the non-LLM parts of the pipeline.
+
+    python -m tools.benchmark --messages 1000 10000 100000 --concurrency 4
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as pipeline
+from tools.stub_server import StubModelServer
+from tools.synth_export import generate_export
+from utils.metrics import metrics
+
+def run_once(n_messages: int, main_args: list, latency: float = 0.0, tokens_per_second: float = 0.0,
+             failure_rate: float = 0.0, trace_memory: bool = False, verbose: bool = False,
+             prompt_tokens_per_second: float = 0.0, slots: int = 1, endpoints: int = 1) -> dict:
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, contextlib.ExitStack() as stack:
+        stubs = [
+            stack.enter_context(StubModelServer(latency=latency, tokens_per_second=tokens_per_second,
+                                                failure_rate=failure_rate, seed=i,
+                                                prompt_tokens_per_second=prompt_tokens_per_second, slots=slots))
+            for i in range(endpoints)
+        ]
+        generate_export(os.path.join(workdir, "data"), n_messages)
+        os.chdir(workdir)
+        metrics.reset()
+        if trace_memory:
+            tracemalloc.start()
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        start = time.perf_counter()
+        try:
+            with output:
+                urls = [arg for stub in stubs for arg in ("--model-url", stub.url)]
+                pipeline.main(urls + ["--no-cache"] + main_args)
+        finally:
+            elapsed = time.perf_counter() - start
+            if trace_memory:
+                tracemalloc.stop()
+            os.chdir(cwd)
+        server_stats = {key: sum(stub.stats()[key] for stub in stubs) for key in stubs[0].stats()}
+    ttft = metrics.to_dict()["histograms"].get("ttft_s")
+    return {
+        "messages": n_messages,
+        "seconds": elapsed,
+        "messages_per_s": n_messages / elapsed if elapsed else 0.0,
+        "llm_calls": server_stats["calls"],
+        "prompt_tokens": server_stats["prompt_tokens"],
+        "completion_tokens": server_stats["completion_tokens"],
+        "cached_tokens": server_stats["cached_tokens"],
+        "ttft_p50_s": ttft["p50"] if ttft else None,
+        "ttft_p95_s": ttft["p95"] if ttft else None,
+        "stages": list(metrics.stages)
+    }
+
+def print_result(result: dict):
+    print(f"\n📦 {result['messages']} mensagens: {result['seconds']:.2f}s "
+          f"({result['messages_per_s']:.0f} msg/s), {result['llm_calls']} chamadas LLM, "
+          f"{result['prompt_tokens']} tokens de prompt ({result['cached_tokens']} da cache de prefixo)")
+    if result["ttft_p50_s"] is not None:
+        print(f"   TTFT p50 {result['ttft_p50_s'] * 1000:.0f} ms, p95 {result['ttft_p95_s'] * 1000:.0f} ms")
+    for stage in result["stages"]:
+        peak = f", pico {stage['peak_bytes'] / 1e6:.1f} MB" if "peak_bytes" in stage else ""
+        counts = ", ".join(f"{k}={v}" for k, v in stage.items() if k not in ("stage", "seconds", "peak_bytes"))
+        print(f"   {stage['stage']:<26} {stage['seconds']:8.3f}s{peak}{', ' + counts if counts else ''}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta do pipeline com o servidor stub")
+    parser.add_argument("--messages", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência fixa por pedido no stub (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Ritmo de geração simulado no stub")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probabilidade de erro 500 no stub")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=0.0,
+                        help="Ritmo de avaliação do prompt no stub (ativa a simulação da cache de prefixo)")
+    parser.add_argument("--stub-endpoints", type=int, default=1,
+                        help="Número de stubs independentes (um --model-url cada) para medir o ModelPool")
+    parser.add_argument("--stub-slots", type=int, default=1, help="Slots paralelos do stub, cada um com a sua cache")
+    parser.add_argument("--trace-memory", action="store_true", help="Mede o pico de memória por etapa (mais lento)")
+    parser.add_argument("--json", help="Escreve os resultados neste ficheiro JSON")
+    parser.add_argument("--verbose", action="store_true", help="Mostra o output do pipeline")
+    args, main_args = parser.parse_known_args()
+
+    results = []
+    for n_messages in args.messages:
+        result = run_once(n_messages, main_args, args.latency, args.tokens_per_second,
+                          args.failure_rate, args.trace_memory, args.verbose,
+                          args.prompt_tokens_per_second, args.stub_slots, args.stub_endpoints)
+        print_result(result)
+        results.append(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,220 @@
+"""
+Local OpenAI-compatible stand-in for the LM Studio server.
+
+Serves /v1/chat/completions and /v1/models with configurable latency, token
+rate and failure injection, and answers with JSON shaped like what the
+pipeline asks for, so main() can run end to end without a model. With a
+prompt-processing rate it also simulates llama.cpp slots and their prompt
+cache: only the part of the prompt after the longest prefix shared with the
+slot's previous prompt is "evaluated", and `timings` reports it.
+
+    python -m tools.stub_server --port 1234 --latency 0.2 --tokens-per-second 40 --prompt-tokens-per-second 400 --slots 2
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+def fake_completion(prompt: str) -> str:
+    """Build a response containing every key the pipeline's prompts ask for."""
+    reflection = {"date": "2025-04-12", "text": "Senti que conversámos com carinho, mas quero estar mais presente."}
+    content = {
+        "personality": {"traits": ["atento"], "description": "Sou atento aos outros."},
+        "core_values": [{"value": "honestidade", "description": "Quero ser sincero."}],
+        "emotional_patterns": [{"emotion": "ansiedade", "triggers": ["silêncio"], "description": "Fico inquieto sem resposta."}],
+        "relational_dynamics": {"strengths": ["afeto"], "challenges": ["tempo"], "patterns": ["humor"]},
+        "recent_reflections": [reflection],
+        "strengths": ["Mutual affection"],
+        "challenges": ["Limited time together"],
+        "advice": ["Plan quality time"]
+    }
+    # Modo conjunto: uma chave por participante
+    for name in re.findall(r"Perfil de (\w+):", prompt):
+        content[name] = {"recent_reflections": [reflection]}
+    return json.dumps(content, ensure_ascii=False)
+
+class StubModelServer:
+    """
+    Threaded stub server; use as a context manager or call start()/stop().
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind (0 picks a free one).
+        latency (float): Fixed seconds added to every completion.
+        tokens_per_second (float): Simulated generation rate (0 = instant).
+        failure_rate (float): Probability of answering HTTP 500.
+        context_limit (int): Prompt tokens above which a context-length error is returned (0 = no limit).
+        seed (int): Seed for failure injection.
+        prompt_tokens_per_second (float): Simulated prompt evaluation rate (0 = instant).
+        slots (int): Number of parallel slots, each with its own prompt cache.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, tokens_per_second: float = 0.0,
+                 failure_rate: float = 0.0, context_limit: int = 0, seed: int = 0,
+                 prompt_tokens_per_second: float = 0.0, slots: int = 1):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.context_limit = context_limit
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self._slots = [{"prompt": "", "lock": threading.Lock()} for _ in range(max(1, slots))]
+        self.cached_tokens = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cached_tokens": self.cached_tokens
+            }
+
+    def start(self) -> "StubModelServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _pick_slot(self, payload: dict, rendered: str) -> dict:
+        slot_id = payload.get("id_slot")
+        if isinstance(slot_id, int) and 0 <= slot_id < len(self._slots):
+            return self._slots[slot_id]
+        # Como o llama.cpp: o slot livre cujo prompt anterior partilha o maior prefixo
+        return max(self._slots, key=lambda slot: (not slot["lock"].locked(),
+                                                  len(os.path.commonprefix([slot["prompt"], rendered]))))
+
+    def complete(self, payload: dict):
+        """Return (status, body) for a chat completion payload."""
+        messages = payload.get("messages", [])
+        prompt = "\n".join(m.get("content", "") for m in messages)
+        prompt_tokens = _estimate_tokens(prompt)
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        if fail:
+            return 500, {"error": "injected failure"}
+        if self.context_limit and prompt_tokens > self.context_limit:
+            return 400, {"error": f"The number of tokens to keep from the initial prompt is greater than the context length ({self.context_limit})"}
+        content = fake_completion(prompt)
+        completion_tokens = _estimate_tokens(content)
+        # Prompt renderizado como num chat template: o prefixo comum inclui os papéis
+        rendered = "".join(f"<|{m.get('role', 'user')}|>{m.get('content', '')}" for m in messages)
+        slot = self._pick_slot(payload, rendered)
+        with slot["lock"]:
+            cached = 0
+            if payload.get("cache_prompt", True):
+                cached = min(_estimate_tokens(os.path.commonprefix([slot["prompt"], rendered])), prompt_tokens)
+            slot["prompt"] = rendered
+            prompt_seconds = (prompt_tokens - cached) / self.prompt_tokens_per_second if self.prompt_tokens_per_second else 0.0
+            generation_seconds = completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+            delay = self.latency + prompt_seconds + generation_seconds
+            if delay:
+                time.sleep(delay)
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cached_tokens += cached
+        return 200, {
+            "id": f"chatcmpl-stub-{self.calls}",
+            "object": "chat.completion",
+            "model": payload.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+            # Mesmo formato que o llama.cpp server
+            "timings": {"cache_n": cached, "prompt_n": prompt_tokens - cached,
+                        "prompt_ms": (self.latency + prompt_seconds) * 1000,
+                        "predicted_n": completion_tokens, "predicted_ms": generation_seconds * 1000}
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, body: dict):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                # Headers and body in one write, otherwise delayed ACKs add ~40 ms per request
+                head = (f"HTTP/1.1 {status} {self.responses.get(status, ('',))[0]}\r\n"
+                        f"Content-Type: application/json; charset=utf-8\r\n"
+                        f"Content-Length: {len(data)}\r\n\r\n").encode("latin-1")
+                self.wfile.write(head + data)
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/v1/models":
+                    self._send(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+                elif self.path.rstrip("/") == "/stats":
+                    self._send(200, server.stats())
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self._send(404, {"error": "not found"})
+                    return
+                try:
+                    payload = json.loads(raw.decode("utf-8"))
+                except ValueError:
+                    self._send(400, {"error": "invalid JSON"})
+                    return
+                self._send(*server.complete(payload))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local compatível com /v1/chat/completions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--context-limit", type=int, default=0)
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--slots", type=int, default=1)
+    args = parser.parse_args()
+    stub = StubModelServer(args.host, args.port, args.latency, args.tokens_per_second, args.failure_rate, args.context_limit,
+                           prompt_tokens_per_second=args.prompt_tokens_per_second, slots=args.slots)
+    print(f"🧪 Stub a servir em {stub.url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,83 @@
+"""
+Synthetic Instagram-export generator for benchmarks.
+
+Writes message_1.json ... message_N.json in the same shape as a real export:
+newest messages first, UTF-8 text stored as latin-1 code points, occasional
+reactions and audio-only messages. Messages are written one at a time, so
+1M-message exports do not need to fit in memory.
+
+    python -m tools.synth_export /tmp/export --messages 100000
+"""
+import argparse
+import json
+import os
+import random
+
+PARTICIPANTS = ["Maria Passos", "Rui Silva"]
+PHRASES = [
+    "Bom dia meu amor ❤️", "Já chegaste?", "???", "Ok", "Ahahah 😂", "Tenho saudades tuas",
+    "Hoje o trabalho foi cansativo, preciso de descansar", "Vamos jantar fora amanhã?",
+    "Desculpa, não vi a mensagem", "Estás chateada comigo?", "Não, só estou cansada 🙄",
+    "Adorei o dia de hoje contigo", "Sim", "Não sei bem o que pensar disto", "Boa noite 😘"
+]
+REACTIONS = ["❤", "😂", "😮", "🙄"]
+
+def _mojibake(text: str) -> str:
+    # O export do Instagram guarda os bytes UTF-8 como code points latin-1
+    return text.encode("utf-8").decode("latin-1")
+
+def generate_export(directory: str, n_messages: int, messages_per_file: int = 10000, seed: int = 0,
+                    start_ms: int = 1600000000000, mean_gap_ms: int = 90000, participants: list = None) -> list:
+    """
+    Generate a synthetic export with `n_messages` messages split across files.
+
+    `participants` (two full names) defaults to the couple the pipeline was built for.
+
+    Returns:
+        list: Paths of the written files.
+    """
+    rng = random.Random(seed)
+    participants = participants or PARTICIPANTS
+    os.makedirs(directory, exist_ok=True)
+    # Os ficheiros (e as mensagens dentro deles) vão do mais recente para o mais antigo
+    timestamp = start_ms + n_messages * mean_gap_ms
+    n_files = max(1, -(-n_messages // messages_per_file))
+    paths = []
+    sender = 0
+    for file_index in range(n_files):
+        hi = n_messages - file_index * messages_per_file
+        lo = max(0, hi - messages_per_file)
+        path = os.path.join(directory, f"message_{file_index + 1}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{\n  "participants": ')
+            f.write(json.dumps([{"name": _mojibake(p)} for p in participants]))
+            f.write(',\n  "messages": [\n')
+            for i in range(hi - 1, lo - 1, -1):
+                if rng.random() < 0.35:
+                    sender = 1 - sender
+                timestamp -= int(rng.expovariate(1 / mean_gap_ms)) + 1
+                message = {"sender_name": _mojibake(participants[sender]), "timestamp_ms": timestamp}
+                if rng.random() < 0.05:
+                    message["audio_files"] = [{"uri": f"audio/clip_{i}.mp4", "creation_timestamp": timestamp // 1000}]
+                else:
+                    message["content"] = _mojibake(rng.choice(PHRASES))
+                if rng.random() < 0.08:
+                    message["reactions"] = [{"reaction": _mojibake(rng.choice(REACTIONS)),
+                                             "actor": _mojibake(participants[1 - sender])}]
+                message["is_geoblocked_for_viewer"] = False
+                f.write("    " + json.dumps(message) + (",\n" if i > lo else "\n"))
+            f.write('  ],\n  "title": ')
+            f.write(json.dumps(_mojibake(participants[0])))
+            f.write(',\n  "is_still_participant": true,\n  "thread_path": "inbox/synthetic"\n}\n')
+        paths.append(path)
+    return paths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um export sintético do Instagram")
+    parser.add_argument("directory")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--messages-per-file", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    written = generate_export(args.directory, args.messages, args.messages_per_file, args.seed)
+    print(f"📝 {args.messages} mensagens escritas em {len(written)} ficheiros em {args.directory}")
@@ -0,0 +1,85 @@
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+def estimate_tokens(text: str) -> int:
+    """
+    Conservative token estimate (~4 characters per token) used everywhere a prompt is sized.
+    """
+    return len(text) // 4
+
+class BatchPlanner:
+    """
+    Format interaction blocks once and pack them into token-bounded batches.
+
+    Every message line is rendered and measured a single time. Batches are
+    returned as (start, end) block index ranges that any persona can reuse;
+    `format` only swaps the sender label for "Eu" when joining cached lines.
+
+    Args:
+        blocks (list): Interaction blocks ({"input": ..., "response": ...}).
+    """
+
+    def __init__(self, blocks: list):
+        self.blocks = blocks
+        self._lines: List[Tuple[Tuple[str, str, str], ...]] = []
+        self._tokens: List[int] = []
+        self._plans: Dict[int, List[Tuple[int, int]]] = {}
+        timestamps: Dict[int, str] = {}
+        for block in blocks:
+            lines = []
+            tokens = 0
+            for msg in (block["input"], block["response"]):
+                timestamp_ms = msg.get("timestamp_ms")
+                prefix = timestamps.get(timestamp_ms)
+                if prefix is None:
+                    when = datetime.fromtimestamp(timestamp_ms / 1000).strftime("%Y-%m-%d %H:%M:%S") if timestamp_ms else ""
+                    prefix = timestamps[timestamp_ms] = f"[{when}] "
+                suffix = f": {msg['message']}"
+                lines.append((prefix, msg["sender"], suffix))
+                # Measured with the full sender name, an upper bound for the "Eu" label
+                tokens += estimate_tokens(prefix + msg["sender"] + suffix + "\n")
+            self._lines.append(tuple(lines))
+            self._tokens.append(tokens)
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def block_tokens(self, index: int) -> int:
+        return self._tokens[index]
+
+    def range_tokens(self, start: int, end: int) -> int:
+        return sum(self._tokens[start:end])
+
+    def plan(self, max_tokens: int) -> List[Tuple[int, int]]:
+        """
+        Greedily pack consecutive blocks into batches of at most `max_tokens`.
+
+        A single block larger than the budget gets a batch of its own. Plans
+        are cached per budget.
+        """
+        plan = self._plans.get(max_tokens)
+        if plan is not None:
+            return plan
+        plan = []
+        start = 0
+        current_tokens = 0
+        for index, tokens in enumerate(self._tokens):
+            if current_tokens + tokens > max_tokens and index > start:
+                plan.append((start, index))
+                start = index
+                current_tokens = 0
+            current_tokens += tokens
+        if start < len(self._tokens):
+            plan.append((start, len(self._tokens)))
+        self._plans[max_tokens] = plan
+        return plan
+
+    def format(self, start: int, end: int, self_name: str) -> str:
+        """
+        Render blocks [start, end) from the point of view of `self_name`.
+        """
+        return "\n".join(
+            f"{prefix}{'Eu' if sender == self_name else sender}{suffix}"
+            for lines in self._lines[start:end]
+            for prefix, sender, suffix in lines
+        ).strip()
@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List
+from utils.batch_planner import BatchPlanner
+from utils.progress import progress
+
+def _timed_batch(ai, planner: BatchPlanner, batch: tuple):
+    start = time.perf_counter()
+    try:
+        reflections = ai._process_batch(planner.format(batch[0], batch[1], ai.SELF_NAME))
+    finally:
+        progress.advance()
+    return reflections, time.perf_counter() - start
+
+def analyze_concurrently(ais: List, blocks: list, max_workers: int = 4, planner: BatchPlanner = None) -> List[dict]:
+    """
+    Analyze the same interaction blocks for several persona AIs at once.
+
+    Batches from every AI are fanned out to a shared thread pool bounded by
+    `max_workers`. Results are slotted back by (ai, batch) index, so the merged
+    reflections keep the same order as a sequential `analyze` run.
+
+    Args:
+        ais (list): Persona AIs exposing `_plan_batches`, `_process_batch` and `_merge_reflections`.
+        blocks (list): Interaction blocks to analyze.
+        max_workers (int): Maximum number of concurrent model requests.
+        planner (BatchPlanner, optional): Shared planner over `blocks`; built if not given.
+
+    Returns:
+        list: One feedback dict per AI, in the same order as `ais`.
+    """
+    planner = planner or BatchPlanner(blocks)
+    plans = [ai._plan_batches(planner) for ai in ais]
+    results = [[None] * len(plan) for plan in plans]
+    total_batches = sum(len(plan) for plan in plans)
+    progress.plan(total_batches)
+    print(f"🚀 Análise concorrente: {total_batches} lotes de {len(ais)} personas com {max_workers} workers")
+
+    request_seconds = 0.0
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        # Interleave submissions so every persona progresses at the same pace
+        for batch_index in range(max((len(plan) for plan in plans), default=0)):
+            for ai_index, plan in enumerate(plans):
+                if batch_index < len(plan):
+                    future = executor.submit(_timed_batch, ais[ai_index], planner, plan[batch_index])
+                    futures[future] = (ai_index, batch_index)
+        for future in as_completed(futures):
+            ai_index, batch_index = futures[future]
+            try:
+                reflections, elapsed = future.result()
+            except Exception as e:
+                print(f"❌ Erro no lote {batch_index + 1} de {type(ais[ai_index]).__name__}: {str(e)}")
+                reflections, elapsed = [], 0.0
+            results[ai_index][batch_index] = reflections
+            request_seconds += elapsed
+    wall_seconds = time.perf_counter() - wall_start
+
+    speedup = request_seconds / wall_seconds if wall_seconds > 0 else 0.0
+    print(f"⏱ Relógio: {wall_seconds:.1f}s | Soma dos pedidos: {request_seconds:.1f}s | "
+          f"Paralelismo efetivo: x{speedup:.2f} ({max_workers} workers)")
+
+    feedbacks = []
+    for ai, batch_results in zip(ais, results):
+        all_reflections = [r for reflections in batch_results for r in reflections]
+        feedbacks.append(ai._merge_reflections(all_reflections))
+    return feedbacks
@@ -0,0 +1,141 @@
+import copy
+import json
+from typing import Dict, Tuple
+from utils.batch_planner import estimate_tokens
+from utils.metrics import metrics
+
+DEFAULT_SHARES = {"instructions": 0.15, "profile": 0.25, "conversation": 0.60}
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+def _nodes(value, path=()):
+    # Todos os nós (caminho, valor) abaixo da raiz
+    children = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else ()
+    for key, child in children:
+        yield path + (key,), child
+        yield from _nodes(child, path + (key,))
+
+def _get(value, path):
+    for key in path:
+        value = value[key]
+    return value
+
+def _shrink(memory: dict) -> bool:
+    nodes = list(_nodes(memory))
+    containers = [(len(_dumps(v)), p) for p, v in nodes if isinstance(v, (list, dict)) and len(v) > 1]
+    if containers:
+        _, path = max(containers)
+        node = _get(memory, path)
+        if isinstance(node, list):
+            node.pop(0)
+        else:
+            node.pop(next(iter(node)))
+        return True
+    strings = [(len(v), p) for p, v in nodes if isinstance(v, str) and len(v) > 40]
+    if strings:
+        length, path = max(strings)
+        _get(memory, path[:-1])[path[-1]] = _get(memory, path)[:length // 2]
+        return True
+    if memory:
+        memory.pop(max(memory, key=lambda key: len(_dumps(memory[key]))))
+        return True
+    return False
+
+def compact_memory(memory: dict, max_tokens: int) -> Tuple[dict, int]:
+    """
+    Shrink a memory dict until its JSON fits in `max_tokens`.
+
+    Each step drops the oldest entry of the largest list or dict that still
+    has more than one (lists and period summaries are appended in time
+    order, so the first entry is the oldest); once nothing has more than one
+    entry, the longest string is halved, and as a last resort the largest
+    top-level field is dropped. Returns the compacted copy and the number of
+    steps taken.
+    """
+    memory = copy.deepcopy(memory)
+    removals = 0
+    while estimate_tokens(_dumps(memory)) > max_tokens and _shrink(memory):
+        removals += 1
+    return memory, removals
+
+class ContextBudget:
+    """
+    Fixed token shares of a model context for instructions, profile and conversation.
+
+    The profile (memory JSON) is compacted with `compact_memory` when it
+    exceeds its share; the conversation gets whatever the instructions and
+    profile leave unused, minus the tokens reserved for the answer, and is cut
+    at a line boundary only if it still does not fit. Every allocation is
+    logged.
+
+    Args:
+        max_context (int): Context window of the model, in tokens.
+        reserve_output (int): Tokens kept free for the model's answer.
+        shares (dict): Fractions of the remaining window per section.
+    """
+
+    def __init__(self, max_context: int = 7105, reserve_output: int = 1000, shares: Dict[str, float] = None):
+        self.max_context = max_context
+        self.reserve_output = reserve_output
+        self.shares = dict(shares or DEFAULT_SHARES)
+
+    @property
+    def available(self) -> int:
+        return self.max_context - self.reserve_output
+
+    def share(self, section: str) -> int:
+        return int(self.available * self.shares[section])
+
+    def fit_profile(self, profile: dict, max_tokens: int = None) -> Tuple[str, int]:
+        """Return the profile JSON within `max_tokens` (default: the profile share) and its token count."""
+        max_tokens = self.share("profile") if max_tokens is None else max_tokens
+        text = _dumps(profile)
+        if estimate_tokens(text) > max_tokens:
+            compacted, removals = compact_memory(profile, max_tokens)
+            metrics.count("profile_compactions")
+            metrics.count("profile_removals", removals)
+            text = _dumps(compacted)
+        return text, estimate_tokens(text)
+
+    def allocate(self, label: str, instructions_tokens: int, profiles: Dict[str, dict],
+                 conversation: str) -> Tuple[Dict[str, str], str]:
+        """
+        Fit one prompt's profiles and conversation into the budget.
+
+        Args:
+            label (str): Prompt name, for the log line.
+            instructions_tokens (int): Tokens of the fixed prompt text.
+            profiles (dict): Named memory dicts sharing the profile share equally.
+            conversation (str): Conversation (or other variable input) text.
+
+        Returns:
+            tuple: ({name: profile JSON}, conversation text), both within budget.
+        """
+        per_profile = self.share("profile") // max(len(profiles), 1)
+        fitted, profile_tokens = {}, 0
+        for name, profile in profiles.items():
+            fitted[name], tokens = self.fit_profile(profile, per_profile)
+            profile_tokens += tokens
+        conversation_budget = max(self.available - instructions_tokens - profile_tokens, 0)
+        conversation_tokens = estimate_tokens(conversation)
+        cut = conversation_tokens > conversation_budget
+        if cut:
+            # Corta por linhas inteiras a partir do início, como um lote mais curto
+            # (conta caracteres acumulados: estimate_tokens é len // 4)
+            kept, used_chars = [], 0
+            for line in conversation.split("\n"):
+                if (used_chars + len(line)) // 4 > conversation_budget:
+                    break
+                kept.append(line)
+                used_chars += len(line) + 1
+            conversation = "\n".join(kept)
+            conversation_tokens = estimate_tokens(conversation)
+            metrics.count("conversation_truncations")
+        total = instructions_tokens + profile_tokens + conversation_tokens
+        print(f"📐 Orçamento {label}: instruções {instructions_tokens}/{self.share('instructions')}, "
+              f"perfil {profile_tokens}/{self.share('profile')}, conversa {conversation_tokens}/{conversation_budget}"
+              f"{' (cortada)' if cut else ''}, total {total}+{self.reserve_output}/{self.max_context}")
+        if instructions_tokens > self.share("instructions"):
+            print(f"⚠️ Instruções de {label} excedem a sua quota ({instructions_tokens} tokens)")
+        return fitted, conversation
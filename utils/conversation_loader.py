@@ -1,53 +1,308 @@
 import json
 import os
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from typing import Dict, Iterator, List, Optional, Tuple
+from utils.message_store import MessageStore
 
-def load_conversations(directory: str) -> Dict:
+NAME_MAPPING = {
+    "Maria Passos": "Maria",
+    "Rui Silva": "Rui"
+    # Add more mappings if needed for other users
+}
+
+_WHITESPACE = " \t\n\r"
+
+class _JsonStream:
+    """
+    Minimal incremental reader over a JSON text file.
+
+    Only the text between the current position and the end of the value being
+    decoded is kept in memory, so arbitrarily long arrays can be walked
+    element by element with a bounded buffer.
+    """
+
+    def __init__(self, file, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop consumed text so the buffer never grows past one value plus a chunk
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise json.JSONDecodeError("Unexpected end of data", self.buffer, self.pos)
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number or literal cut at the buffer edge may still be incomplete
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+def iter_export_items(file_path: str, stream_key: str = "messages", chunk_size: int = 1 << 16) -> Iterator[Tuple[str, object]]:
+    """
+    Stream the top-level entries of an Instagram export file.
+
+    Every top-level key is yielded as a (key, value) pair, except `stream_key`,
+    whose array elements are yielded one at a time as (stream_key, element).
+
+    Args:
+        file_path (str): Path to the JSON export.
+        stream_key (str): Top-level array to stream element by element.
+        chunk_size (int): Number of characters read per refill.
+
+    Yields:
+        tuple: (key, value) pairs in file order.
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        stream = _JsonStream(file, chunk_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.decode()
+            stream.expect(":")
+            if key == stream_key and stream.peek() == "[":
+                stream.expect("[")
+                if stream.peek() == "]":
+                    stream.pos += 1
+                else:
+                    while True:
+                        yield key, stream.decode()
+                        if stream.peek() == ",":
+                            stream.pos += 1
+                            continue
+                        stream.expect("]")
+                        break
+            else:
+                yield key, stream.decode()
+            if stream.peek() == ",":
+                stream.pos += 1
+                continue
+            stream.expect("}")
+            return
+
+def repair_mojibake(text: str) -> str:
+    """
+    Undo the Instagram export encoding, which stores UTF-8 bytes as latin-1 code points.
+
+    Text that is plain ASCII, or that is not valid mojibake, is returned unchanged.
+    """
+    if not text or text.isascii():
+        return text
+    try:
+        return text.encode('latin-1').decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return text
+
+# Names and reactions repeat across thousands of messages
+_repair_short = lru_cache(maxsize=4096)(repair_mojibake)
+
+def normalize_message(message: dict, audio_placeholder: str = "[Audio message]") -> Dict:
+    """
+    Build the normalized message dict used by the pipeline from a raw export message.
+
+    This is the only place text is repaired: content, sender names and reactions
+    leave here as proper Unicode, so nothing downstream re-encodes them.
+    """
+    sender_name = _repair_short(message.get("sender_name"))
+    return {
+        "sender_name": NAME_MAPPING.get(sender_name, sender_name),
+        "timestamp_ms": message.get("timestamp_ms"),
+        "content": repair_mojibake(message.get("content", audio_placeholder if message.get("audio_files") else "")),
+        "reactions": [
+            {"reaction": _repair_short(r.get("reaction")), "actor": _repair_short(r.get("actor"))}
+            for r in message.get("reactions", [])
+        ]
+    }
+
+def _iter_export_file(file_path: str, participants: List[Dict], seen_participants: set,
+                      audio_placeholder: str) -> Iterator[Dict]:
+    # Mensagens normalizadas de um ficheiro; participantes novos vão para `participants`.
+    # Devolve (via StopIteration) se o ficheiro tinha conteúdo de exportação.
+    found = False
+    try:
+        for key, value in iter_export_items(file_path):
+            if key == "messages":
+                found = True
+                yield normalize_message(value, audio_placeholder)
+            elif key == "participants":
+                found = True
+                for participant in value:
+                    name = _repair_short(participant.get("name"))
+                    normalized_name = NAME_MAPPING.get(name, name)
+                    if normalized_name not in seen_participants:
+                        seen_participants.add(normalized_name)
+                        participants.append({"name": normalized_name})
+    except json.JSONDecodeError as e:
+        print(f"⚠️ Erro ao parsear {file_path} ({e}), pulando resto do arquivo")
+    return found
+
+def _export_paths(directory: str) -> List[str]:
+    json_files = sorted(f for f in os.listdir(directory) if f.endswith('.json'))
+    if not json_files:
+        raise FileNotFoundError(f"No JSON files found in {directory}")
+    return [os.path.join(directory, f) for f in json_files]
+
+def iter_conversations(directory: str, participants: Optional[List[Dict]] = None,
+                       audio_placeholder: str = "[Audio message]", sources: Optional[List[str]] = None) -> Iterator[Dict]:
+    """
+    Lazily yield normalized messages from every JSON file in the directory.
+
+    Messages are yielded in file order (Instagram exports are newest first), one
+    element at a time, without ever loading a whole file.
+
+    Args:
+        directory (str): Path to the directory containing JSON files.
+        participants (list, optional): If given, normalized participants are appended to it (no duplicates).
+        audio_placeholder (str): Content used for audio-only messages.
+        sources (list, optional): If given, receives the paths that held messages or participants.
+
+    Yields:
+        dict: Normalized messages.
+    """
+    paths = _export_paths(directory)
+    participants = participants if participants is not None else []
+    seen_participants = {p["name"] for p in participants}
+    for file_path in paths:
+        found = yield from _iter_export_file(file_path, participants, seen_participants, audio_placeholder)
+        if found and sources is not None:
+            sources.append(file_path)
+
+def parse_export_file(file_path: str, audio_placeholder: str = "[Audio message]") -> Tuple[List[Dict], MessageStore]:
+    """
+    Parse one export file into its normalized participants and a compact, sorted run of its messages.
+
+    Messages are streamed straight into a MessageStore (columns plus one
+    UTF-8 buffer), so a file never exists as a list of dicts, and that is
+    also what a worker process sends back.
+    """
+    participants = []
+    messages = _iter_export_file(file_path, participants, set(), audio_placeholder)
+    return participants, MessageStore.from_messages(messages, participants)
+
+def load_export(directory: str, audio_placeholder: str = "[Audio message]", max_workers: Optional[int] = None,
+                stats: Optional[Dict] = None) -> Tuple[List[Dict], MessageStore]:
+    """
+    Load every JSON file of an export into one chronologically sorted MessageStore without duplicates.
+
+    With one worker (the default on a single CPU) the files are streamed
+    into the store message by message, as `iter_conversations` does, so
+    memory stays at the compact store. With more (default the CPU count),
+    a process pool parses one file each into a compact MessageStore run and
+    `MessageStore.merge` k-way merges the runs; peak memory is then about
+    twice the compact size of the export (the runs plus the merged store).
+    Either way, messages that overlapping exports repeat (same sender,
+    timestamp_ms and content) are dropped by `MessageStore.drop_duplicates`.
+
+    Args:
+        directory (str): Path to the directory containing JSON files.
+        audio_placeholder (str): Content used for audio-only messages.
+        max_workers (int, optional): Maximum number of parsing processes.
+        stats (dict, optional): Receives "files", "sources" (the paths holding messages or participants)
+            and "duplicates".
+
+    Returns:
+        tuple: (participants without duplicates, in file order; the MessageStore).
+    """
+    paths = _export_paths(directory)
+    workers = min(len(paths), max_workers or os.cpu_count() or 1)
+    participants, sources = [], []
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse_export_file, paths, repeat(audio_placeholder)))
+        seen_participants = set()
+        for path, (file_participants, run) in zip(paths, parsed):
+            if file_participants or len(run):
+                sources.append(path)
+            for participant in file_participants:
+                if participant["name"] not in seen_participants:
+                    seen_participants.add(participant["name"])
+                    participants.append(participant)
+        messages = MessageStore.merge([run for _, run in parsed], participants)
+        del parsed
+    else:
+        messages = MessageStore.from_messages(iter_conversations(directory, participants, audio_placeholder, sources),
+                                              participants)
+    duplicates = messages.drop_duplicates()
+    if stats is not None:
+        stats.update({"files": len(paths), "sources": sources, "duplicates": duplicates})
+    return participants, messages
+
+def load_conversations(directory: str, max_workers: Optional[int] = None) -> Dict:
     """
     Load and merge conversation data from all JSON files in the specified directory.
     Normalizes participant names and handles messages with missing content.
-    
+
     Args:
         directory (str): Path to the directory containing JSON files.
-    
+        max_workers (int, optional): Maximum number of parsing processes (see `load_export`).
+
     Returns:
-        dict: Merged conversation data with participants and normalized messages.
+        dict: Merged conversation data with participants and a chronologically sorted MessageStore.
     """
-    merged_data = {"participants": [], "messages": []}
-    name_mapping = {
-        "Maria Passos": "Maria",
-        "Rui Silva": "Rui"
-        # Add more mappings if needed for other users
-    }
+    participants, messages = load_export(directory, max_workers=max_workers)
+    return {"participants": participants, "messages": messages}
 
-    json_files = [f for f in os.listdir(directory) if f.endswith('.json')]
-    if not json_files:
-        raise FileNotFoundError(f"No JSON files found in {directory}")
+def _peak_rss_mb(loader_name: str, directory: str) -> float:
+    import resource
+    if loader_name == "json.load":
+        # The previous loader: whole files in memory plus a normalized copy
+        messages = []
+        for json_file in [f for f in os.listdir(directory) if f.endswith('.json')]:
+            with open(os.path.join(directory, json_file), 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            messages.extend(normalize_message(m) for m in data.get("messages", []))
+        messages.sort(key=lambda x: x["timestamp_ms"])
+    elif loader_name == "stream":
+        load_conversations(directory)
+    elif loader_name == "stream (dicts)":
+        sorted(iter_conversations(directory), key=lambda x: x["timestamp_ms"])
+    else:
+        for _ in iter_conversations(directory):
+            pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Para teste: compara o pico de RSS dos carregadores, cada um num processo novo
+if __name__ == "__main__":
+    import sys
+    import multiprocessing
 
-    for json_file in json_files:
-        file_path = os.path.join(directory, json_file)
-        with open(file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            
-            # Merge participants (ensure no duplicates)
-            for participant in data.get("participants", []):
-                name = participant.get("name")
-                normalized_name = name_mapping.get(name, name)
-                if not any(p["name"] == normalized_name for p in merged_data["participants"]):
-                    merged_data["participants"].append({"name": normalized_name})
-
-            # Process messages
-            for message in data.get("messages", []):
-                normalized_message = {
-                    "sender_name": name_mapping.get(message.get("sender_name"), message.get("sender_name")),
-                    "timestamp_ms": message.get("timestamp_ms"),
-                    "content": message.get("content", "[Audio message]" if message.get("audio_files") else ""),
-                }
-                # Include reactions if needed (optional)
-                if "reactions" in message:
-                    normalized_message["reactions"] = message["reactions"]
-                merged_data["messages"].append(normalized_message)
-
-    # Sort messages by timestamp (ascending) to maintain chronological order
-    merged_data["messages"].sort(key=lambda x: x["timestamp_ms"])
-    return merged_data
\ No newline at end of file
+    directory = sys.argv[1] if len(sys.argv) > 1 else "data"
+    context = multiprocessing.get_context("spawn")
+    for loader_name in ("json.load", "stream (dicts)", "stream", "stream (sem acumular)"):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            peak = executor.submit(_peak_rss_mb, loader_name, directory).result()
+        print(f"{loader_name:>22}: pico RSS {peak:.1f} MB")
@@ -0,0 +1,113 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Optional
+
+# Opções do agendador (com o seu valor) que não passam para cada conversa
+SCHEDULER_OPTIONS = {"--conversations-root", "--processes", "--llm-concurrency", "--data-dir", "--reports-dir"}
+
+def find_conversations(root: str) -> List[str]:
+    """Subdirectories of `root` holding an export (message_*.json), e.g. the threads of inbox/."""
+    conversations = []
+    for name in sorted(os.listdir(root)):
+        directory = os.path.join(root, name)
+        if os.path.isdir(directory) and any(f.startswith("message_") and f.endswith(".json") for f in os.listdir(directory)):
+            conversations.append(directory)
+    return conversations
+
+def strip_scheduler_args(argv: Optional[List[str]]) -> List[str]:
+    """Pipeline arguments to forward to every conversation, without the scheduler's own options."""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    forwarded, skip = [], False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg in SCHEDULER_OPTIONS:
+            skip = True
+        elif arg.split("=", 1)[0] not in SCHEDULER_OPTIONS:
+            forwarded.append(arg)
+    return forwarded
+
+def _init_worker(limiter):
+    from ai.model_client import set_request_limiter
+    set_request_limiter(limiter)
+
+def _run_conversation(conversation_dir: str, argv: List[str]) -> dict:
+    # Processo reutilizado entre conversas: métricas e progresso recomeçam em cada uma
+    import main as pipeline
+    from utils.metrics import metrics
+    from utils.progress import progress
+
+    metrics.reset()
+    progress.reset()
+    start = time.perf_counter()
+    report = pipeline.main(argv)
+    seconds = time.perf_counter() - start
+    data = metrics.to_dict()
+    messages = next((s.get("messages", 0) for s in data["stages"] if s["stage"] == "load_conversations"), 0)
+    return {
+        "conversation": os.path.basename(os.path.normpath(conversation_dir)),
+        "report": report,
+        "messages": messages,
+        "seconds": round(seconds, 2),
+        "messages_per_s": round(messages / seconds, 1) if seconds else 0.0,
+        "llm_calls": data["counters"].get("model_calls", 0),
+        "tokens": data["counters"].get("prompt_tokens", 0) + data["counters"].get("completion_tokens", 0)
+    }
+
+def run_conversations(conversation_dirs: List[str], argv: List[str], processes: int = 2, llm_concurrency: int = 4,
+                      reports_root: str = "reports") -> List[dict]:
+    """
+    Run the pipeline on many conversations at once, one worker process per conversation.
+
+    Every conversation keeps its memories in its own directory and writes its
+    reports to `reports_root/<conversation>`. All workers share one
+    cross-process semaphore, so at most `llm_concurrency` model requests are
+    in flight in total, whatever `--concurrency` each conversation uses.
+
+    Args:
+        conversation_dirs (list): Export directories, one per conversation.
+        argv (list): Pipeline arguments forwarded to each conversation.
+        processes (int): Conversations analyzed at the same time.
+        llm_concurrency (int): Model requests in flight across all processes.
+        reports_root (str): Parent directory of the per-conversation report directories.
+
+    Returns:
+        list: Per-conversation results (messages, seconds, messages/s, LLM calls, tokens, report path or error).
+    """
+    context = multiprocessing.get_context("spawn")
+    limiter = context.BoundedSemaphore(llm_concurrency)
+    print(f"🗂 {len(conversation_dirs)} conversas, {processes} processos, {llm_concurrency} pedidos ao modelo em simultâneo")
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                             initializer=_init_worker, initargs=(limiter,)) as executor:
+        futures = {}
+        for directory in conversation_dirs:
+            conversation = os.path.basename(os.path.normpath(directory))
+            conversation_argv = argv + ["--data-dir", directory, "--reports-dir", os.path.join(reports_root, conversation)]
+            futures[executor.submit(_run_conversation, directory, conversation_argv)] = conversation
+        for future in as_completed(futures):
+            conversation = futures[future]
+            try:
+                result = future.result()
+                print(f"✅ {conversation}: {result['messages']} mensagens em {result['seconds']:.1f}s "
+                      f"({result['messages_per_s']:.0f} msg/s), {result['llm_calls']} chamadas LLM")
+            except Exception as e:
+                result = {"conversation": conversation, "error": str(e)}
+                print(f"❌ {conversation}: {str(e)}")
+            results.append(result)
+    seconds = time.perf_counter() - start
+    messages = sum(r.get("messages", 0) for r in results)
+    print(f"🗂 Concluído: {messages} mensagens de {len(results)} conversas em {seconds:.1f}s "
+          f"({messages / seconds if seconds else 0:.0f} msg/s no total)")
+    summary_path = os.path.join(reports_root, f"schedule_{datetime.today().strftime('%Y-%m-%d')}.json")
+    os.makedirs(reports_root, exist_ok=True)
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump({"seconds": round(seconds, 2), "conversations": results}, f, indent=2, ensure_ascii=False)
+    print(f"📈 Resumo salvo em {summary_path}")
+    return results
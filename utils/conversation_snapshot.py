@@ -0,0 +1,145 @@
+import hashlib
+import os
+from typing import Dict, List, Optional
+from utils.conversation_loader import load_export, parse_export_file
+from utils.message_store import MessageStore
+
+SNAPSHOT_NAME = "conversation.snapshot"
+_HASH_CHUNK = 1 << 20
+
+def file_fingerprint(path: str, with_hash: bool = True) -> Dict:
+    """Size, mtime and (optionally) SHA-256 of `path`, the key a snapshot is valid for."""
+    stat = os.stat(path)
+    fingerprint = {"name": os.path.basename(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                digest.update(chunk)
+        fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+def _json_files(directory: str) -> List[str]:
+    return sorted(f for f in os.listdir(directory) if f.endswith('.json'))
+
+def is_current(directory: str, meta: dict, audio_placeholder: str, stat_only: bool = False) -> bool:
+    """
+    Check a snapshot's key against the export files on disk.
+
+    Stale when an export file was added, removed or resized. Other JSON
+    files in the folder (the memories) are not part of the key; one that
+    appeared since ingest is parsed, and only counts if it holds messages
+    or participants. A file whose mtime changed but size did not (copied,
+    touched) is hashed, and only a different hash makes the snapshot stale.
+
+    With `stat_only` nothing is read: a new JSON file or a changed mtime
+    counts as stale, since only parsing or hashing could clear it.
+    """
+    if meta.get("audio_placeholder") != audio_placeholder:
+        return False
+    sources = {source["name"]: source for source in meta.get("sources", [])}
+    known = set(sources) | set(meta.get("ignored", []))
+    for name in _json_files(directory):
+        if name not in known and (stat_only or any(parse_export_file(os.path.join(directory, name), audio_placeholder))):
+            return False
+    for name, source in sources.items():
+        path = os.path.join(directory, name)
+        try:
+            current = file_fingerprint(path, with_hash=False)
+        except FileNotFoundError:
+            return False
+        if current["size"] != source["size"]:
+            return False
+        if current["mtime_ns"] != source["mtime_ns"] and (stat_only or file_fingerprint(path)["sha256"] != source["sha256"]):
+            return False
+    return True
+
+def load_snapshot(directory: str, audio_placeholder: str, stat_only: bool = False) -> Optional[Dict]:
+    """Map the directory's snapshot, or None when there is none or it no longer matches the export (see `is_current`)."""
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        meta = MessageStore.read_meta(path)
+        if not is_current(directory, meta, audio_placeholder, stat_only):
+            if not stat_only:
+                print(f"♻️ Snapshot {path} desatualizado, a reconstruir")
+            return None
+        messages, meta = MessageStore.load(path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Snapshot {path} ilegível ({e}), a reconstruir")
+        return None
+    return {"participants": meta["participants"], "messages": messages, "duplicates": meta.get("duplicates", 0)}
+
+def load_conversation(directory: str, audio_placeholder: str = "[Audio message]", max_workers: Optional[int] = None,
+                      use_snapshot: bool = True) -> Dict:
+    """
+    Load a conversation export, from its binary snapshot when it is still current.
+
+    The first load parses the JSON export (`load_export`), builds the
+    MessageStore and saves it as `SNAPSHOT_NAME` in the same folder, keyed
+    by the size, mtime and hash of every export file. Later loads map that
+    file instead of parsing, until an export file changes. A snapshot that
+    only passed after parsing a new JSON file or hashing a touched one is
+    saved again with the current key, so the stat-only check passes too.
+
+    Args:
+        directory (str): Path to the directory containing JSON files.
+        audio_placeholder (str): Content used for audio-only messages (part of the key).
+        max_workers (int, optional): Maximum number of parsing processes.
+        use_snapshot (bool): Read and write the snapshot; False always parses the export.
+
+    Returns:
+        dict: participants, messages (MessageStore), duplicates removed at ingest and
+        whether it came from the snapshot.
+    """
+    if use_snapshot:
+        data = load_snapshot(directory, audio_placeholder)
+        if data is not None:
+            _refresh_key(directory, data, audio_placeholder)
+            return {**data, "from_snapshot": True}
+
+    before = {name: file_fingerprint(os.path.join(directory, name), with_hash=False)
+              for name in _json_files(directory)}
+    stats = {}
+    participants, store = load_export(directory, audio_placeholder, max_workers, stats)
+    data = {"participants": participants, "messages": store, "duplicates": stats.get("duplicates", 0),
+            "from_snapshot": False}
+    if use_snapshot:
+        save_snapshot(directory, data, stats["sources"], before, audio_placeholder)
+    return data
+
+def _refresh_key(directory: str, data: Dict, audio_placeholder: str):
+    # Snapshot verificado mas com ficheiros novos ou tocados: regrava a chave para a verificação só com stat voltar a passar
+    meta = MessageStore.read_meta(os.path.join(directory, SNAPSHOT_NAME))
+    if is_current(directory, meta, audio_placeholder, stat_only=True):
+        return
+    before = {name: file_fingerprint(os.path.join(directory, name), with_hash=False)
+              for name in _json_files(directory)}
+    save_snapshot(directory, data, [source["name"] for source in meta["sources"]], before, audio_placeholder)
+
+def save_snapshot(directory: str, data: Dict, sources: List[str], before: Dict[str, Dict], audio_placeholder: str):
+    """Save the loaded conversation as the directory's snapshot, unless an export changed while it was parsed."""
+    names = {os.path.basename(source) for source in sources}
+    fingerprints = []
+    for name in sorted(names):
+        fingerprint = file_fingerprint(os.path.join(directory, name))
+        previous = before.get(name)
+        if previous is None or (previous["size"], previous["mtime_ns"]) != (fingerprint["size"], fingerprint["mtime_ns"]):
+            print(f"⚠️ {name} mudou durante a leitura, snapshot não guardado")
+            return
+        fingerprints.append(fingerprint)
+    meta = {
+        "audio_placeholder": audio_placeholder,
+        "sources": fingerprints,
+        "ignored": sorted(set(before) - names),
+        "participants": data["participants"],
+        "duplicates": data["duplicates"]
+    }
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    try:
+        data["messages"].save(path, meta)
+    except OSError as e:
+        print(f"⚠️ Não foi possível guardar o snapshot {path}: {str(e)}")
+        return
+    print(f"💾 Snapshot das mensagens salvo em {path}")
@@ -0,0 +1,114 @@
+import bisect
+from array import array
+from typing import Iterable, Iterator, Optional, Tuple
+from utils.message_store import MessageStore
+
+class InteractionBlocks:
+    """
+    Lazy, index-based view of the interaction blocks of a MessageStore.
+
+    Consecutive messages from the same sender are coalesced into a turn, and
+    every pair of adjacent turns is a block (a turn and the reply to it), so
+    each change of sender is analyzed exactly once and every turn but the
+    first and last is the response of one block and the input of the next.
+    A block is only three message indices (start, reply start, end) in int64 arrays;
+    the {"input": turn, "response": turn} dict the analyzers read is built
+    when a block is indexed and not kept.
+
+    Args:
+        messages (MessageStore): Chronologically sorted messages.
+    """
+
+    def __init__(self, messages: MessageStore, starts: array = None, splits: array = None, ends: array = None):
+        self.messages = messages
+        if starts is None:
+            starts, splits, ends = self._pair_turns(messages)
+        self.starts, self.splits, self.ends = starts, splits, ends
+
+    @staticmethod
+    def _pair_turns(messages: MessageStore) -> Tuple[array, array, array]:
+        bounds = [0]
+        previous = None
+        for index in range(len(messages)):
+            sender = messages.sender_index(index)
+            if index and sender != previous:
+                bounds.append(index)
+            previous = sender
+        bounds.append(len(messages))
+        turns = len(bounds) - 1
+        starts, splits, ends = array('q'), array('q'), array('q')
+        for turn in range(turns - 1):
+            starts.append(bounds[turn])
+            splits.append(bounds[turn + 1])
+            ends.append(bounds[turn + 2])
+        return starts, splits, ends
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def range(self, index: int) -> Tuple[int, int]:
+        """Message index range [start, end) of block `index`."""
+        return self.starts[index], self.ends[index]
+
+    def ranges(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.starts, self.ends)
+
+    def turn(self, start: int, stop: int) -> dict:
+        """One turn as the analyzers read it: first timestamp, one line per message, total reactions."""
+        messages = self.messages
+        return {
+            "sender": messages.sender(start),
+            "timestamp_ms": messages.timestamp(start),
+            "message": "\n".join(messages.content(i) for i in range(start, stop)),
+            "reactions": sum(len(messages.reactions(i)) for i in range(start, stop))
+        }
+
+    def turn_messages(self, index: int) -> Tuple[Iterator[Tuple[str, int]], Iterator[Tuple[str, int]]]:
+        """(content, reactions) of each message of block `index`, input turn then response turn."""
+        messages = self.messages
+
+        def turn(start, stop):
+            return ((messages.content(i), len(messages.reactions(i))) for i in range(start, stop))
+
+        return turn(self.starts[index], self.splits[index]), turn(self.splits[index], self.ends[index])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._subset(key)
+        return {
+            "input": self.turn(self.starts[key], self.splits[key]),
+            "response": self.turn(self.splits[key], self.ends[key])
+        }
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def _subset(self, key) -> "InteractionBlocks":
+        return InteractionBlocks(self.messages, self.starts[key], self.splits[key], self.ends[key])
+
+    def take(self, indices: Iterable[int]) -> "InteractionBlocks":
+        """View of the blocks at `indices` (e.g. those kept by the salience filter)."""
+        indices = list(indices)
+        return InteractionBlocks(self.messages, array('q', (self.starts[i] for i in indices)),
+                                 array('q', (self.splits[i] for i in indices)), array('q', (self.ends[i] for i in indices)))
+
+    def after(self, watermark_ms: Optional[int]) -> "InteractionBlocks":
+        """
+        Blocks whose reply turn starts after `watermark_ms` (all of them without a watermark).
+
+        A block already analyzed keeps its reply start when later messages
+        extend its reply turn, so it is never selected again; those messages
+        are analyzed as the input of the next block once someone answers.
+        """
+        if watermark_ms is None:
+            return self
+        first = bisect.bisect_right(range(len(self)), watermark_ms, key=lambda b: self.messages.timestamp(self.splits[b]))
+        return self[first:]
+
+    def within(self, start: int, stop: int) -> "InteractionBlocks":
+        """Blocks starting at a message index in [start, stop), e.g. one week of `week_partitions`."""
+        return self[bisect.bisect_left(self.starts, start):bisect.bisect_left(self.starts, stop)]
+
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in (self.starts, self.splits, self.ends))
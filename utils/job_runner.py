@@ -0,0 +1,98 @@
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+_queue = None
+
+def _init_worker(queue):
+    global _queue
+    _queue = queue
+
+def _run_job(job_id: str, argv: List[str]):
+    # Corre num processo próprio: métricas e progresso globais não se misturam entre trabalhos
+    import main as pipeline
+    from utils.progress import progress
+
+    progress.reset()
+    progress.listener = lambda snapshot: _queue.put((job_id, "progress", snapshot))
+    _queue.put((job_id, "running", progress.snapshot()))
+    result = pipeline.main(argv)
+    return result
+
+class JobRunner:
+    """
+    Local background pool running analysis jobs (main.main) in worker processes.
+
+    Progress snapshots come back from the workers through a queue and are kept
+    per job; `wait` lets a streaming endpoint block until a job changes.
+
+    Args:
+        max_workers (int): Number of analysis jobs allowed to run at once.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        context = multiprocessing.get_context("spawn")
+        self._queue = context.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                             initializer=_init_worker, initargs=(self._queue,))
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self.jobs = {}
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def submit(self, argv: List[str]) -> str:
+        job_id = str(next(self._ids))
+        with self._condition:
+            self.jobs[job_id] = {"id": job_id, "argv": argv, "state": "queued", "version": 0,
+                                 "progress": None, "result": None, "error": None, "submitted_at": time.time()}
+        future = self._executor.submit(_run_job, job_id, argv)
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._condition:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self) -> List[dict]:
+        with self._condition:
+            return [dict(job) for job in self.jobs.values()]
+
+    def wait(self, job_id: str, version: int, timeout: float = 15.0) -> Optional[dict]:
+        """Block until the job's version differs from `version` (or `timeout`), then return it."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: job_id not in self.jobs or self.jobs[job_id]["version"] != version, timeout=timeout
+            )
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _update(self, job_id: str, **fields):
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job["version"] += 1
+            self._condition.notify_all()
+
+    def _pump(self):
+        while True:
+            job_id, state, snapshot = self._queue.get()
+            if state == "running" and (self.get(job_id) or {}).get("state") == "queued":
+                self._update(job_id, state=state, progress=snapshot)
+            else:
+                # Mensagens atrasadas não podem desfazer um estado final, só atualizar o progresso
+                self._update(job_id, progress=snapshot)
+
+    def _finish(self, job_id: str, future):
+        try:
+            self._update(job_id, state="done", result=future.result())
+        except Exception as e:
+            self._update(job_id, state="failed", error=str(e))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,190 @@
+from typing import Any, Optional
+
+_WHITESPACE = " \t\n\r"
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+class _LenientParser:
+    """
+    Single-pass, linear-time parser for the almost-JSON that small models emit.
+
+    Tolerates Markdown fences and prose around the value, // and /* */
+    comments, single-quoted or bare keys and strings, Python literals,
+    missing or trailing commas, and truncation: structures still open at the
+    end of the text are closed, keeping every member that arrived (a key
+    without a value is dropped, a cut-off string is kept as is). A value
+    missing before a comma or closing bracket (`{"a": }`, `[1,,2]`) raises
+    ValueError instead of being guessed.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.length = len(text)
+
+    def _skip(self):
+        text, length = self.text, self.length
+        while self.pos < length:
+            char = text[self.pos]
+            if char in _WHITESPACE:
+                self.pos += 1
+            elif text.startswith("//", self.pos):
+                end = text.find("\n", self.pos)
+                self.pos = length if end == -1 else end + 1
+            elif text.startswith("/*", self.pos):
+                end = text.find("*/", self.pos + 2)
+                self.pos = length if end == -1 else end + 2
+            else:
+                return
+
+    def parse(self) -> Optional[Any]:
+        # Ignora tudo (prosa, ```json) até ao primeiro objeto ou lista
+        start = min((i for i in (self.text.find("{"), self.text.find("[")) if i != -1), default=-1)
+        if start == -1:
+            return None
+        self.pos = start
+        return self._value()
+
+    def _value(self):
+        self._skip()
+        if self.pos >= self.length:
+            raise EOFError
+        char = self.text[self.pos]
+        if char in ",}]":
+            raise ValueError(f"Valor em falta na posição {self.pos}")
+        if char == "{":
+            return self._object()
+        if char == "[":
+            return self._array()
+        if char in "\"'":
+            return self._string(char)
+        return self._bare()
+
+    def _object(self) -> dict:
+        self.pos += 1
+        result = {}
+        separated = True  # Nenhum membro desde a última vírgula (ou a chaveta)
+        while True:
+            self._skip()
+            if self.pos >= self.length:
+                return result
+            char = self.text[self.pos]
+            if char == "}":
+                self.pos += 1
+                return result
+            if char == "]":  # Fecho trocado pelo modelo
+                self.pos += 1
+                return result
+            if char == ",":
+                self._separator(separated)
+                separated = True
+                continue
+            separated = False
+            try:
+                key = self._string(char) if char in "\"'" else self._bare_word(":")
+                self._skip()
+                if self.pos < self.length and self.text[self.pos] == ":":
+                    self.pos += 1
+                result[str(key)] = self._value()
+            except EOFError:
+                return result
+
+    def _array(self) -> list:
+        self.pos += 1
+        result = []
+        separated = True  # Nenhum elemento desde a última vírgula (ou o parêntese)
+        while True:
+            self._skip()
+            if self.pos >= self.length:
+                return result
+            char = self.text[self.pos]
+            if char == "]":
+                self.pos += 1
+                return result
+            if char == "}":
+                self.pos += 1
+                return result
+            if char == ",":
+                self._separator(separated)
+                separated = True
+                continue
+            separated = False
+            try:
+                result.append(self._value())
+            except EOFError:
+                return result
+
+    def _separator(self, separated: bool):
+        # Vírgula a mais no fim é tolerada; duas seguidas (ou logo após a abertura) são um valor em falta
+        if separated:
+            raise ValueError(f"Valor em falta na posição {self.pos}")
+        self.pos += 1
+
+    def _string(self, quote: str) -> str:
+        text, length = self.text, self.length
+        self.pos += 1
+        parts = []
+        start = self.pos
+        while self.pos < length:
+            char = text[self.pos]
+            if char == quote:
+                parts.append(text[start:self.pos])
+                self.pos += 1
+                return "".join(parts)
+            if char == "\\" and self.pos + 1 < length:
+                parts.append(text[start:self.pos])
+                escape = text[self.pos + 1]
+                if escape == "u" and self.pos + 6 <= length:
+                    try:
+                        parts.append(chr(int(text[self.pos + 2:self.pos + 6], 16)))
+                        self.pos += 6
+                    except ValueError:
+                        parts.append(escape)
+                        self.pos += 2
+                else:
+                    parts.append(_ESCAPES.get(escape, escape))
+                    self.pos += 2
+                start = self.pos
+                continue
+            self.pos += 1
+        # String truncada: fica com o que chegou
+        parts.append(text[start:])
+        return "".join(parts)
+
+    def _bare_word(self, stops: str) -> str:
+        start = self.pos
+        text, length = self.text, self.length
+        while self.pos < length and text[self.pos] not in stops and text[self.pos] not in ',{}[]"\n':
+            self.pos += 1
+        if self.pos == start:
+            # Carácter inesperado: consome-o para garantir progresso
+            self.pos += 1
+        return text[start:self.pos].strip()
+
+    def _bare(self):
+        word = self._bare_word("")
+        if word in _LITERALS:
+            return _LITERALS[word]
+        try:
+            return int(word)
+        except ValueError:
+            pass
+        try:
+            return float(word)
+        except ValueError:
+            return word
+
+def parse_lenient(text: str) -> Optional[Any]:
+    """
+    Parse the first JSON object or array in `text`, recovering what it can.
+
+    Returns:
+        The parsed value, or None when the text contains no object or array
+        or a value is missing from it.
+    """
+    if not text:
+        return None
+    try:
+        return _LenientParser(text).parse()
+    except (RecursionError, ValueError):
+        return None
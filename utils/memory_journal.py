@@ -0,0 +1,192 @@
+import copy
+import json
+import os
+import threading
+
+_SEQ_KEY = "_journal_seq"
+
+class MemoryCorruptError(ValueError):
+    """Raised when a memory snapshot exists but cannot be parsed."""
+
+def atomic_write_json(path: str, data, **dump_kwargs):
+    """Write JSON to `path` so readers see either the old or the new file, never a partial one."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class MemoryJournal:
+    """
+    Journaled persistence of one AI memory dict.
+
+    The state is a JSON snapshot (`path`, the same format the memory files
+    always had) plus an append-only JSONL log (`path + ".log"`) of changes
+    since that snapshot. `save` diffs the new memory against the last known
+    state and appends only what changed: new items at the end of a list
+    become `append` ops, any other change a `set`/`del` of that top-level key.
+    Once the log holds `compact_every` ops it is folded into a new snapshot,
+    written atomically.
+
+    Every op carries a sequence number and the snapshot records the last one
+    it contains, so replaying a log left behind by a crash during compaction
+    never applies an op twice. A torn final line (crash mid-append) is cut
+    off the log when it is read, so later appends start on a fresh line.
+
+    Args:
+        path (str): Snapshot file, e.g. data/rui_memory.json.
+        compact_every (int): Number of logged ops that triggers a compaction.
+    """
+
+    def __init__(self, path: str, compact_every: int = 200):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._state = None
+        self._seq = 0
+        self._logged = 0
+
+    def load(self) -> dict:
+        """Return a copy of the stored memory ({} when nothing was saved yet), re-read from disk."""
+        with self._lock:
+            self._read()
+            return copy.deepcopy(self._state)
+
+    def _read(self):
+        state = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            if content:
+                try:
+                    state = json.loads(content)
+                except json.JSONDecodeError as e:
+                    raise MemoryCorruptError(f"{self.path} está corrompido ({e})") from e
+            if not isinstance(state, dict):
+                raise MemoryCorruptError(f"{self.path} não contém um objeto JSON")
+        self._seq = state.pop(_SEQ_KEY, 0)
+        self._logged = 0
+        if os.path.exists(self.log_path):
+            complete = 0
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    # Só conta uma op com a linha completa (terminada em \n)
+                    try:
+                        op = json.loads(line) if line.endswith(b"\n") else None
+                    except json.JSONDecodeError:
+                        op = None
+                    if op is None:
+                        break
+                    complete += len(line)
+                    if op["seq"] <= self._seq:
+                        continue
+                    self._apply(state, op)
+                    self._seq = op["seq"]
+                    self._logged += 1
+                torn = f.seek(0, os.SEEK_END) > complete
+            if torn:
+                # Corta a linha incompleta: as próximas ops não podem ser anexadas a ela
+                print(f"⚠️ Linha incompleta no fim de {self.log_path}, removida")
+                with open(self.log_path, "r+b") as f:
+                    f.truncate(complete)
+                    f.flush()
+                    os.fsync(f.fileno())
+        self._state = state
+
+    @staticmethod
+    def _apply(state: dict, op: dict):
+        key = op["key"]
+        if op["op"] == "set":
+            state[key] = op["value"]
+        elif op["op"] == "del":
+            state.pop(key, None)
+        elif op["op"] == "append":
+            items = state.get(key) if isinstance(state.get(key), list) else []
+            items.append(op["value"])
+            cap = op.get("cap")
+            state[key] = items[-cap:] if cap else items
+
+    @staticmethod
+    def _diff(old: dict, new: dict) -> list:
+        ops = []
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "set", "key": key, "value": value})
+                continue
+            previous = old[key]
+            if previous == value:
+                continue
+            if isinstance(previous, list) and isinstance(value, list):
+                # Lista que cresceu pelo fim (eventualmente cortada no início): só os itens novos
+                for shift in range(max(len(previous), 1)):
+                    kept = len(previous) - shift
+                    if kept <= len(value) and previous[shift:] == value[:kept] and kept < len(value):
+                        cap = len(value) if shift else None
+                        ops.extend({"op": "append", "key": key, "value": item, "cap": cap} for item in value[kept:])
+                        break
+                else:
+                    ops.append({"op": "set", "key": key, "value": value})
+                continue
+            ops.append({"op": "set", "key": key, "value": value})
+        ops.extend({"op": "del", "key": key} for key in old if key not in new)
+        return ops
+
+    def save(self, memory: dict) -> int:
+        """Persist `memory`, appending only the changes; returns the number of ops written."""
+        with self._lock:
+            if self._state is None:
+                self._read()
+            memory = copy.deepcopy(memory)
+            ops = self._diff(self._state, memory)
+            if not ops:
+                return 0
+            lines = []
+            for op in ops:
+                self._seq += 1
+                op["seq"] = self._seq
+                lines.append(json.dumps(op, ensure_ascii=False))
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._state = memory
+            self._logged += len(ops)
+            if self._logged >= self.compact_every or not os.path.exists(self.path):
+                self._compact()
+            return len(ops)
+
+    def compact(self):
+        with self._lock:
+            if self._state is None:
+                self._read()
+            self._compact()
+
+    def _compact(self):
+        # Snapshot primeiro (atómico), log depois: um crash entre os dois só deixa ops já incluídas
+        atomic_write_json(self.path, {**self._state, _SEQ_KEY: self._seq}, indent=2)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self._logged = 0
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+def journal_for(path: str) -> MemoryJournal:
+    """Return the process-wide journal of `path`, so saves diff against what was last loaded or saved."""
+    path = os.path.abspath(path)
+    with _journals_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = _journals[path] = MemoryJournal(path)
+        return journal
+
+def load_journaled(path: str) -> dict:
+    return journal_for(path).load()
+
+def save_journaled(path: str, memory: dict) -> int:
+    return journal_for(path).save(memory)
@@ -0,0 +1,328 @@
+import bisect
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import islice, repeat
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_MAGIC = b"MSGSTORE"
+_VERSION = 1
+_HEADER = struct.Struct("<8sII")  # magic, version, length of the JSON metadata
+
+def _pad(size: int) -> int:
+    return -size % 8
+
+class MessageStore:
+    """
+    Compact, columnar, time-ordered store of conversation messages.
+
+    Timestamps live in an int64 array, senders are small-int ids interned from
+    the participant list, and message content is kept UTF-8 encoded in a single
+    contiguous buffer addressed by offsets. Reactions are rare and stored
+    sparsely by message index.
+
+    Slicing by index or by time range returns a view over the same columns,
+    so sub-ranges cost O(1) memory.
+
+    `save` writes the columns as one binary file and `load` maps it back with
+    mmap: the columns become memoryviews over the mapping, so opening a store
+    costs no parsing and pages are read only when touched. A loaded store is
+    read-only.
+    """
+
+    def __init__(self, participants: Optional[List[str]] = None):
+        self.participants: List[str] = []
+        self._sender_ids: Dict[str, int] = {}
+        self.timestamps = array('q')
+        self.senders = array('H')
+        self.offsets = array('q', [0])
+        self._content = bytearray()
+        self._reactions: Dict[int, list] = {}
+        self._start = 0
+        self._stop = None
+        for name in participants or []:
+            self.sender_id(name)
+
+    # === Construction ===
+    def sender_id(self, name: str) -> int:
+        sender_id = self._sender_ids.get(name)
+        if sender_id is None:
+            sender_id = len(self.participants)
+            self.participants.append(name)
+            self._sender_ids[name] = sender_id
+        return sender_id
+
+    def append(self, sender_name: str, timestamp_ms: int, content: str, reactions: Optional[list] = None):
+        index = len(self.timestamps)
+        self.timestamps.append(timestamp_ms or 0)
+        self.senders.append(self.sender_id(sender_name))
+        self._content += (content or "").encode('utf-8')
+        self.offsets.append(len(self._content))
+        if reactions:
+            self._reactions[index] = reactions
+
+    @classmethod
+    def from_messages(cls, messages: Iterable[Dict], participants: Optional[list] = None) -> "MessageStore":
+        """
+        Build a chronologically sorted store from normalized message dicts.
+
+        Messages are consumed one at a time, so `messages` can be a generator.
+        `participants` (names or {"name": ...} dicts) may be filled by that same
+        generator; new entries are interned before the next message is stored,
+        so sender ids follow the participant list. The sort is stable, matching
+        `list.sort(key=timestamp_ms)`.
+        """
+        store = cls()
+        participants = participants if participants is not None else []
+        interned = 0
+        for message in messages:
+            while interned < len(participants):
+                participant = participants[interned]
+                store.sender_id(participant["name"] if isinstance(participant, dict) else participant)
+                interned += 1
+            store.append(message["sender_name"], message["timestamp_ms"], message.get("content", ""), message.get("reactions"))
+        for participant in participants[interned:]:
+            store.sender_id(participant["name"] if isinstance(participant, dict) else participant)
+        store._sort()
+        return store
+
+    @classmethod
+    def merge(cls, runs: List["MessageStore"], participants: Optional[list] = None) -> "MessageStore":
+        """
+        K-way merge of sorted stores into one, copying columns without building message dicts.
+
+        Ties keep the order of `runs`, so the result equals a stable sort of
+        their concatenation. Senders are re-interned after `participants`.
+        """
+        merged = cls([p["name"] if isinstance(p, dict) else p for p in participants or []])
+        sender_maps = [[merged.sender_id(name) for name in run.participants] for run in runs]
+        streams = [zip(run.timestamps[run._start:run._start + len(run)], repeat(k), range(run._start, run._start + len(run)))
+                   for k, run in enumerate(runs)]
+        timestamps, senders, offsets, content = merged.timestamps, merged.senders, merged.offsets, merged._content
+        for timestamp, k, i in heapq.merge(*streams):
+            run = runs[k]
+            if i in run._reactions:
+                merged._reactions[len(timestamps)] = run._reactions[i]
+            timestamps.append(timestamp)
+            senders.append(sender_maps[k][run.senders[i]])
+            content += run._content[run.offsets[i]:run.offsets[i + 1]]
+            offsets.append(len(content))
+        return merged
+
+    def drop_duplicates(self) -> int:
+        """
+        Remove messages equal to an earlier one in sender, timestamp and content; returns how many.
+
+        Duplicates share a timestamp, so only runs of equal timestamps are
+        compared and the pass is linear; the columns are rebuilt only when
+        something was dropped.
+        """
+        timestamps, senders, offsets, content = self.timestamps, self.senders, self.offsets, self._content
+
+        def key(i):
+            return senders[i], bytes(content[offsets[i]:offsets[i + 1]])
+
+        dropped = []
+        seen, previous = set(), None
+        # Só os índices com o mesmo timestamp que o anterior; seguidos pertencem ao mesmo grupo
+        for index in [i for i, (a, b) in enumerate(zip(timestamps, islice(timestamps, 1, None)), 1) if a == b]:
+            if index - 1 != previous:
+                seen = {key(index - 1)}
+            previous = index
+            message_key = key(index)
+            if message_key in seen:
+                dropped.append(index)
+            seen.add(message_key)
+        if dropped:
+            dropped = set(dropped)
+            self._reorder([i for i in range(len(timestamps)) if i not in dropped])
+        return len(dropped)
+
+    def _sort(self):
+        timestamps = self.timestamps
+        if all(timestamps[i] <= timestamps[i + 1] for i in range(len(timestamps) - 1)):
+            return
+        self._reorder(sorted(range(len(timestamps)), key=timestamps.__getitem__))
+
+    def _reorder(self, order):
+        timestamps = self.timestamps
+        offsets, content = self.offsets, self._content
+        new_content = bytearray()
+        new_offsets = array('q', [0])
+        for index in order:
+            new_content += content[offsets[index]:offsets[index + 1]]
+            new_offsets.append(len(new_content))
+        position = {old: new for new, old in enumerate(order)}
+        self.timestamps = array('q', (timestamps[i] for i in order))
+        self.senders = array('H', (self.senders[i] for i in order))
+        self.offsets = new_offsets
+        self._content = new_content
+        self._reactions = {position[i]: r for i, r in self._reactions.items() if i in position}
+
+    # === Access ===
+    def __len__(self) -> int:
+        stop = len(self.timestamps) if self._stop is None else self._stop
+        return stop - self._start
+
+    def _absolute(self, index: int) -> int:
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("MessageStore index out of range")
+        return self._start + index
+
+    def timestamp(self, index: int) -> int:
+        return self.timestamps[self._absolute(index)]
+
+    def sender(self, index: int) -> str:
+        return self.participants[self.senders[self._absolute(index)]]
+
+    def sender_index(self, index: int) -> int:
+        return self.senders[self._absolute(index)]
+
+    def content(self, index: int) -> str:
+        i = self._absolute(index)
+        return str(self._content[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+    def reactions(self, index: int) -> list:
+        return self._reactions.get(self._absolute(index), [])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("MessageStore slices do not support a step")
+            return self._view(self._start + start, self._start + max(start, stop))
+        return {
+            "sender_name": self.sender(key),
+            "timestamp_ms": self.timestamp(key),
+            "content": self.content(key),
+            "reactions": self.reactions(key)
+        }
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def _view(self, start: int, stop: int) -> "MessageStore":
+        view = MessageStore.__new__(MessageStore)
+        view.__dict__.update(self.__dict__)
+        view._start, view._stop = start, stop
+        return view
+
+    # === Time range ===
+    def index_range(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Return the (start, stop) indices of messages with start_ms <= timestamp_ms < end_ms.
+        """
+        lo, hi = self._start, self._start + len(self)
+        start = lo if start_ms is None else bisect.bisect_left(self.timestamps, start_ms, lo, hi)
+        stop = hi if end_ms is None else bisect.bisect_left(self.timestamps, end_ms, lo, hi)
+        return start - self._start, max(start, stop) - self._start
+
+    def time_range(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> "MessageStore":
+        start, stop = self.index_range(start_ms, end_ms)
+        return self[start:stop]
+
+    # === Binary file ===
+    def save(self, path: str, meta: Optional[dict] = None):
+        """
+        Write the store (or this view) to `path` atomically.
+
+        Layout: header, JSON metadata (participants, reactions and the
+        caller's `meta`), then the timestamp, offset and sender columns in
+        native byte order and the content buffer, each 8-byte aligned.
+        """
+        start = self._start
+        stop = start + len(self)
+        base = self.offsets[start]
+        offsets = array('q', self.offsets[start:stop + 1])
+        if base:
+            offsets = array('q', (offset - base for offset in offsets))
+        columns = [array('q', self.timestamps[start:stop]), offsets, array('H', self.senders[start:stop])]
+        metadata = json.dumps({
+            "count": stop - start,
+            "byteorder": sys.byteorder,
+            "participants": self.participants,
+            "reactions": {str(i - start): r for i, r in self._reactions.items() if start <= i < stop},
+            "meta": meta or {}
+        }, ensure_ascii=False).encode('utf-8')
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, len(metadata)))
+            f.write(metadata + b"\0" * _pad(_HEADER.size + len(metadata)))
+            for column in columns:
+                data = column.tobytes()
+                f.write(data + b"\0" * _pad(len(data)))
+            f.write(self._content[self.offsets[start]:self.offsets[stop]])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_metadata(data) -> Tuple[dict, int]:
+        # Devolve os metadados e a posição (alinhada) onde começam as colunas
+        if len(data) < _HEADER.size:
+            raise ValueError("MessageStore file is truncated")
+        magic, version, length = _HEADER.unpack(bytes(data[:_HEADER.size]))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Not a MessageStore file ({magic!r}, version {version})")
+        end = _HEADER.size + length
+        if len(data) < end:
+            raise ValueError("MessageStore file is truncated")
+        metadata = json.loads(bytes(data[_HEADER.size:end]))
+        if metadata["byteorder"] != sys.byteorder:
+            raise ValueError("MessageStore file was written with another byte order")
+        return metadata, end + _pad(end)
+
+    @classmethod
+    def read_meta(cls, path: str) -> dict:
+        """Return the `meta` saved with the store at `path`, without mapping its columns."""
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            length = _HEADER.unpack(header)[2] if len(header) == _HEADER.size else 0
+            return cls._read_metadata(header + f.read(length))[0]["meta"]
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["MessageStore", dict]:
+        """
+        Map the store saved at `path` into memory.
+
+        Returns:
+            tuple: (read-only MessageStore, the `meta` it was saved with).
+
+        Raises:
+            ValueError: If the file is not a complete MessageStore file of this version.
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError("MessageStore file is empty")
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(mapping)
+        metadata, position = cls._read_metadata(buffer)
+        count = metadata["count"]
+        columns = []
+        for code, length in (('q', count), ('q', count + 1), ('H', count)):
+            size = length * array(code).itemsize
+            columns.append(buffer[position:position + size].cast(code))
+            position += size + _pad(size)
+        timestamps, offsets, senders = columns
+        if len(offsets) != count + 1 or len(buffer) - position != offsets[-1]:
+            raise ValueError("MessageStore file is truncated")
+
+        store = cls(metadata["participants"])
+        store.timestamps, store.offsets, store.senders = timestamps, offsets, senders
+        store._content = buffer[position:]
+        store._reactions = {int(i): r for i, r in metadata["reactions"].items()}
+        store._mapping = mapping
+        return store, metadata["meta"]
+
+    def nbytes(self) -> int:
+        return (self.timestamps.itemsize * len(self.timestamps) + self.senders.itemsize * len(self.senders)
+                + self.offsets.itemsize * len(self.offsets) + len(self._content))
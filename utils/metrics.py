@@ -0,0 +1,111 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Limites superiores (segundos) dos buckets dos histogramas de latência
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+
+class Metrics:
+    """
+    Collects per-stage timings, counters and latency histograms for a run.
+
+    Stages record wall time (and peak traced memory when tracemalloc is on);
+    counters accumulate counts such as batches or tokens; histograms keep every
+    observation so percentiles and bucket counts can be reported.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = []
+            self.counters = {}
+            self.observations = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a pipeline stage. The yielded dict can be filled with counts.
+        """
+        record = {"stage": name}
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            if tracing:
+                record["peak_bytes"] = tracemalloc.get_traced_memory()[1] - base
+            with self._lock:
+                self.stages.append(record)
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.observations.setdefault(name, []).append(value)
+
+    def timed(self, name: str):
+        """
+        Decorator recording the duration of every call in the `<name>_s` histogram.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(f"{name}_s", time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _histogram(values: list) -> dict:
+        values = sorted(values)
+        buckets = {}
+        index = 0
+        for bound in LATENCY_BUCKETS + [float("inf")]:
+            while index < len(values) and values[index] <= bound:
+                index += 1
+            buckets["+Inf" if bound == float("inf") else str(bound)] = index
+        return {
+            "count": len(values),
+            "sum": sum(values),
+            "min": values[0],
+            "max": values[-1],
+            "p50": values[len(values) // 2],
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "buckets": buckets  # cumulativo: observações <= limite
+        }
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "stages": list(self.stages),
+                "counters": dict(self.counters),
+                "histograms": {name: self._histogram(values) for name, values in self.observations.items() if values}
+            }
+
+    def save(self, path: str, extra: dict = None):
+        data = self.to_dict()
+        if extra:
+            data.update(extra)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        print(f"📈 Métricas salvas em {path}")
+
+# Instância partilhada pelo pipeline
+metrics = Metrics()
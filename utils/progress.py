@@ -0,0 +1,63 @@
+import threading
+import time
+from typing import Callable, Optional
+
+class Progress:
+    """
+    Run-wide progress of the analysis: planned and finished batches, tokens used and ETA.
+
+    Analysis code calls `plan` when it knows how many batches it will send and
+    `advance` as each one finishes; the model client reports tokens with
+    `add_tokens`. An optional `listener` receives every new snapshot (the
+    background job runner forwards them to the web app).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.listener: Optional[Callable[[dict], None]] = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.batches_total = 0
+            self.batches_done = 0
+            self.tokens = 0
+            self.started = time.perf_counter()
+
+    def plan(self, batches: int):
+        with self._lock:
+            self.batches_total += batches
+        self._emit()
+
+    def advance(self, batches: int = 1):
+        with self._lock:
+            self.batches_done += batches
+        self._emit()
+
+    def add_tokens(self, tokens: int):
+        with self._lock:
+            self.tokens += tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            remaining = max(self.batches_total - self.batches_done, 0)
+            rate = self.batches_done / elapsed if elapsed > 0 else 0.0
+            return {
+                "batches_done": self.batches_done,
+                "batches_total": self.batches_total,
+                "tokens": self.tokens,
+                "elapsed_s": round(elapsed, 1),
+                "eta_s": round(remaining / rate, 1) if rate > 0 else None
+            }
+
+    def _emit(self):
+        listener = self.listener
+        if listener is not None:
+            try:
+                listener(self.snapshot())
+            except Exception as e:
+                print(f"⚠️ Erro ao reportar progresso: {str(e)}")
+
+# Instância partilhada pelo pipeline
+progress = Progress()
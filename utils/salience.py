@@ -0,0 +1,125 @@
+import math
+import re
+from typing import List, Tuple
+from utils.batch_planner import estimate_tokens
+from utils.interaction_blocks import InteractionBlocks
+
+# Palavras com carga emocional/relacional (PT e EN), comparadas já em minúsculas
+EMOTION_LEXICON = {
+    "amo", "adoro", "amor", "saudade", "saudades", "querido", "querida", "obrigado", "obrigada", "desculpa",
+    "perdão", "feliz", "contente", "orgulho", "triste", "chateado", "chateada", "zangado", "zangada", "irritado",
+    "irritada", "magoado", "magoada", "magoou", "medo", "preocupado", "preocupada", "ansioso", "ansiosa",
+    "sozinho", "sozinha", "ciúmes", "culpa", "chorar", "chorei", "odeio", "farto", "farta", "cansado", "cansada",
+    "confiança", "confio", "sinto", "sente", "sentir", "relação", "discutir", "discussão", "acabar", "falar",
+    "love", "miss", "sorry", "happy", "sad", "angry", "upset", "hurt", "afraid", "worried", "jealous", "trust",
+}
+LOW_INFO_PLACEHOLDERS = {"[Mensagem de áudio]", "[Audio message]"}
+_WORD = re.compile(r"\w+", re.UNICODE)
+# Linhas de mensagem formatadas: "[YYYY-MM-DD HH:MM:SS] " + remetente + ": "
+_LINE_OVERHEAD_TOKENS = 8
+
+def score_message(text: str, reactions: int = 0) -> float:
+    """
+    Local salience of one message: 0 for placeholders and replies without a
+    real word ("???", "ok", emoji), otherwise length, emotion-lexicon hits,
+    questions/exclamations and reactions.
+    """
+    if not text or text in LOW_INFO_PLACEHOLDERS:
+        return reactions * 1.5
+    words = _WORD.findall(text.lower())
+    if len(words) < 2 and not any(word in EMOTION_LEXICON for word in words):
+        return reactions * 1.5
+    emotion_hits = sum(1 for word in words if word in EMOTION_LEXICON)
+    return (
+        math.log1p(len(words))
+        + 2.0 * emotion_hits
+        + 0.5 * min(text.count("?") + text.count("!"), 3)
+        + 1.5 * reactions
+    )
+
+def score_block(block: dict) -> float:
+    return sum(score_message(msg["message"], msg.get("reactions", 0)) for msg in (block["input"], block["response"]))
+
+def block_tokens(block: dict) -> int:
+    return sum(estimate_tokens(msg["message"]) + _LINE_OVERHEAD_TOKENS for msg in (block["input"], block["response"]))
+
+def _view_scores(blocks: InteractionBlocks) -> Tuple[List[float], List[int]]:
+    # Turnos coalescidos: cada mensagem é pontuada sozinha, para "ok", "???" e áudios continuarem a valer 0
+    scores, tokens = [], []
+    for index in range(len(blocks)):
+        score, size = 0.0, 0
+        for turn in blocks.turn_messages(index):
+            lines = 0
+            for content, reactions in turn:
+                score += score_message(content, reactions)
+                size += estimate_tokens(content)
+                lines += 1
+            size += _LINE_OVERHEAD_TOKENS + (lines - 1)  # um cabeçalho por turno, uma quebra por mensagem
+        scores.append(score)
+        tokens.append(size)
+    return scores, tokens
+
+def select_salient(blocks: list, token_budget: int = None, mode: str = "top",
+                   strata: int = 20) -> Tuple[List[dict], dict]:
+    """
+    Drop low-information blocks and optionally keep only the most salient ones within a token budget.
+
+    Blocks scoring 0 (both sides placeholders or filler) are always dropped.
+    With a `token_budget`, "top" keeps the highest-scoring blocks overall;
+    "spread" splits the timeline into `strata` equal slices and spends the
+    budget evenly across them, so quiet periods stay represented. Kept blocks
+    are returned in their original chronological order (as a sub-view when
+    `blocks` is an InteractionBlocks view).
+
+    Returns:
+        tuple: (kept blocks, stats with kept/dropped block and token counts).
+    """
+    if isinstance(blocks, InteractionBlocks):
+        scores, tokens = _view_scores(blocks)
+    else:
+        scores = [score_block(block) for block in blocks]
+        tokens = [block_tokens(block) for block in blocks]
+    candidates = [i for i, score in enumerate(scores) if score > 0]
+    prefiltered = len(blocks) - len(candidates)
+
+    if token_budget is None or sum(tokens[i] for i in candidates) <= token_budget:
+        kept = candidates
+    else:
+        if mode == "spread":
+            size = max(1, math.ceil(len(candidates) / strata))
+            groups = [candidates[i:i + size] for i in range(0, len(candidates), size)]
+        else:
+            groups = [candidates]
+        kept = []
+        leftover = []
+        share = token_budget // len(groups)
+        for group in groups:
+            spent = 0
+            for i in sorted(group, key=lambda i: -scores[i]):
+                if spent + tokens[i] <= share:
+                    kept.append(i)
+                    spent += tokens[i]
+                else:
+                    leftover.append(i)
+        # O que sobrar do orçamento vai para os melhores blocos restantes
+        spent = sum(tokens[i] for i in kept)
+        for i in sorted(leftover, key=lambda i: -scores[i]):
+            if spent + tokens[i] <= token_budget:
+                kept.append(i)
+                spent += tokens[i]
+        kept.sort()
+
+    kept_tokens = sum(tokens[i] for i in kept)
+    total_tokens = sum(tokens)
+    stats = {
+        "blocks_total": len(blocks),
+        "blocks_kept": len(kept),
+        "blocks_prefiltered": prefiltered,
+        "blocks_dropped": len(blocks) - len(kept),
+        "tokens_total": total_tokens,
+        "tokens_kept": kept_tokens,
+        "tokens_dropped": total_tokens - kept_tokens,
+    }
+    if isinstance(blocks, InteractionBlocks):
+        return blocks.take(kept), stats
+    return [blocks[i] for i in kept], stats
@@ -1,12 +1,84 @@
+import bisect
 from datetime import datetime, timedelta
+from typing import List, Tuple
+from utils.message_store import MessageStore
+
+def _ms(moment: datetime) -> int:
+    return int(moment.timestamp() * 1000)
+
+class TimeIndex:
+    """
+    Sorted timestamp index over a list of message dicts, for bisect range lookups.
+
+    Built once in O(n log n); every range query afterwards is O(log n) plus the
+    size of the result. A MessageStore is already sorted and is used directly.
+
+    Args:
+        messages (list | MessageStore): Messages with a `timestamp_ms` field.
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+        if isinstance(messages, MessageStore):
+            self.order = None
+            self.timestamps = None
+        else:
+            self.order = sorted(range(len(messages)), key=lambda i: messages[i]["timestamp_ms"])
+            self.timestamps = [messages[i]["timestamp_ms"] for i in self.order]
+
+    def index_range(self, start_ms: int = None, end_ms: int = None) -> Tuple[int, int]:
+        """Positions [start, stop) in timestamp order with start_ms <= timestamp_ms < end_ms."""
+        if self.order is None:
+            return self.messages.index_range(start_ms, end_ms)
+        start = 0 if start_ms is None else bisect.bisect_left(self.timestamps, start_ms)
+        stop = len(self.timestamps) if end_ms is None else bisect.bisect_left(self.timestamps, end_ms)
+        return start, max(start, stop)
+
+    def range(self, start_ms: int = None, end_ms: int = None):
+        start, stop = self.index_range(start_ms, end_ms)
+        if self.order is None:
+            return self.messages[start:stop]
+        return [self.messages[i] for i in self.order[start:stop]]
 
 def filter_last_week_messages(messages, reference_date=None):
     if reference_date is None:
         reference_date = datetime.now()
-
     one_week_ago = reference_date - timedelta(days=7)
-    filtered = [
-        msg for msg in messages
-        if datetime.fromtimestamp(msg["timestamp_ms"] / 1000) >= one_week_ago
-    ]
-    return filtered
+    index = messages if isinstance(messages, TimeIndex) else TimeIndex(messages)
+    return index.range(start_ms=_ms(one_week_ago))
+
+def week_start(moment: datetime) -> datetime:
+    """Monday 00:00 (local time) of the ISO week containing `moment`."""
+    return datetime(moment.year, moment.month, moment.day) - timedelta(days=moment.weekday())
+
+def week_label(moment: datetime) -> str:
+    year, week, _ = moment.isocalendar()
+    return f"{year}-{week:02d}"
+
+def week_partitions(messages, until: datetime = None) -> List[Tuple[str, int, int]]:
+    """
+    Split messages into calendar (ISO) weeks.
+
+    Returns one (label "YYYY-WW", start, stop) per week that has messages,
+    where [start, stop) are positions in timestamp order (see TimeIndex). Only
+    week boundaries are bisected, so this costs O(weeks * log n). Weeks
+    starting at or after `until` are left out.
+    """
+    index = messages if isinstance(messages, TimeIndex) else TimeIndex(messages)
+    first, last = index.index_range()
+    if first == last:
+        return []
+    if index.order is None:
+        first_ms, last_ms = index.messages.timestamp(first), index.messages.timestamp(last - 1)
+    else:
+        first_ms, last_ms = index.timestamps[first], index.timestamps[last - 1]
+    partitions = []
+    monday = week_start(datetime.fromtimestamp(first_ms / 1000))
+    end = datetime.fromtimestamp(last_ms / 1000)
+    while monday <= end and (until is None or monday < until):
+        next_monday = monday + timedelta(days=7)
+        start, stop = index.index_range(_ms(monday), _ms(next_monday))
+        if stop > start:
+            partitions.append((week_label(monday), start, stop))
+        monday = next_monday
+    return partitions
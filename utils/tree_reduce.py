@@ -0,0 +1,120 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+from utils.batch_planner import BatchPlanner
+from utils.concurrent_analysis import _timed_batch
+from utils.metrics import metrics
+from utils.progress import progress
+
+PERIOD_FORMATS = {"month": "%Y-%m", "week": "%G-W%V", "day": "%Y-%m-%d"}
+
+def period_of(timestamp_ms: int, granularity: str = "month") -> str:
+    return datetime.fromtimestamp(timestamp_ms / 1000).strftime(PERIOD_FORMATS[granularity])
+
+def _run_level(executor, tasks: list) -> list:
+    # Devolve os resultados pela ordem das tarefas, independentemente da ordem de conclusão
+    futures = [executor.submit(func, *args) for func, args in tasks]
+    results = []
+    for (func, args), future in zip(tasks, futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            print(f"❌ Erro na redução ({func.__name__}): {str(e)}")
+            results.append(None)
+    return results
+
+def analyze_tree(ais: List, blocks: list, max_workers: int = 4, planner: BatchPlanner = None,
+                 fan_in: int = 4, granularity: str = "month") -> List[dict]:
+    """
+    Analyze blocks with a map step per batch and a tree reduction per time period.
+
+    Every batch is analyzed (the leaves). Leaf reflections are grouped by the
+    period of the batch's first message and merged `fan_in` at a time, level by
+    level, until each period holds a single bounded summary. All calls of a
+    level, across periods and personas, run in parallel; the tree is
+    ceil(log_fan_in(batches per period)) levels deep.
+
+    A period that already has a summary in the AI's memory (the current
+    month of an incremental run, analyzed before the watermark) starts from
+    that summary as its first node, so it is reduced together with the new
+    batches instead of being replaced by them.
+
+    Args:
+        ais (list): Persona AIs exposing `_plan_batches`, `_process_batch`,
+            `_reduce_reflections` and `_merge_period_summaries`, and a `memory` dict.
+        blocks (list): Interaction blocks to analyze.
+        max_workers (int): Maximum number of concurrent model requests.
+        planner (BatchPlanner, optional): Shared planner over `blocks`; built if not given.
+        fan_in (int): Number of nodes merged by one reduction call (at least 2).
+        granularity (str): Period size: "month", "week" or "day".
+
+    Returns:
+        list: One feedback dict per AI, in the same order as `ais`.
+    """
+    fan_in = max(2, fan_in)
+    planner = planner or BatchPlanner(blocks)
+    plans = [ai._plan_batches(planner) for ai in ais]
+    progress.plan(sum(len(plan) for plan in plans))
+    print(f"🌳 Análise em árvore: {sum(len(plan) for plan in plans)} lotes de {len(ais)} personas, "
+          f"fan-in {fan_in}, períodos por {granularity}")
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Folhas: um pedido por lote, tal como na análise concorrente
+        leaf_tasks = [(_timed_batch, (ai, planner, batch)) for ai, plan in zip(ais, plans) for batch in plan]
+        leaf_results = iter(_run_level(executor, leaf_tasks))
+
+        # nodes[ai_index][period] = lista de nós (cada nó é uma lista de reflexões)
+        nodes: List[Dict[str, List[list]]] = [{} for _ in ais]
+        for ai_index, plan in enumerate(plans):
+            for start, _ in plan:
+                result = next(leaf_results)
+                reflections = result[0] if result else []
+                period = period_of(planner.blocks[start]["input"]["timestamp_ms"], granularity)
+                nodes[ai_index].setdefault(period, []).append(
+                    [{"date": period, "text": r.get("text", "")} for r in reflections
+                     if isinstance(r, dict) and str(r.get("text", "")).strip()]
+                )
+
+        # Resumo já guardado de um período com lotes novos: primeiro nó, por ordem cronológica
+        for ai, periods in zip(ais, nodes):
+            stored = ai.memory.get("period_summaries") or {}
+            for period, period_nodes in periods.items():
+                if stored.get(period):
+                    period_nodes.insert(0, list(stored[period]))
+
+        level = 0
+        while True:
+            tasks, slots = [], []
+            next_nodes: List[Dict[str, List[list]]] = [{} for _ in ais]
+            for ai_index, periods in enumerate(nodes):
+                for period, period_nodes in periods.items():
+                    if len(period_nodes) == 1:
+                        next_nodes[ai_index][period] = period_nodes
+                        continue
+                    for i in range(0, len(period_nodes), fan_in):
+                        if i + 1 == len(period_nodes):
+                            # Nó sobrante sem parceiros: sobe de nível sem pedido
+                            next_nodes[ai_index].setdefault(period, []).append(period_nodes[i])
+                            continue
+                        group = [r for node in period_nodes[i:i + fan_in] for r in node]
+                        next_nodes[ai_index].setdefault(period, []).append(None)
+                        slots.append((ai_index, period, len(next_nodes[ai_index][period]) - 1, group))
+                        tasks.append((ais[ai_index]._reduce_reflections, (group, period)))
+            if not tasks:
+                break
+            level += 1
+            print(f"🌳 Nível {level}: {len(tasks)} reduções")
+            metrics.count("reduce_calls", len(tasks))
+            progress.plan(len(tasks))
+            for (ai_index, period, position, group), reduced in zip(slots, _run_level(executor, tasks)):
+                next_nodes[ai_index][period][position] = reduced if reduced is not None else group[:2]
+            progress.advance(len(tasks))
+            nodes = next_nodes
+    print(f"⏱ Árvore concluída em {time.perf_counter() - wall_start:.1f}s com {level} níveis de redução")
+
+    return [
+        ai._merge_period_summaries({period: period_nodes[0] for period, period_nodes in periods.items()})
+        for ai, periods in zip(ais, nodes)
+    ]